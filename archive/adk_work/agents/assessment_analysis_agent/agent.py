@@ -6,13 +6,19 @@ USES EXACT LOCKED SCORING LOGIC AND MISSION-CRITICAL PROMPTS - NO MODIFICATIONS
 SIMPLIFIED TO MATCH ORIGINAL GEMINI API DATA STRUCTURE
 """
 
+import logging
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple
 from google.adk import Agent
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field, ValidationError
 import json
 import re
 
+from monitoring.tracing import span, trace
+from .percentile_index import CohortPercentiles, rank_and_record
+
+logger = logging.getLogger(__name__)
+
 # LOCKED SCORING MAPS - EXACT COPY FROM src/utils/scoring.ts
 # DO NOT MODIFY - THESE ARE LOCKED AND SECURED
 SCORING_MAPS = {
@@ -110,6 +116,50 @@ QUESTION_TYPE_MAP = {
     'q23': 'finalVision'
 }
 
+# Report display names for categories
+CATEGORY_DISPLAY_NAMES = {
+    'personalBackground': 'Personal Background',
+    'entrepreneurialSkills': 'Entrepreneurial Skills', 
+    'resources': 'Resources',
+    'behavioralMetrics': 'Behavioral Metrics',
+    'growthVision': 'Growth Vision'
+}
+
+# Analysis text templates, shared by the single-session and batch paths, in AssessmentAnalysis
+# field order; list sections are tuples of templates. Fields: highest/lowest (display names),
+# highest_score/lowest_score, highest_max/lowest_max, improvement_potential, overall_score,
+# industry, location
+ANALYSIS_TEMPLATES = {
+    "key_insights": (
+        "Your {highest} score of {highest_score:.0f}/{highest_max} represents your strongest area",
+        "Improving {lowest} could boost your overall score by {improvement_potential:.0f} points",
+        "Your overall score of {overall_score:.0f}/100 indicates solid entrepreneurial foundation",
+    ),
+    "recommendations": (
+        "Focus on developing your {lowest} skills",
+        "Leverage your {highest} strengths",
+        "Prioritize improvement in {lowest} for maximum impact",
+    ),
+    "competitive_advantage": """Your {highest} score of {highest_score:.0f}/{highest_max} represents your strongest area. Focus on leveraging this strength to build momentum in other areas of your business development.""",
+    "growth_opportunity": """Your {lowest} score of {lowest_score:.0f}/{lowest_max} indicates an area for focused improvement. Prioritize developing skills in this category to strengthen your overall entrepreneurial foundation.""",
+    "comprehensive_analysis": """Your entrepreneurial journey shows strong foundation building with {highest_score:.0f}/{highest_max} in {highest}. Focus on developing your {lowest} area ({lowest_score:.0f}/{lowest_max}) to strengthen your overall readiness. Your {industry} focus and {location} location provide solid market positioning for growth.""",
+}
+
+# Strength / weakness thresholds as a percentage of the category maximum
+STRENGTH_THRESHOLD = 80
+WEAKNESS_THRESHOLD = 50
+
+def get_category_display_name(category: str) -> str:
+    return CATEGORY_DISPLAY_NAMES.get(category, category)
+
+def render_analysis_sections(fields: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """Render the analysis sections, in AssessmentAnalysis field order, from template fields"""
+    for section, template in ANALYSIS_TEMPLATES.items():
+        if isinstance(template, tuple):
+            yield section, [item.format_map(fields) for item in template]
+        else:
+            yield section, template.format_map(fields)
+
 class AssessmentResponse(BaseModel):
     """Individual assessment question response - simplified to match original Gemini API"""
     questionId: str = Field(description="Question identifier")
@@ -118,9 +168,12 @@ class AssessmentResponse(BaseModel):
 class AssessmentSession(BaseModel):
     """Complete assessment session data - simplified to match original Gemini API"""
     responses: List[AssessmentResponse] = Field(description="All assessment responses")
-    scores: Dict[str, float] = Field(description="Category scores")
+    # The web app sends category_scores; accept either name
+    scores: Dict[str, float] = Field(description="Category scores",
+                                     validation_alias=AliasChoices("scores", "category_scores"))
     industry: str = Field(description="User's industry")
     location: str = Field(description="User's location")
+    session_id: Optional[str] = Field(default=None, description="Session identifier; only identified sessions join the percentile cohort")
 
 class AssessmentAnalysis(BaseModel):
     """AI-generated analysis and insights"""
@@ -129,6 +182,36 @@ class AssessmentAnalysis(BaseModel):
     competitive_advantage: str = Field(description="Competitive advantage analysis")
     growth_opportunity: str = Field(description="Growth opportunity analysis")
     comprehensive_analysis: str = Field(description="Comprehensive narrative analysis")
+    cohort_percentiles: Optional[CohortPercentiles] = Field(
+        default=None, description="Where the scores rank in the cohort (when the percentile index is enabled)"
+    )
+
+class AssessmentRequest(BaseModel):
+    """HTTP request body for assessment analysis (process_assessment)"""
+    session_id: str
+    user_id: str
+    industry: str
+    location: str
+    overall_score: float
+    category_scores: Dict[str, float]
+    question_scores: Dict[str, float]
+    responses: List[AssessmentResponse]
+    
+    def to_session(self) -> AssessmentSession:
+        """The part of the request the agent analyzes"""
+        return AssessmentSession(
+            responses=self.responses,
+            scores=self.category_scores,
+            industry=self.industry,
+            location=self.location,
+            session_id=self.session_id
+        )
+
+class AssessmentResult(BaseModel):
+    """HTTP response body for assessment analysis"""
+    success: bool
+    data: Optional[AssessmentAnalysis] = None
+    error: Optional[str] = None
 
 class AssessmentAgent(Agent):
     """AI Agent for analyzing entrepreneurial assessments using EXACT locked scoring logic and mission-critical prompts"""
@@ -201,22 +284,29 @@ class AssessmentAgent(Agent):
     async def run(self, user_input: str) -> str:
         """
         Main entry point following ADK pattern
-        Handles both JSON assessment data and conversational queries
+        String adapter over analyze(); handlers call analyze() with models directly
         """
         try:
-            # Try to parse as JSON first (production mode)
-            session_data = json.loads(user_input)
-            session = AssessmentSession(**session_data)
-            
-            # Analyze assessment
-            analysis = await self._analyze_assessment(session)
-            
-            # Return JSON response
-            return json.dumps(analysis.dict(), indent=2)
+            with trace("assessment_analysis_agent.run"):
+                # Parse and validate in one pass (production mode)
+                with span("parse_validate"):
+                    session = AssessmentSession.model_validate_json(user_input)
+                
+                # Analyze assessment
+                analysis = await self.analyze(session)
+                
+                # Return JSON response
+                with span("serialize"):
+                    return analysis.model_dump_json()
             
-        except json.JSONDecodeError:
-            # Handle conversational queries (testing mode)
-            return self._handle_conversational_query(user_input)
+        except ValidationError as e:
+            if e.errors()[0]["type"] == "json_invalid":
+                # Handle conversational queries (testing mode)
+                return self._handle_conversational_query(user_input)
+            return json.dumps({
+                "error": f"Assessment analysis failed: {str(e)}",
+                "success": False
+            })
         except Exception as e:
             return json.dumps({
                 "error": f"Assessment analysis failed: {str(e)}",
@@ -227,99 +317,78 @@ class AssessmentAgent(Agent):
         """Handle conversational queries for testing"""
         return f"I'm an assessment analysis agent. I expect JSON input with assessment data, not conversational queries. Please provide assessment data in the expected format."
     
+    async def analyze(self, session: AssessmentSession) -> AssessmentAnalysis:
+        """Typed entry point: analyze a validated session and rank it in its cohort"""
+        with span("analysis"):
+            analysis = await self._analyze_assessment(session)
+        with span("percentile_rank"):
+            analysis.cohort_percentiles = self._cohort_percentiles(session)
+        return analysis
+    
+    def _cohort_percentiles(self, session: AssessmentSession) -> Optional[CohortPercentiles]:
+        """Rank and record the session; the percentiles are an add-on, so a failure only leaves them out"""
+        try:
+            return rank_and_record(session.scores, session.industry, session.location, session.session_id)
+        except Exception as e:
+            logger.error(f"Cohort percentile ranking failed: {e}")
+            return None
+    
     async def _analyze_assessment(self, session: AssessmentSession) -> AssessmentAnalysis:
         """Generate AI-powered insights and analysis based on pre-calculated scores"""
-        # Convert dictionary to list format for processing
-        category_scores_list = [{"category": cat, "score": score} for cat, score in session.scores.items()]
-        
+        return AssessmentAnalysis(**dict(self._iter_analysis_sections(session)))
+    
+    async def stream_analysis(self, session: AssessmentSession) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield (section name, value) pairs in AssessmentAnalysis field order as each is built"""
+        for section in self._iter_analysis_sections(session):
+            yield section
+        percentiles = self._cohort_percentiles(session)
+        if percentiles is not None:
+            yield "cohort_percentiles", percentiles.model_dump()
+    
+    def _iter_analysis_sections(self, session: AssessmentSession) -> Iterator[Tuple[str, Any]]:
+        """Build the analysis one section at a time"""
         # Use the REAL overall score - do not calculate it
         # The application should pass the overall score, but if not, calculate from REAL category scores
         overall_score = sum(session.scores.values())
         
         # Find highest and lowest scoring categories from actual data
-        sorted_categories = sorted(category_scores_list, key=lambda x: x['score'], reverse=True)
-        highest_category = sorted_categories[0]
-        lowest_category = sorted_categories[-1]
+        # Ties go to the first highest and the last lowest category, as a stable descending sort would
+        categories = list(session.scores.items())
+        highest_category, highest_score = max(categories, key=lambda item: item[1])
+        lowest_category, lowest_score = min(reversed(categories), key=lambda item: item[1])
         
         # Calculate potential improvement based on REAL category weights
-        lowest_weight = CATEGORY_WEIGHTS.get(lowest_category['category'], 20)
-        max_possible_lowest = lowest_weight
-        current_lowest = lowest_category['score']
-        improvement_potential = max_possible_lowest - current_lowest
+        highest_max = CATEGORY_WEIGHTS.get(highest_category, 20)
+        lowest_max = CATEGORY_WEIGHTS.get(lowest_category, 20)
+        improvement_potential = lowest_max - lowest_score
         
-
-        
-        def get_category_display_name(category):
-            display_names = {
-                'personalBackground': 'Personal Background',
-                'entrepreneurialSkills': 'Entrepreneurial Skills', 
-                'resources': 'Resources',
-                'behavioralMetrics': 'Behavioral Metrics',
-                'growthVision': 'Growth Vision'
-            }
-            return display_names.get(category, category)
-        
-        # Key Insights - based on REAL scores and actual category weights
-        highest_max = CATEGORY_WEIGHTS.get(highest_category['category'], 20)
-        lowest_max = CATEGORY_WEIGHTS.get(lowest_category['category'], 20)
-        
-        key_insights = [
-            f"Your {get_category_display_name(highest_category['category'])} score of {highest_category['score']:.0f}/{highest_max} represents your strongest area",
-            f"Improving {get_category_display_name(lowest_category['category'])} could boost your overall score by {improvement_potential:.0f} points",
-            f"Your overall score of {overall_score:.0f}/100 indicates solid entrepreneurial foundation"
-        ]
-        
-        # Recommendations - based on REAL weak areas
-        recommendations = [
-            f"Focus on developing your {get_category_display_name(lowest_category['category'])} skills",
-            f"Leverage your {get_category_display_name(highest_category['category'])} strengths",
-            f"Prioritize improvement in {get_category_display_name(lowest_category['category'])} for maximum impact"
-        ]
-        
-        # Find specific strengths and weaknesses based on REAL scores and actual category weights
-        # 4+ star performance (80% of max) = strengths, 1-star performance (<50% of max) = weaknesses
-        strengths = []
-        weaknesses = []
-        for cat_score in category_scores_list:
-            max_possible = CATEGORY_WEIGHTS.get(cat_score['category'], 20)
-            percentage = (cat_score['score'] / max_possible) * 100
-            if percentage >= 80:
-                strengths.append(cat_score)
-            elif percentage < 50:
-                weaknesses.append(cat_score)
-        
-        # Competitive Advantage - using EXACT original prompt format
-        competitive_advantage = f"""Your {get_category_display_name(highest_category['category'])} score of {highest_category['score']:.0f}/{highest_max} represents your strongest area. Focus on leveraging this strength to build momentum in other areas of your business development."""
-        
-        # Growth Opportunity - using EXACT original prompt format
-        growth_opportunity = f"""Your {get_category_display_name(lowest_category['category'])} score of {lowest_category['score']:.0f}/{lowest_max} indicates an area for focused improvement. Prioritize developing skills in this category to strengthen your overall entrepreneurial foundation."""
-        
-        # Comprehensive Analysis - using EXACT original prompt format
-        # Extract the open-ended responses for the comprehensive analysis
-        vision_response = ""
-        journey_response = ""
-        challenge_response = ""
-        setback_response = ""
-        
-        for response in session.responses:
-            if response.questionId == "q23":  # Vision Statement
-                vision_response = response.response
-            elif response.questionId == "q3":  # Entrepreneurial Journey
-                journey_response = response.response
-            elif response.questionId == "q8":  # Business Challenge
-                challenge_response = response.response
-            elif response.questionId == "q18":  # Setback Response
-                setback_response = response.response
-        
-        comprehensive_analysis = f"""Your entrepreneurial journey shows strong foundation building with {highest_category['score']:.0f}/{highest_max} in {get_category_display_name(highest_category['category'])}. Focus on developing your {get_category_display_name(lowest_category['category'])} area ({lowest_category['score']:.0f}/{lowest_max}) to strengthen your overall readiness. Your {session.industry} focus and {session.location} location provide solid market positioning for growth."""
-        
-        return AssessmentAnalysis(
-            key_insights=key_insights,
-            recommendations=recommendations,
-            competitive_advantage=competitive_advantage,
-            growth_opportunity=growth_opportunity,
-            comprehensive_analysis=comprehensive_analysis
-        )
+        # Key insights, recommendations and narrative sections - based on REAL scores and
+        # actual category weights, using EXACT original prompt formats
+        yield from render_analysis_sections({
+            "highest": get_category_display_name(highest_category),
+            "highest_score": highest_score,
+            "highest_max": highest_max,
+            "lowest": get_category_display_name(lowest_category),
+            "lowest_score": lowest_score,
+            "lowest_max": lowest_max,
+            "improvement_potential": improvement_potential,
+            "overall_score": overall_score,
+            "industry": session.industry,
+            "location": session.location,
+        })
 
 # ADK entry point
-root_agent = AssessmentAgent()
+# It is built on first access so importing this module does not construct an agent
+_root_agent = None
+
+def get_root_agent() -> AssessmentAgent:
+    """Get or create the shared assessment analysis agent."""
+    global _root_agent
+    if _root_agent is None:
+        _root_agent = AssessmentAgent()
+    return _root_agent
+
+def __getattr__(name: str):
+    if name == "root_agent":
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,173 @@
+"""
+Vectorized batch analysis
+Builds the same AssessmentAnalysis as AssessmentAgent._analyze_assessment for
+thousands of sessions at once (funder reporting). Highest/lowest category,
+improvement potential and strength/weakness classification are array operations
+over a sessions x categories score matrix.
+
+The text comes from the shared ANALYSIS_TEMPLATES in agent.py. Each template is
+rendered once per distinct combination of the fields it uses rather than once per
+session, so the output is identical to the single-session path at a fraction of
+the formatting cost.
+"""
+
+import string
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .agent import (
+    ANALYSIS_TEMPLATES, AssessmentAnalysis, AssessmentSession, CATEGORY_WEIGHTS, STRENGTH_THRESHOLD,
+    WEAKNESS_THRESHOLD, get_category_display_name
+)
+from .scoring_engine import CATEGORIES
+
+# Field names each template uses, parsed once
+TEMPLATE_FIELDS = {
+    template: tuple(dict.fromkeys(name for _, name, _, _ in string.Formatter().parse(template) if name))
+    for section in ANALYSIS_TEMPLATES.values()
+    for template in (section if isinstance(section, tuple) else (section,))
+}
+
+
+class BatchAnalysisSummary(BaseModel):
+    """Per-session numbers behind the analysis text, columns in `categories` order"""
+    model_config = {"arbitrary_types_allowed": True}
+
+    categories: Tuple[str, ...] = Field(description="Column order of the score matrix")
+    highest: np.ndarray = Field(description="Column of the highest category (first on ties)")
+    lowest: np.ndarray = Field(description="Column of the lowest category (last on ties)")
+    overall_scores: np.ndarray = Field(description="Sum of category scores per session")
+    improvement_potential: np.ndarray = Field(description="Points left in the lowest category")
+    strengths: np.ndarray = Field(description="sessions x categories, score >= 80% of the category maximum")
+    weaknesses: np.ndarray = Field(description="sessions x categories, score < 50% of the category maximum")
+
+
+def summarize_score_matrix(scores: np.ndarray, categories: Sequence[str] = CATEGORIES) -> BatchAnalysisSummary:
+    """Vectorized highest/lowest, improvement and strength/weakness for a complete score matrix."""
+    scores = np.asarray(scores, dtype=np.float64)
+    categories = tuple(categories)
+    if scores.ndim != 2 or scores.shape[1] != len(categories) or not categories:
+        raise ValueError(f"Expected a sessions x {len(categories)} score matrix, got shape {scores.shape}")
+
+    weights = np.array([CATEGORY_WEIGHTS.get(category, 20) for category in categories], dtype=np.float64)
+    rows = np.arange(scores.shape[0])
+
+    # argmax takes the first maximum; argmin over reversed columns takes the last minimum
+    highest = np.argmax(scores, axis=1)
+    lowest = len(categories) - 1 - np.argmin(scores[:, ::-1], axis=1)
+
+    # Accumulate column by column, in the same order as sum() over the session's scores
+    overall_scores = np.zeros(scores.shape[0])
+    for column in range(len(categories)):
+        overall_scores += scores[:, column]
+
+    percentages = scores / weights * 100
+    return BatchAnalysisSummary(
+        categories=categories,
+        highest=highest,
+        lowest=lowest,
+        overall_scores=overall_scores,
+        improvement_potential=weights[lowest] - scores[rows, lowest],
+        strengths=percentages >= STRENGTH_THRESHOLD,
+        weaknesses=percentages < WEAKNESS_THRESHOLD,
+    )
+
+
+def _factorize_floats(values: np.ndarray) -> Tuple[np.ndarray, List[float]]:
+    # Group on the bit pattern so -0.0 and 0.0 (which format differently) stay apart
+    _, first, codes = np.unique(values.view(np.int64), return_index=True, return_inverse=True)
+    return codes.reshape(-1), values[first].tolist()
+
+
+def _factorize_strings(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def _render(template: str, fields: Dict[str, Tuple[np.ndarray, List[Any]]]) -> List[str]:
+    """Render template for every row, formatting each distinct field combination once."""
+    names = TEMPLATE_FIELDS[template]
+    cardinalities = [len(fields[name][1]) for name in names]
+    if np.prod(cardinalities, dtype=np.float64) < 2 ** 62:
+        # Pack the codes into one integer per row; a 1-D unique is much cheaper than a row-wise one
+        key = np.zeros(len(fields[names[0]][0]), dtype=np.int64)
+        for name, cardinality in zip(names, cardinalities):
+            key = key * cardinality + fields[name][0]
+    else:
+        key = np.stack([fields[name][0] for name in names], axis=1)
+    _, first, inverse = np.unique(key, axis=0 if key.ndim == 2 else None, return_index=True, return_inverse=True)
+
+    # Render each distinct combination from the first row that has it
+    first_codes = {name: fields[name][0][first].tolist() for name in names}
+    rendered = [
+        template.format_map({name: fields[name][1][first_codes[name][i]] for name in names})
+        for i in range(len(first))
+    ]
+    return [rendered[i] for i in inverse.reshape(-1).tolist()]
+
+
+def render_score_matrix(scores: np.ndarray, industries: Sequence[str], locations: Sequence[str],
+                        categories: Sequence[str] = CATEGORIES) -> Dict[str, list]:
+    """Analysis sections for every row of a sessions x categories score matrix, one column per section."""
+    scores = np.asarray(scores, dtype=np.float64)
+    if not len(industries) == len(locations) == scores.shape[0]:
+        raise ValueError("industries and locations need one entry per score matrix row")
+    if scores.shape[0] == 0:
+        return {section: [] for section in ANALYSIS_TEMPLATES}
+
+    summary = summarize_score_matrix(scores, categories)
+    display_names = [get_category_display_name(category) for category in summary.categories]
+    maxima = [CATEGORY_WEIGHTS.get(category, 20) for category in summary.categories]
+    rows = np.arange(scores.shape[0])
+
+    # Every template field as (per-row codes, distinct values)
+    fields = {
+        "highest": (summary.highest, display_names),
+        "highest_max": (summary.highest, maxima),
+        "highest_score": _factorize_floats(scores[rows, summary.highest]),
+        "lowest": (summary.lowest, display_names),
+        "lowest_max": (summary.lowest, maxima),
+        "lowest_score": _factorize_floats(scores[rows, summary.lowest]),
+        "improvement_potential": _factorize_floats(summary.improvement_potential),
+        "overall_score": _factorize_floats(summary.overall_scores),
+        "industry": _factorize_strings(industries),
+        "location": _factorize_strings(locations),
+    }
+
+    sections = {}
+    for section, template in ANALYSIS_TEMPLATES.items():
+        if isinstance(template, tuple):
+            sections[section] = [list(items) for items in zip(*(_render(item, fields) for item in template))]
+        else:
+            sections[section] = _render(template, fields)
+    return sections
+
+
+def analyze_score_matrix(scores: np.ndarray, industries: Sequence[str], locations: Sequence[str],
+                         categories: Sequence[str] = CATEGORIES) -> List[AssessmentAnalysis]:
+    """Analysis for every row of a sessions x categories score matrix."""
+    sections = render_score_matrix(scores, industries, locations, categories)
+    # Every field is built here from typed values, so skip re-validation
+    return [
+        AssessmentAnalysis.model_construct(**dict(zip(sections, values)))
+        for values in zip(*sections.values())
+    ]
+
+
+def analyze_sessions(sessions: Sequence[AssessmentSession]) -> List[AssessmentAnalysis]:
+    """Batch analysis of sessions; sessions sharing a category order go through one matrix."""
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for index, session in enumerate(sessions):
+        groups.setdefault(tuple(session.scores), []).append(index)
+
+    analyses: List[AssessmentAnalysis] = [None] * len(sessions)
+    for categories, indices in groups.items():
+        group = [sessions[i] for i in indices]
+        matrix = np.array([list(session.scores.values()) for session in group], dtype=np.float64)
+        results = analyze_score_matrix(matrix, [s.industry for s in group], [s.location for s in group], categories)
+        for index, analysis in zip(indices, results):
+            analyses[index] = analysis
+    return analyses
@@ -0,0 +1,436 @@
+"""
+Cohort percentile index
+Where a score ranks among everyone who has taken the assessment, overall and per
+category, sliced by industry and location ("*" matches any). Each slice is a
+Fenwick tree over the bounded 0-100 score domain at 0.1 resolution, so recording
+a session and ranking a score are both O(log n) with no scan of history.
+
+The counts are snapshotted to a compact compressed file that is loaded at startup.
+Build one from an exported cohort with:
+
+    python -m assessment_analysis_agent.percentile_index cohort.jsonl -o percentiles.npz
+"""
+
+import argparse
+import atexit
+import fcntl
+import json
+import logging
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+ANY = "*"
+OVERALL = "overall"
+MAX_SLICE_KEY_LENGTH = 64
+
+
+class CohortPercentiles(BaseModel):
+    """Percentile ranks of one session within its cohort"""
+    industry: str = Field(description="Industry of the cohort ranked against ('*' = all)")
+    location: str = Field(description="Location of the cohort ranked against ('*' = all)")
+    cohort_size: int = Field(description="Sessions in the cohort")
+    overall: float = Field(description="Percentile rank of the overall score (0-100)")
+    categories: Dict[str, float] = Field(default_factory=dict, description="Percentile rank per category (0-100)")
+
+
+class FenwickTree:
+    """Counts per bucket with O(log n) point update and prefix sum."""
+
+    def __init__(self, size: int, counts: Optional[Iterable[int]] = None):
+        self.size = size
+        self.counts = [0] * size
+        self._tree = [0] * (size + 1)
+        if counts is not None:
+            # O(n) build: push each node's sum to its parent once
+            for i, count in enumerate(counts):
+                self.counts[i] = int(count)
+                self._tree[i + 1] += int(count)
+                parent = (i + 1) + ((i + 1) & -(i + 1))
+                if parent <= size:
+                    self._tree[parent] += self._tree[i + 1]
+
+    def add(self, bucket: int, delta: int = 1):
+        self.counts[bucket] += delta
+        i = bucket + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, bucket: int) -> int:
+        """Total count in buckets 0..bucket inclusive."""
+        total = 0
+        i = min(bucket, self.size - 1) + 1
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    @property
+    def total(self) -> int:
+        return self.prefix_sum(self.size - 1)
+
+
+class PercentileIndex:
+    """
+    Percentile ranks by metric (overall or category) and industry/location slice.
+
+    Only the given categories are indexed (the overall score is their sum), industry
+    and location are normalized to slice keys, and at most max_slices slices get
+    their own trees; a session in a slice past the cap is only counted in the wider
+    ones. Sessions added with a session_id are counted once: the last max_sessions
+    ids are remembered, so retries and re-analysis do not inflate the cohort.
+    """
+
+    def __init__(self, resolution: float = 0.1, max_score: float = 100.0, min_cohort_size: int = 30,
+                 categories: Optional[Iterable[str]] = None, max_slices: int = 200, max_sessions: int = 100_000):
+        self.resolution = resolution
+        self.max_score = max_score
+        self.min_cohort_size = min_cohort_size
+        self.categories = frozenset(categories) if categories is not None else None
+        self.max_slices = max_slices
+        self.max_sessions = max_sessions
+        self.buckets = int(round(max_score / resolution)) + 1
+        self._trees: Dict[Tuple[str, str, str], FenwickTree] = {}
+        self._slices: Set[Tuple[str, str]] = set()
+        self._sessions: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def bucket(self, score: float) -> int:
+        clamped = min(max(score, 0.0), self.max_score)
+        return int(math.floor(clamped / self.resolution + 0.5))
+
+    def add(self, category_scores: Dict[str, float], industry: str, location: str,
+            session_id: Optional[str] = None) -> bool:
+        """
+        Record one session's overall and category scores in every slice it belongs to.
+        Returns False (recording nothing) if the session was already recorded.
+        """
+        scores = self._indexed(category_scores)
+        if not scores:
+            return False
+        metrics = {OVERALL: sum(scores.values()), **scores}
+        slices = _slices(slice_key(industry), slice_key(location))
+        with self._lock:
+            if session_id is not None:
+                if session_id in self._sessions:
+                    return False
+                self._sessions[session_id] = None
+                if len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            # Widest first, so the slices past the cap are the narrow ones
+            for industry_key, location_key in reversed(slices):
+                if (industry_key, location_key) not in self._slices:
+                    if len(self._slices) >= self.max_slices:
+                        continue
+                    self._slices.add((industry_key, location_key))
+                for metric, score in metrics.items():
+                    self._tree(metric, industry_key, location_key).add(self.bucket(score))
+            self.recorded += 1
+        return True
+
+    def percentile(self, metric: str, score: float, industry: str = ANY, location: str = ANY) -> Optional[float]:
+        """Percentile rank (0-100) of score in one slice, ties counted as half; None if the slice is empty."""
+        with self._lock:
+            tree = self._trees.get((metric, slice_key(industry), slice_key(location)))
+            return None if tree is None else self._rank(tree, score)
+
+    def cohort_size(self, industry: str = ANY, location: str = ANY) -> int:
+        with self._lock:
+            tree = self._trees.get((OVERALL, slice_key(industry), slice_key(location)))
+            return 0 if tree is None else tree.total
+
+    def rank(self, category_scores: Dict[str, float], industry: str, location: str) -> Optional[CohortPercentiles]:
+        """
+        Rank a session against the narrowest cohort with at least min_cohort_size sessions:
+        industry and location, then industry, then location, then everyone.
+        Returns None while even the whole cohort is too small.
+        """
+        scores = self._indexed(category_scores)
+        if not scores:
+            return None
+        industry, location = slice_key(industry), slice_key(location)
+        with self._lock:
+            for industry_key, location_key in _slices(industry, location):
+                overall = self._trees.get((OVERALL, industry_key, location_key))
+                if overall is None or overall.total < self.min_cohort_size:
+                    continue
+                categories = {}
+                for category, score in scores.items():
+                    tree = self._trees.get((category, industry_key, location_key))
+                    if tree is not None and tree.total:
+                        categories[category] = self._rank(tree, score)
+                return CohortPercentiles(
+                    industry=industry_key,
+                    location=location_key,
+                    cohort_size=overall.total,
+                    overall=self._rank(overall, sum(scores.values())),
+                    categories=categories
+                )
+        return None
+
+    def save(self, path: str):
+        """Write the bucket counts to a compressed snapshot (atomically)."""
+        # numpy is only needed for snapshots; keep it out of the agent's cold start
+        import numpy as np
+
+        with self._lock:
+            keys = list(self._trees)
+            counts = np.array([self._trees[key].counts for key in keys], dtype=np.uint32).reshape(len(keys), self.buckets)
+            sessions = list(self._sessions)
+            recorded = self.recorded
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                keys=np.array(json.dumps(keys)),
+                counts=counts,
+                sessions=np.array(json.dumps(sessions)),
+                meta=np.array(json.dumps({
+                    "resolution": self.resolution, "max_score": self.max_score, "recorded": recorded
+                }))
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, min_cohort_size: int = 30, **options) -> "PercentileIndex":
+        """Load a snapshot; options are the constructor's categories, max_slices and max_sessions."""
+        import numpy as np
+
+        with np.load(path) as snapshot:
+            meta = json.loads(str(snapshot["meta"]))
+            index = cls(meta["resolution"], meta["max_score"], min_cohort_size, **options)
+            keys = json.loads(str(snapshot["keys"]))
+            counts = snapshot["counts"]
+            # Snapshots written before sessions were deduplicated have no ids
+            sessions = json.loads(str(snapshot["sessions"])) if "sessions" in snapshot.files else []
+        if counts.shape[1:] != (index.buckets,):
+            raise ValueError(f"Snapshot {path} has {counts.shape[1:]} buckets, expected {index.buckets}")
+        for key, row in zip(keys, counts.tolist()):
+            metric, industry, location = key
+            if metric != OVERALL and index.categories is not None and metric not in index.categories:
+                continue
+            index._trees[(metric, industry, location)] = FenwickTree(index.buckets, row)
+            index._slices.add((industry, location))
+        index._sessions.update((session_id, None) for session_id in sessions[-index.max_sessions:])
+        index.recorded = meta.get("recorded", 0)
+        return index
+
+    def options(self) -> Dict[str, Any]:
+        """Constructor arguments to build (or load) an index that records the same way."""
+        return {"min_cohort_size": self.min_cohort_size, "categories": self.categories,
+                "max_slices": self.max_slices, "max_sessions": self.max_sessions}
+
+    def adopt(self, other: "PercentileIndex"):
+        """Take over another index's counts (after merging with the snapshot on disk)."""
+        with other._lock:
+            trees, slices, sessions, recorded = other._trees, other._slices, other._sessions, other.recorded
+        with self._lock:
+            self._trees, self._slices, self._sessions, self.recorded = trees, slices, sessions, recorded
+
+    def _indexed(self, category_scores: Dict[str, float]) -> Dict[str, float]:
+        if self.categories is None:
+            return dict(category_scores)
+        return {category: score for category, score in category_scores.items() if category in self.categories}
+
+    def _tree(self, metric: str, industry: str, location: str) -> FenwickTree:
+        key = (metric, industry, location)
+        tree = self._trees.get(key)
+        if tree is None:
+            tree = self._trees[key] = FenwickTree(self.buckets)
+        return tree
+
+    def _rank(self, tree: FenwickTree, score: float) -> float:
+        bucket = self.bucket(score)
+        below = tree.prefix_sum(bucket - 1) if bucket > 0 else 0
+        return round(100.0 * (below + 0.5 * tree.counts[bucket]) / tree.total, 1)
+
+
+def slice_key(value: Optional[str]) -> str:
+    """Industry/location as a slice key: whitespace collapsed, case folded and truncated ("*" if empty)."""
+    key = " ".join(str(value or "").split()).casefold()[:MAX_SLICE_KEY_LENGTH]
+    return key or ANY
+
+
+def _slices(industry: str, location: str) -> List[Tuple[str, str]]:
+    """The slices a session belongs to, narrowest first."""
+    return list(dict.fromkeys([(industry, location), (industry, ANY), (ANY, location), (ANY, ANY)]))
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Exclusive lock shared by every process saving to path."""
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SnapshotWriter:
+    """
+    Records sessions into the index and merges them into the snapshot every `every`
+    recorded sessions (on a background thread) and at exit.
+
+    Each save adds only the sessions this process recorded since its last save to
+    the snapshot on disk, under a file lock, then adopts the merged counts. Server
+    workers sharing one path therefore combine their cohorts instead of overwriting
+    each other's, and a session recorded by two workers is still counted once.
+    """
+
+    def __init__(self, index: PercentileIndex, path: str, every: int = 100):
+        self.index = index
+        self.path = path
+        self.every = every
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._pending: List[Tuple[Dict[str, float], str, str, Optional[str]]] = []
+        self._saving = False
+        atexit.register(self.save)
+
+    def record(self, category_scores: Dict[str, float], industry: str, location: str,
+               session_id: Optional[str] = None) -> bool:
+        """Add a session to the index; False if it was already recorded."""
+        with self._lock:
+            if not self.index.add(category_scores, industry, location, session_id):
+                return False
+            self._pending.append((category_scores, industry, location, session_id))
+            due = len(self._pending) >= self.every and not self._saving
+            if due:
+                self._saving = True
+        if due:
+            threading.Thread(target=self._save_in_background, name="percentile-snapshot", daemon=True).start()
+        return True
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                with _file_lock(self.path):
+                    if os.path.exists(self.path):
+                        merged = PercentileIndex.load(self.path, **self.index.options())
+                    else:
+                        merged = PercentileIndex(self.index.resolution, self.index.max_score, **self.index.options())
+                    for session in pending:
+                        merged.add(*session)
+                    merged.save(self.path)
+            except Exception as e:
+                logger.warning(f"Failed to save percentile snapshot to {self.path}: {e}")
+                with self._lock:
+                    self._pending[:0] = pending
+                return
+            with self._lock:
+                # Sessions recorded while the snapshot was being written stay pending
+                for session in self._pending:
+                    merged.add(*session)
+                self.index.adopt(merged)
+
+    def _save_in_background(self):
+        try:
+            self.save()
+        finally:
+            with self._lock:
+                self._saving = False
+
+
+# Global percentile index (one per instance), enabled by PERCENTILE_INDEX_PATH
+percentile_index = None
+snapshot_writer = None
+# Set when the snapshot could not be loaded; the index stays off instead of retrying per request
+load_failed = False
+_percentile_index_lock = threading.Lock()
+
+
+def index_options() -> Dict[str, Any]:
+    """How the instance-wide index records sessions, from the environment."""
+    from .agent import CATEGORY_WEIGHTS
+
+    return {
+        "min_cohort_size": int(os.getenv("PERCENTILE_MIN_COHORT", "30")),
+        "categories": CATEGORY_WEIGHTS,
+        "max_slices": int(os.getenv("PERCENTILE_MAX_SLICES", "200")),
+        "max_sessions": int(os.getenv("PERCENTILE_SESSION_WINDOW", "100000")),
+    }
+
+
+def get_percentile_index() -> Optional[PercentileIndex]:
+    """
+    Get the instance-wide index, loading its snapshot on first use; None when disabled.
+    A snapshot that cannot be read disables the index for this process rather than
+    being overwritten by an empty one.
+    """
+    global percentile_index, snapshot_writer, load_failed
+    path = os.getenv("PERCENTILE_INDEX_PATH")
+    if not path or load_failed:
+        return None
+    with _percentile_index_lock:
+        if percentile_index is None and not load_failed:
+            options = index_options()
+            if os.path.exists(path):
+                try:
+                    percentile_index = PercentileIndex.load(path, **options)
+                except Exception as e:
+                    load_failed = True
+                    logger.error(f"Failed to load percentile snapshot {path}; cohort percentiles disabled: {e}")
+                    return None
+                logger.info(f"Loaded percentile index ({percentile_index.recorded} sessions) from {path}")
+            else:
+                percentile_index = PercentileIndex(**options)
+            snapshot_writer = SnapshotWriter(percentile_index, path, int(os.getenv("PERCENTILE_SNAPSHOT_EVERY", "100")))
+        return percentile_index
+
+
+def rank_and_record(category_scores: Dict[str, float], industry: str, location: str,
+                    session_id: Optional[str] = None) -> Optional[CohortPercentiles]:
+    """
+    Rank a session against the cohort so far, then add it to the cohort once.
+    Sessions without an id are only ranked: a retry could not be told from a new session.
+    """
+    index = get_percentile_index()
+    if index is None or not category_scores:
+        return None
+    percentiles = index.rank(category_scores, industry, location)
+    if session_id is not None:
+        snapshot_writer.record(category_scores, industry, location, session_id)
+    return percentiles
+
+
+def build_index(records: Iterable[dict], **options) -> PercentileIndex:
+    """Index exported sessions (scores or category_scores, industry, location, optional session_id)."""
+    index = PercentileIndex(**options)
+    for record in records:
+        scores = record.get("scores") or record.get("category_scores")
+        if scores:
+            index.add(scores, record.get("industry", ""), record.get("location", ""), record.get("session_id"))
+    return index
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build a cohort percentile snapshot from exported sessions (JSONL)")
+    parser.add_argument("input", help="JSONL file of sessions, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="Snapshot file to write (.npz)")
+    args = parser.parse_args(argv)
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with stream:
+        index = build_index((json.loads(line) for line in stream if line.strip()), **index_options())
+    index.save(args.output)
+    print(f"Indexed {index.recorded} sessions into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Deterministic multiple-choice scoring engine
+Gutcheck.AI - Server-side re-scoring using the LOCKED SCORING_MAPS and CATEGORY_WEIGHTS
+Mirrors ScoringService.calculateCategoryScore in src/application/services/ScoringService.ts:
+each answered question contributes (raw / 5) * (category weight / 5) to its category,
+and the category total is rounded half-up (JavaScript Math.round).
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .agent import AssessmentResponse, CATEGORY_WEIGHTS, SCORING_MAPS
+
+# QUESTION DEFINITIONS - EXACT COPY FROM src/domain/entities/Assessment.ts (ASSESSMENT_QUESTIONS)
+QUESTION_CATEGORIES = {
+    'q1': 'personalBackground', 'q2': 'personalBackground', 'q3': 'personalBackground',
+    'q4': 'personalBackground', 'q5': 'personalBackground',
+    'q6': 'entrepreneurialSkills', 'q7': 'entrepreneurialSkills', 'q8': 'entrepreneurialSkills',
+    'q9': 'entrepreneurialSkills', 'q10': 'entrepreneurialSkills',
+    'q11': 'resources', 'q12': 'resources', 'q13': 'resources', 'q14': 'resources', 'q15': 'resources',
+    'q16': 'behavioralMetrics', 'q17': 'behavioralMetrics', 'q18': 'behavioralMetrics',
+    'q19': 'behavioralMetrics', 'q20': 'behavioralMetrics',
+    'q21': 'growthVision', 'q22': 'growthVision', 'q23': 'growthVision', 'q24': 'growthVision',
+    'q25': 'growthVision',
+}
+
+QUESTION_TYPES = {
+    'q1': 'multipleChoice', 'q2': 'multipleChoice', 'q3': 'openEnded', 'q4': 'multipleChoice', 'q5': 'multipleChoice',
+    'q6': 'multipleChoice', 'q7': 'multipleChoice', 'q8': 'openEnded', 'q9': 'multiSelect', 'q10': 'likert',
+    'q11': 'multipleChoice', 'q12': 'multipleChoice', 'q13': 'multipleChoice', 'q14': 'multipleChoice', 'q15': 'multipleChoice',
+    'q16': 'multipleChoice', 'q17': 'multipleChoice', 'q18': 'openEnded', 'q19': 'likert', 'q20': 'multipleChoice',
+    'q21': 'multipleChoice', 'q22': 'multipleChoice', 'q23': 'openEnded', 'q24': 'multipleChoice', 'q25': 'multipleChoice',
+}
+
+QUESTION_OPTIONS = {
+    'q1': ['Idea/Concept stage', 'Early operations with a few customers', 'Established and generating consistent revenue'],
+    'q2': ['Solo entrepreneur', 'Small team (2–5 people)', 'Larger team (6+ people)'],
+    'q4': ["Yes – it's still running", 'Yes – it failed', 'No – this is my first'],
+    'q5': ['I saw a market opportunity', 'I needed income to support myself or my family', 'I wanted independence or flexibility', 'Other'],
+    'q6': ['Excellent: I can confidently manage budgets, forecasts, and financial analysis', 'Good: I understand basic budgeting and cash flow management', 'Fair: I need help understanding financial documents', 'Poor: I avoid managing finances whenever possible'],
+    'q7': ['Daily', 'Weekly', 'Monthly', 'Rarely or never'],
+    'q9': ['Business registration', 'EIN or tax ID obtained', 'Business bank account opened', 'First paying customer', 'Applied for a loan, grant, or accelerator'],
+    'q11': ['Lack of funding', 'Limited mentorship or guidance', 'Access to customers/markets', 'Difficulty scaling operations', 'Other'],
+    'q12': ["Yes, and it's sufficient for my current needs", "Yes, but it's not enough for my goals", 'No, I am entirely self-funded'],
+    'q13': ['Very strong: I can access mentors, investors, and industry contacts', 'Moderate: I have a few key connections', 'Weak: I need to build my network significantly'],
+    'q14': ['Yes', 'No'],
+    'q15': ['Weekly – I review goals and progress regularly', 'Monthly – I check in on big milestones', 'Occasionally – I track informally when I remember', 'Rarely or never – I focus on daily tasks more than long-term plans'],
+    'q16': ['1–10 hours', '11–20 hours', '21–40 hours', 'More than 40 hours'],
+    'q17': ['Yes, I prioritize physical well-being', 'Somewhat, I exercise occasionally', 'No, I do not have a fitness routine'],
+    'q20': ['Yes – and restarted', "Yes – but haven't restarted yet", 'No'],
+    'q21': ['A stable, small-scale operation', 'A growing business with regional impact', 'A scalable business with national or global reach'],
+    'q22': ['Bootstrapping with personal funds', 'Seeking investments (e.g., angel, VC)', 'Applying for loans or grants', 'Unsure'],
+    'q24': ['Yes – 1 to 5 jobs', 'Yes – more than 6 jobs', 'No', 'Not sure'],
+    'q25': ['Yes', 'No', 'Not sure'],
+}
+
+# Precomputed lookup tables
+QUESTION_IDS = tuple(QUESTION_CATEGORIES)
+CATEGORIES = tuple(CATEGORY_WEIGHTS)
+QUESTION_INDEX = {question_id: i for i, question_id in enumerate(QUESTION_IDS)}
+
+# (question id, option text) -> raw points, straight from SCORING_MAPS
+MULTIPLE_CHOICE_POINTS = {
+    (question_id, option): SCORING_MAPS[question_id][i]
+    for question_id, options in QUESTION_OPTIONS.items()
+    if QUESTION_TYPES[question_id] == 'multipleChoice'
+    for i, option in enumerate(options)
+}
+
+# One-hot question -> category matrix and category weight vector for the vectorized path
+CATEGORY_MATRIX = np.array(
+    [[1 if QUESTION_CATEGORIES[q] == category else 0 for category in CATEGORIES] for q in QUESTION_IDS],
+    dtype=np.int64
+)
+WEIGHT_VECTOR = np.array([CATEGORY_WEIGHTS[category] for category in CATEGORIES], dtype=np.float64)
+
+
+class ScoredAssessment(BaseModel):
+    """Deterministic scores for one assessment session"""
+    question_scores: Dict[str, float] = Field(description="Raw 1-5 score per answered question")
+    category_scores: Dict[str, int] = Field(description="Rounded score per category")
+    overall_score: int = Field(description="Sum of category scores (0-100)")
+    unscored_questions: List[str] = Field(default_factory=list,
+                                          description="Open-ended questions without a supplied AI score")
+
+
+class CohortScores(BaseModel):
+    """Scores for many sessions at once, columns in QUESTION_IDS / CATEGORIES order"""
+    model_config = {"arbitrary_types_allowed": True}
+
+    question_scores: np.ndarray = Field(description="sessions x questions raw scores (NaN = unanswered)")
+    category_scores: np.ndarray = Field(description="sessions x categories rounded scores")
+    overall_scores: np.ndarray = Field(description="Overall score per session")
+
+    def session(self, index: int) -> ScoredAssessment:
+        """Materialize one row as a ScoredAssessment."""
+        row = self.question_scores[index]
+        return ScoredAssessment(
+            question_scores={q: float(row[i]) for i, q in enumerate(QUESTION_IDS) if not math.isnan(row[i])},
+            category_scores={c: int(self.category_scores[index, j]) for j, c in enumerate(CATEGORIES)},
+            overall_score=int(self.overall_scores[index]),
+        )
+
+
+def _round_half_up(value: float) -> int:
+    # JavaScript Math.round semantics (Python's round() is banker's rounding)
+    return math.floor(value + 0.5)
+
+
+def raw_question_score(question_id: str, response, open_ended_score: Optional[float] = None) -> Optional[float]:
+    """
+    Raw 1-5 score for one response, matching the TypeScript client.
+    Returns None for open-ended questions without an AI score.
+    """
+    question_type = QUESTION_TYPES.get(question_id)
+    if question_type is None:
+        raise ValueError(f"Unknown question ID: {question_id}")
+
+    if question_type == 'multipleChoice':
+        # Unknown option text scores 0, exactly like scoreMultipleChoice
+        return MULTIPLE_CHOICE_POINTS.get((question_id, response), 0)
+    if question_type == 'multiSelect':
+        selected = response if isinstance(response, list) else [response]
+        return _round_half_up(len(selected) / len(QUESTION_OPTIONS[question_id]) * 5)
+    if question_type == 'likert':
+        value = int(response)
+        # Q19 (fear of failure) is inverted
+        return 6 - value if question_id == 'q19' else max(1, min(5, value))
+    return open_ended_score
+
+
+def score_responses(responses: Sequence[AssessmentResponse],
+                    open_ended_scores: Optional[Dict[str, float]] = None) -> ScoredAssessment:
+    """Score one session's raw responses into question, category and overall scores."""
+    open_ended_scores = open_ended_scores or {}
+    question_scores: Dict[str, float] = {}
+    unscored = []
+
+    for response in responses:
+        question_id = response.questionId
+        if question_id not in QUESTION_TYPES or question_id in question_scores:
+            continue
+        raw = raw_question_score(question_id, response.response, open_ended_scores.get(question_id))
+        if raw is None:
+            # Open-ended answer without an AI score contributes 0, like a failed validation
+            unscored.append(question_id)
+            raw = 0
+        question_scores[question_id] = raw
+
+    category_totals = {category: 0.0 for category in CATEGORIES}
+    for question_id, raw in question_scores.items():
+        category = QUESTION_CATEGORIES[question_id]
+        category_totals[category] += raw
+
+    category_scores = {
+        category: _round_half_up(total * CATEGORY_WEIGHTS[category] / 25)
+        for category, total in category_totals.items()
+    }
+
+    return ScoredAssessment(
+        question_scores=question_scores,
+        category_scores=category_scores,
+        overall_score=sum(category_scores.values()),
+        unscored_questions=unscored,
+    )
+
+
+def encode_sessions(sessions: Sequence[Sequence[AssessmentResponse]],
+                    open_ended_scores: Optional[Sequence[Dict[str, float]]] = None) -> np.ndarray:
+    """Turn raw responses into a sessions x questions matrix of raw scores (NaN = unanswered)."""
+    matrix = np.full((len(sessions), len(QUESTION_IDS)), np.nan)
+    for row, responses in enumerate(sessions):
+        session_open_ended = open_ended_scores[row] if open_ended_scores else {}
+        for response in responses:
+            column = QUESTION_INDEX.get(response.questionId)
+            if column is None or not math.isnan(matrix[row, column]):
+                continue
+            raw = raw_question_score(response.questionId, response.response,
+                                     session_open_ended.get(response.questionId))
+            matrix[row, column] = 0 if raw is None else raw
+    return matrix
+
+
+def score_matrix(question_scores: np.ndarray) -> CohortScores:
+    """Vectorized category and overall scoring of a sessions x questions raw score matrix."""
+    raw = np.nan_to_num(question_scores, nan=0.0)
+    # Summing raw points first keeps the arithmetic exact; the TypeScript per-question
+    # sum never lands within float error of a .5 boundary, so the rounding is identical
+    category_raw = raw @ CATEGORY_MATRIX
+    category_scores = np.floor(category_raw * WEIGHT_VECTOR / 25 + 0.5).astype(np.int64)
+    return CohortScores(
+        question_scores=question_scores,
+        category_scores=category_scores,
+        overall_scores=category_scores.sum(axis=1),
+    )
+
+
+def score_sessions(sessions: Sequence[Sequence[AssessmentResponse]],
+                   open_ended_scores: Optional[Sequence[Dict[str, float]]] = None) -> CohortScores:
+    """Score thousands of sessions in one call."""
+    return score_matrix(encode_sessions(sessions, open_ended_scores))
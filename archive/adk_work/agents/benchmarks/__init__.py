@@ -0,0 +1 @@
+"""Offline microbenchmarks for the agent and handler hot paths."""
@@ -0,0 +1,153 @@
+"""
+Benchmark cases for the agent and handler hot paths
+Everything runs offline: the open-ended scoring agent's model client is replaced
+with a stub that streams a canned JSON answer, and every open-ended request uses a
+fresh response so the scoring cache and request coalescing never short-circuit it.
+"""
+
+import itertools
+import json
+import os
+from typing import List
+
+from .harness import BenchmarkCase
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_SESSION_PATH = os.path.join(AGENTS_DIR, "test_agent_with_scores.json")
+
+STUB_RESPONSE = json.dumps({
+    "score": 4,
+    "explanation": "Clear milestones with evidence of execution and a credible plan for the next stage of growth."
+})
+
+
+class StubModel:
+    """Streams STUB_RESPONSE in a few chunks, like a fast model would"""
+
+    def __init__(self, response_text: str = STUB_RESPONSE, chunk_size: int = 32):
+        self.chunks = [response_text[i:i + chunk_size] for i in range(0, len(response_text), chunk_size)]
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        for chunk in self.chunks:
+            yield chunk
+
+
+def install_stub_model() -> StubModel:
+    """Route every open-ended scoring model call to a StubModel."""
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent
+
+    model = StubModel()
+    OpenEndedScoringAgent.model_client = property(lambda self: model)
+    return model
+
+
+def load_sample_session() -> dict:
+    with open(SAMPLE_SESSION_PATH) as f:
+        return json.load(f)
+
+
+def assessment_request_body(sample: dict) -> dict:
+    return {
+        "session_id": "bench-session",
+        "user_id": "bench-user",
+        "industry": sample["industry"],
+        "location": sample["location"],
+        "overall_score": sum(sample["scores"].values()),
+        "category_scores": sample["scores"],
+        "question_scores": {},
+        "responses": sample["responses"],
+    }
+
+
+def build_cases() -> List[BenchmarkCase]:
+    """Build every case; imports the agents, main.py and server.py."""
+    install_stub_model()
+
+    from flask import Flask, request as flask_request
+    from fastapi.testclient import TestClient
+
+    import main
+    import server
+    from assessment_analysis_agent.agent import AssessmentAgent, AssessmentSession
+    from assessment_analysis_agent.batch_analysis import analyze_sessions
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent, ScoringRequest
+
+    sample = load_sample_session()
+    sample_json = json.dumps(sample)
+    session = AssessmentSession(**sample)
+    assessment_body = json.dumps(assessment_request_body(sample)).encode()
+    assessment_agent = AssessmentAgent()
+    scoring_agent = OpenEndedScoringAgent()
+    counter = itertools.count()
+
+    def scoring_request() -> ScoringRequest:
+        return ScoringRequest(
+            question_id="q3",
+            response=f"Started consulting, landed three anchor clients, hired two people ({next(counter)})",
+            question_text="Tell us about your entrepreneurial journey."
+        )
+
+    flask_app = Flask("benchmarks")
+    client = TestClient(server.app)
+
+    def call_handler(handler, body: bytes):
+        with flask_app.test_request_context("/", method="POST", data=body, content_type="application/json"):
+            body, status, _ = handler(flask_request)
+        assert status == 200, body
+        return body
+
+    def check(response):
+        assert response.status_code == 200, response.text
+        return response
+
+    sessions_1k = [session] * 1000
+
+    return [
+        BenchmarkCase(
+            name="assessment_agent_run",
+            fn=lambda: assessment_agent.run(sample_json),
+            description="AssessmentAgent.run: JSON string in, JSON string out"
+        ),
+        BenchmarkCase(
+            name="analyze_assessment",
+            fn=lambda: assessment_agent._analyze_assessment(session),
+            description="Deterministic analysis of one validated session"
+        ),
+        BenchmarkCase(
+            name="batch_analysis_1k",
+            fn=lambda: analyze_sessions(sessions_1k),
+            iterations=20,
+            warmup=2,
+            description="Vectorized analysis of 1,000 sessions"
+        ),
+        BenchmarkCase(
+            name="open_ended_score_question",
+            fn=lambda: scoring_agent._score_question(scoring_request()),
+            description="Prompt build, streamed response parsing and caching with a stub model"
+        ),
+        BenchmarkCase(
+            name="main_process_assessment",
+            fn=lambda: call_handler(main.process_assessment_http, assessment_body),
+            description="functions_framework assessment handler"
+        ),
+        BenchmarkCase(
+            name="main_process_open_ended_scoring",
+            fn=lambda: call_handler(main.process_open_ended_scoring_http,
+                                    scoring_request().model_dump_json().encode()),
+            description="functions_framework open-ended scoring handler"
+        ),
+        BenchmarkCase(
+            name="server_process_assessment",
+            fn=lambda: check(client.post("/process_assessment", content=assessment_body,
+                                         headers={"Content-Type": "application/json"})),
+            description="FastAPI /process_assessment"
+        ),
+        BenchmarkCase(
+            name="server_score_open_ended_stream",
+            fn=lambda: check(client.post("/score_open_ended/stream", content=scoring_request().model_dump_json(),
+                                         headers={"Content-Type": "application/json"})),
+            description="FastAPI /score_open_ended/stream (NDJSON)"
+        ),
+    ]
@@ -0,0 +1,164 @@
+"""
+Benchmark harness
+Times a callable over many iterations for the latency distribution and throughput,
+keeping the fastest of a few rounds so scheduler noise does not read as a
+regression, then reruns a few iterations under tracemalloc for peak allocations. Results are
+compared against a JSON baseline; a case regresses when its p50 latency or peak
+allocation grows by more than the threshold.
+"""
+
+import asyncio
+import gc
+import json
+import os
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+# Metrics compared against the baseline (higher is worse for all of them), with the
+# absolute change below which a difference is treated as noise
+COMPARED_METRICS = {"p50_ms": 0.01, "peak_alloc_kb": 1.0}
+
+
+class BenchmarkCase(BaseModel):
+    """A named callable to benchmark; coroutine functions run on the harness loop"""
+    model_config = {"arbitrary_types_allowed": True}
+
+    name: str
+    fn: Callable[[], Union[Any, Awaitable[Any]]]
+    iterations: int = 200
+    warmup: int = 10
+    description: str = ""
+
+
+class BenchmarkResult(BaseModel):
+    """Latency distribution, throughput and peak allocation of one case"""
+    name: str
+    iterations: int
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    throughput_per_s: float
+    peak_alloc_kb: float
+
+
+class Regression(BaseModel):
+    """A metric that got worse than baseline by more than the threshold"""
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    change: float = Field(description="Relative change, e.g. 0.25 = 25% worse")
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    # Nearest-rank on the sorted samples
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+
+class Harness:
+    """Runs benchmark cases on one event loop."""
+
+    def __init__(self, rounds: int = 3, alloc_iterations: int = 20):
+        self.rounds = rounds
+        self.alloc_iterations = alloc_iterations
+        self.loop = asyncio.new_event_loop()
+
+    def close(self):
+        self.loop.close()
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        result = fn()
+        if asyncio.iscoroutine(result):
+            result = self.loop.run_until_complete(result)
+        return result
+
+    def run(self, case: BenchmarkCase, iterations: Optional[int] = None) -> BenchmarkResult:
+        iterations = iterations or case.iterations
+        for _ in range(case.warmup):
+            self.call(case.fn)
+
+        # Keep collector pauses out of individual samples
+        gc.collect()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        best = None
+        try:
+            for _ in range(self.rounds):
+                samples = []
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    call_start = time.perf_counter_ns()
+                    self.call(case.fn)
+                    samples.append((time.perf_counter_ns() - call_start) / 1e6)
+                elapsed = time.perf_counter() - start
+                if best is None or sorted(samples)[len(samples) // 2] < sorted(best[0])[len(best[0]) // 2]:
+                    best = (samples, elapsed)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        samples, elapsed = best
+        ordered = sorted(samples)
+        return BenchmarkResult(
+            name=case.name,
+            iterations=iterations,
+            mean_ms=round(sum(samples) / len(samples), 4),
+            p50_ms=round(_quantile(ordered, 0.50), 4),
+            p95_ms=round(_quantile(ordered, 0.95), 4),
+            p99_ms=round(_quantile(ordered, 0.99), 4),
+            max_ms=round(ordered[-1], 4),
+            throughput_per_s=round(iterations / elapsed, 1),
+            peak_alloc_kb=round(self.peak_allocation(case) / 1024, 1),
+        )
+
+    def peak_allocation(self, case: BenchmarkCase) -> int:
+        """Largest bytes allocated above the starting point during any single call."""
+        tracemalloc.start()
+        try:
+            peak = 0
+            for _ in range(min(self.alloc_iterations, case.iterations)):
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                self.call(case.fn)
+                _, call_peak = tracemalloc.get_traced_memory()
+                peak = max(peak, call_peak - baseline)
+            return peak
+        finally:
+            tracemalloc.stop()
+
+
+def load_baseline(path: str) -> Dict[str, BenchmarkResult]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {name: BenchmarkResult(**result) for name, result in data.get("results", {}).items()}
+
+
+def save_baseline(path: str, results: List[BenchmarkResult]):
+    with open(path, "w") as f:
+        json.dump({"results": {result.name: result.model_dump() for result in results}}, f, indent=2)
+        f.write("\n")
+
+
+def compare(results: List[BenchmarkResult], baseline: Dict[str, BenchmarkResult],
+            threshold: float) -> List[Regression]:
+    """Metrics that are worse than baseline by more than threshold (a fraction)."""
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.name)
+        if previous is None:
+            continue
+        for metric, noise_floor in COMPARED_METRICS.items():
+            before, now = getattr(previous, metric), getattr(result, metric)
+            if now - before > noise_floor and before > 0 and (now - before) / before > threshold:
+                regressions.append(Regression(
+                    name=result.name, metric=metric, baseline=before, current=now,
+                    change=round((now - before) / before, 3)
+                ))
+    return regressions
@@ -0,0 +1,85 @@
+"""
+Run the offline benchmark suite and compare against the stored baseline
+
+    python -m benchmarks.run                       # report and flag regressions
+    python -m benchmarks.run --only analyze_assessment --iterations 1000
+    python -m benchmarks.run --update-baseline     # record this machine's numbers
+
+Exits with status 1 when any case regresses by more than --threshold.
+Baselines are machine-specific; record them on the machine that runs the comparison.
+"""
+
+import argparse
+import logging
+import os
+import sys
+from typing import List, Optional
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AGENTS_DIR)
+
+from benchmarks.harness import Harness, compare, load_baseline, save_baseline  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def format_table(results, baseline) -> str:
+    header = f"{'case':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'peak KB':>10}{'p50 vs base':>13}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        previous = baseline.get(result.name)
+        change = f"{(result.p50_ms - previous.p50_ms) / previous.p50_ms:+.1%}" if previous and previous.p50_ms else "new"
+        lines.append(f"{result.name:<34}{result.p50_ms:>10.3f}{result.p95_ms:>10.3f}{result.p99_ms:>10.3f}"
+                     f"{result.throughput_per_s:>10.0f}{result.peak_alloc_kb:>10.1f}{change:>13}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the agent and handler hot paths")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative slowdown / allocation growth before flagging (default 0.25 = 25%%)")
+    parser.add_argument("--iterations", type=int, help="Override iterations for every case")
+    parser.add_argument("--only", action="append", help="Run only these cases (repeatable)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    # Model calls are stubbed; keep the per-request logging out of the timings
+    logging.disable(logging.INFO)
+
+    from benchmarks.cases import build_cases
+    cases = [case for case in build_cases() if not args.only or case.name in args.only]
+    if not cases:
+        parser.error(f"No cases match {args.only}")
+
+    harness = Harness()
+    try:
+        results = []
+        for case in cases:
+            print(f"Running {case.name}...", file=sys.stderr)
+            results.append(harness.run(case, args.iterations))
+    finally:
+        harness.close()
+
+    baseline = load_baseline(args.baseline)
+    print(format_table(results, baseline))
+
+    if args.update_baseline:
+        # Keep baselines of cases that were not run this time
+        merged = {**baseline, **{result.name: result for result in results}}
+        save_baseline(args.baseline, list(merged.values()))
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression.name} {regression.metric}: {regression.baseline} -> {regression.current} "
+                  f"({regression.change:+.1%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
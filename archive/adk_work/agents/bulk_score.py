@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Bulk cohort scoring
+Re-runs open-ended scoring and the deterministic assessment analysis over an
+exported cohort (one AssessmentSession JSON object per line) and streams the
+results out as JSONL, in input order. Progress is checkpointed next to the
+output file so an interrupted run picks up where it stopped; the checkpoint
+records which input it belongs to and a run against a different or modified
+input refuses to resume.
+
+    python bulk_score.py cohort.jsonl -o results.jsonl
+    python bulk_score.py cohort.jsonl -o results.jsonl --score-open-ended --llm-concurrency 16
+    cat cohort.jsonl | python bulk_score.py - -o results.jsonl
+
+Records without category scores are scored with the deterministic scoring engine.
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker():
+    """Import the analysis modules once per worker process."""
+    import assessment_analysis_agent.batch_analysis  # noqa: F401
+
+
+def build_session(record: Dict[str, Any], open_ended_scores: Dict[str, int]):
+    """Validate one record as an AssessmentSession, scoring it when it has no category scores."""
+    from assessment_analysis_agent.agent import AssessmentSession
+    from assessment_analysis_agent.scoring_engine import score_responses
+
+    # Exports from the web app use category_scores, the agent uses scores
+    scores = record.get("scores") or record.get("category_scores") or {}
+    session = AssessmentSession(
+        responses=record.get("responses", []),
+        scores=scores,
+        industry=record.get("industry", ""),
+        location=record.get("location", "")
+    )
+    if not session.scores:
+        session.scores = score_responses(session.responses, open_ended_scores).category_scores
+    return session
+
+
+def analyze_chunk(items: List[Tuple[Dict[str, Any], Dict[str, int]]]) -> List[Dict[str, Any]]:
+    """Analyze a chunk of records in one round trip to the worker; errors are per record."""
+    from assessment_analysis_agent.batch_analysis import analyze_sessions
+
+    outcomes: List[Dict[str, Any]] = []
+    sessions = []
+    for record, open_ended_scores in items:
+        try:
+            sessions.append(build_session(record, open_ended_scores))
+            outcomes.append(None)
+        except Exception as e:
+            outcomes.append({"error": str(e)})
+
+    # One vectorized pass over every valid record in the chunk
+    analyses = iter(analyze_sessions(sessions))
+    valid = iter(sessions)
+    for i, outcome in enumerate(outcomes):
+        if outcome is None:
+            session = next(valid)
+            outcomes[i] = {"scores": session.scores, "analysis": next(analyses).model_dump()}
+    return outcomes
+
+
+async def score_open_ended(agent, record: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Score a record's open-ended answers with one batch call."""
+    from open_ended_scoring_agent.agent import BatchScoringRequest, ScoringRequest, QUESTION_TYPE_MAP
+
+    # A question answered more than once is scored on its last answer
+    questions = list({
+        r["questionId"]: ScoringRequest(question_id=r["questionId"], response=r["response"], question_text="")
+        for r in record.get("responses", [])
+        if r.get("questionId") in QUESTION_TYPE_MAP and isinstance(r.get("response"), str) and r["response"].strip()
+    }.values())
+    if not questions:
+        return {}
+
+    result = await agent.score_batch(BatchScoringRequest(session_id=record.get("session_id"), questions=questions))
+    return {
+        item.question_id: {"score": item.score, "explanation": item.explanation}
+        for item in result.results if item.success
+    }
+
+
+def input_fingerprint(path: str) -> Dict[str, Any]:
+    """Identifies the input a checkpoint belongs to; stdin cannot be checked beyond its name."""
+    if path == "-":
+        return {"path": "-"}
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class Checkpoint:
+    """Input lines consumed and output bytes written, saved atomically with the input they came from."""
+
+    def __init__(self, path: str, source: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.source = source
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, input_lines: int, output_bytes: int, complete: bool = False):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"input": self.source, "input_lines": input_lines, "output_bytes": output_bytes,
+                       "complete": complete}, f)
+        os.replace(tmp_path, self.path)
+
+
+class BulkScorer:
+    """Streams records through LLM scoring and the analysis pool with a bounded window."""
+
+    def __init__(self, executor: concurrent.futures.Executor, scoring_agent=None,
+                 llm_concurrency: int = 8, chunk_size: int = 64, max_in_flight: int = 16,
+                 checkpoint_every: int = 100):
+        self.executor = executor
+        self.scoring_agent = scoring_agent
+        self.llm_concurrency = llm_concurrency
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight
+        self.checkpoint_every = checkpoint_every
+        self.processed = 0
+        self.failed = 0
+
+    async def _score_line(self, line_no: int, line: str, semaphore: asyncio.Semaphore):
+        record = json.loads(line)
+        open_ended = {}
+        if self.scoring_agent is not None:
+            async with semaphore:
+                open_ended = await score_open_ended(self.scoring_agent, record)
+        return record, open_ended
+
+    async def process(self, first_line: int, lines: List[str], semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """Score and analyze a chunk of input lines; errors are reported per record."""
+        numbered = [(first_line + i, line) for i, line in enumerate(lines) if line.strip()]
+        scored = await asyncio.gather(
+            *(self._score_line(line_no, line, semaphore) for line_no, line in numbered),
+            return_exceptions=True
+        )
+
+        results: List[Optional[Dict[str, Any]]] = []
+        to_analyze = []
+        for (line_no, _), outcome in zip(numbered, scored):
+            if isinstance(outcome, Exception):
+                results.append({"line": line_no, "session_id": None, "success": False, "error": str(outcome)})
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                record, open_ended = outcome
+                results.append({"line": line_no, "session_id": record.get("session_id"),
+                                "open_ended_scores": open_ended})
+                to_analyze.append((record, {q: item["score"] for q, item in open_ended.items()}))
+
+        loop = asyncio.get_running_loop()
+        analyzed = iter(await loop.run_in_executor(self.executor, analyze_chunk, to_analyze) if to_analyze else [])
+        for result in results:
+            if "success" in result:
+                continue
+            outcome = next(analyzed)
+            if "error" in outcome:
+                result.update(success=False, error=outcome["error"])
+                del result["open_ended_scores"]
+            else:
+                result.update(success=True, scores=outcome["scores"], analysis=outcome["analysis"])
+        return results
+
+    def _read_chunk(self, stream) -> List[str]:
+        lines = []
+        for _ in range(self.chunk_size):
+            line = stream.readline()
+            if not line:
+                break
+            lines.append(line)
+        return lines
+
+    async def run(self, stream, output, checkpoint: Checkpoint, skip_lines: int = 0):
+        """Consume the input stream, writing results in order and checkpointing as it goes."""
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
+        pending = collections.deque()
+        line_no = 0
+        consumed = skip_lines
+        since_checkpoint = 0
+
+        async def write_next():
+            nonlocal consumed, since_checkpoint
+            last_line, task = pending.popleft()
+            for result in await task:
+                output.write((json.dumps(result) + "\n").encode("utf-8"))
+                self.processed += 1
+                self.failed += 0 if result["success"] else 1
+                since_checkpoint += 1
+            consumed = last_line
+            if since_checkpoint >= self.checkpoint_every:
+                output.flush()
+                checkpoint.save(consumed, output.tell())
+                since_checkpoint = 0
+
+        complete = False
+        try:
+            while True:
+                # Read off the loop thread so a slow stdin does not stall in-flight work
+                lines = await loop.run_in_executor(None, self._read_chunk, stream)
+                if not lines:
+                    break
+                first_line = line_no + 1
+                line_no += len(lines)
+                if line_no <= skip_lines:
+                    continue
+                if first_line <= skip_lines:
+                    lines = lines[skip_lines - first_line + 1:]
+                    first_line = skip_lines + 1
+                pending.append((line_no, asyncio.ensure_future(self.process(first_line, lines, semaphore))))
+                if len(pending) >= self.max_in_flight:
+                    await write_next()
+            while pending:
+                await write_next()
+            complete = True
+        finally:
+            for _, task in pending:
+                task.cancel()
+            output.flush()
+            checkpoint.save(consumed, output.tell(), complete=complete)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score and analyze an exported assessment cohort")
+    parser.add_argument("input", help="JSONL file of assessment sessions, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to write results to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Analysis processes (0 runs analysis in a thread, for debugging)")
+    parser.add_argument("--score-open-ended", action="store_true",
+                        help="Score q3/q8/q18/q23 with the open-ended scoring agent")
+    parser.add_argument("--llm-concurrency", type=int, default=8,
+                        help="Sessions being scored by the model at once")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Records sent to a worker at a time")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Chunks held in memory at once (default: 2 per worker)")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="Records between checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    checkpoint = Checkpoint(f"{args.output}.checkpoint", input_fingerprint(args.input))
+    state = None if args.restart else checkpoint.load()
+
+    if state and state.get("input") != checkpoint.source:
+        # Skipping input_lines of a different file would silently drop records
+        parser.error(f"{checkpoint.path} was written for {(state.get('input') or {}).get('path', 'another input')}, "
+                     f"not this {args.input}; pass --restart to score it from the beginning")
+    if state and not os.path.exists(args.output):
+        logger.warning(f"{args.output} no longer exists; starting from the first input line")
+        state = None
+    if state and state.get("complete"):
+        logger.info(f"{args.output} is already complete; pass --restart to score again")
+        return
+    if state:
+        # Drop anything written after the last checkpoint; those records are redone
+        with open(args.output, "r+b") as f:
+            f.truncate(state["output_bytes"])
+        output = open(args.output, "ab")
+        skip_lines = state["input_lines"]
+        logger.info(f"Resuming after input line {skip_lines}")
+    else:
+        output = open(args.output, "wb")
+        skip_lines = 0
+
+    scoring_agent = None
+    if args.score_open_ended:
+        from open_ended_scoring_agent.agent import get_root_agent
+        scoring_agent = get_root_agent()
+
+    if args.workers > 0:
+        executor = concurrent.futures.ProcessPoolExecutor(args.workers, initializer=_init_worker)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(1, initializer=_init_worker)
+
+    scorer = BulkScorer(
+        executor,
+        scoring_agent=scoring_agent,
+        llm_concurrency=args.llm_concurrency,
+        chunk_size=args.chunk_size,
+        max_in_flight=args.max_in_flight or 2 * max(args.workers, 1),
+        checkpoint_every=args.checkpoint_every
+    )
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        asyncio.run(scorer.run(stream, output, checkpoint, skip_lines=skip_lines))
+    finally:
+        executor.shutdown(cancel_futures=True)
+        output.close()
+        if stream is not sys.stdin:
+            stream.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Processed {scorer.processed} records ({scorer.failed} failed) in {elapsed:.1f}s "
+                f"({scorer.processed / elapsed if elapsed else 0:.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration for the multi-worker production server
+
+    gunicorn -c gunicorn.conf.py server:app
+
+Runs SERVER_WORKERS uvicorn workers (default: one per CPU). The app and agents
+are loaded once in the master and inherited by the forked workers, and open-ended
+scores are shared between workers through a SQLite cache file. For local
+development `python server.py` still runs a single process.
+"""
+
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("SERVER_WORKERS", "0")) or multiprocessing.cpu_count()
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+# Streams stay open while the model generates; do not kill workers mid-response
+timeout = int(os.getenv("SERVER_WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = None
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+# Workers share scored results; set to an empty string to keep caches per worker
+os.environ.setdefault("SCORING_SHARED_CACHE_PATH", "/tmp/gutcheck/scoring_cache.sqlite3")
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before any worker is forked."""
+    import server as app_module
+
+    app_module.preload_agents()
+    # Move everything loaded so far out of the collector's reach, so collections in
+    # the workers do not write to (and un-share) the inherited pages
+    gc.freeze()
+    server.log.info(f"Agents preloaded; starting {workers} workers")
@@ -0,0 +1 @@
+"""Local model stand-in and load generator for capacity testing."""
@@ -0,0 +1,254 @@
+"""
+Local Gemini stand-in for load tests
+Answers open-ended scoring prompts with a canned JSON score after a sampled
+latency, streamed in chunks, with optional malformed answers, injected 429/500
+errors and a requests-per-minute limit. No quota is spent.
+
+Two ways to plug it in:
+
+  * Over HTTP, through the real shared model client: run the server and point
+    GEMINI_BASE_URL at it (it speaks the generativelanguage streamGenerateContent
+    API that google-genai calls)
+
+        python -m loadtest.fake_gemini --port 8090 --latency lognormal:0.8,0.6 --rate-429 0.02
+        GEMINI_BASE_URL=http://127.0.0.1:8090 GEMINI_API_KEY=fake python server.py
+
+  * In process: use FakeGemini as the backend of a ModelEndpoint, or as the
+    agent's model_client in tests; it has the same generate_content_async(prompt).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from runtime.model_client import TokenBucket
+
+
+class LatencyDistribution:
+    """
+    Time to first chunk, in seconds, from a spec string:
+      fixed:0.2              always 0.2s
+      lognormal:0.8,0.6      median 0.8s, sigma 0.6 (long right tail)
+      bimodal:0.3,2.5,0.1    0.3s usually, 2.5s for 10% of calls
+    """
+
+    KINDS = {"fixed": 1, "lognormal": 2, "bimodal": 3}
+
+    def __init__(self, kind: str, params: List[float]):
+        if kind not in self.KINDS or len(params) != self.KINDS[kind]:
+            raise ValueError(f"Unknown latency distribution {kind}:{params}")
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, values = spec.partition(":")
+        try:
+            params = [float(value) for value in values.split(",") if value]
+        except ValueError:
+            raise ValueError(f"Invalid latency spec: {spec}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return rng.lognormvariate(math.log(median), sigma)
+        fast, slow, slow_fraction = self.params
+        return slow if rng.random() < slow_fraction else fast
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class FakeGeminiConfig(BaseModel):
+    """Behaviour of the fake model"""
+    latency: str = Field(default="fixed:0.2", description="Time-to-first-chunk distribution spec")
+    chunk_size: int = Field(default=16, description="Characters per streamed chunk")
+    chunk_delay: float = Field(default=0.01, description="Seconds between chunks")
+    malformed_rate: float = Field(default=0.0, description="Fraction of answers that are not valid JSON")
+    rate_429: float = Field(default=0.0, description="Fraction of calls rejected with 429")
+    rate_500: float = Field(default=0.0, description="Fraction of calls failing with 500")
+    rpm: Optional[float] = Field(default=None, description="Requests per minute before 429s (None = unlimited)")
+    retry_after: float = Field(default=1.0, description="Retry-After seconds sent with 429s")
+    seed: Optional[int] = Field(default=None, description="Random seed for reproducible runs")
+
+
+class FakeModelError(Exception):
+    """Injected failure, shaped like an HTTP error so the model client classifies it the same way"""
+
+    STATUS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL"}
+
+    def __init__(self, code: int, retry_after: Optional[float] = None):
+        self.code = code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=code, headers=headers)
+        super().__init__(f"{code} {self.STATUS.get(code, 'ERROR')} (injected by fake Gemini)")
+
+
+class FakeGemini:
+    """The fake model; generate_content_async(prompt) streams an answer or raises FakeModelError."""
+
+    def __init__(self, config: Optional[FakeGeminiConfig] = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Any] = asyncio.sleep):
+        self.config = config or FakeGeminiConfig()
+        self.latency = LatencyDistribution.parse(self.config.latency)
+        self.sleep = sleep
+        self.rng = random.Random(self.config.seed)
+        self.bucket = TokenBucket(self.config.rpm, clock) if self.config.rpm else None
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "ok": 0, "malformed": 0, "rate_limited": 0, "errors_429": 0, "errors_500": 0}
+
+    def response_text(self, prompt: str, malformed: bool = False) -> str:
+        """Deterministic answer for a prompt, so repeated prompts score the same."""
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        score = 1 + digest[0] % 5
+        if malformed:
+            # The kinds of broken output real models produce: truncated JSON or prose
+            return ('{"score": %d, "explanation": "Cut off mid-sentence' % score if digest[1] % 2
+                    else f"I would rate this response a {score} because it shows some progress.")
+        return json.dumps({
+            "score": score,
+            "explanation": f"Simulated evaluation ({score}/5): the response shows "
+                           f"{'clear, specific evidence' if score >= 4 else 'limited evidence'} of execution."
+        })
+
+    def admit(self):
+        """Apply the rate limit and injected errors; raises FakeModelError for a rejected call."""
+        with self._lock:
+            self.counts["calls"] += 1
+            if self.bucket is not None:
+                if self.bucket.available() < 1:
+                    self.counts["rate_limited"] += 1
+                    raise FakeModelError(429, self.config.retry_after)
+                self.bucket.take(1)
+            roll = self.rng.random()
+            if roll < self.config.rate_429:
+                self.counts["errors_429"] += 1
+                raise FakeModelError(429, self.config.retry_after)
+            if roll < self.config.rate_429 + self.config.rate_500:
+                self.counts["errors_500"] += 1
+                raise FakeModelError(500)
+            malformed = self.rng.random() < self.config.malformed_rate
+            self.counts["malformed" if malformed else "ok"] += 1
+            return malformed, self.latency.sample(self.rng)
+
+    async def generate_content_async(self, prompt: str) -> AsyncIterator[str]:
+        malformed, latency = self.admit()
+        await self.sleep(latency)
+        text = self.response_text(prompt, malformed)
+        for i in range(0, len(text), self.config.chunk_size):
+            if i:
+                await self.sleep(self.config.chunk_delay)
+            yield text[i:i + self.config.chunk_size]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+def _prompt_from_body(body: Dict[str, Any]) -> str:
+    return "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+
+def _candidate(text: str, finished: bool = False) -> Dict[str, Any]:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate]}
+
+
+def create_app(fake: FakeGemini):
+    """FastAPI app serving the generativelanguage v1beta generateContent endpoints."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Fake Gemini")
+
+    def error_response(e: FakeModelError) -> JSONResponse:
+        headers = {"Retry-After": e.response.headers["retry-after"]} if "retry-after" in e.response.headers else None
+        return JSONResponse(
+            status_code=e.code,
+            content={"error": {"code": e.code, "message": str(e), "status": FakeModelError.STATUS[e.code]}},
+            headers=headers
+        )
+
+    @app.post("/{version}/models/{model}:streamGenerateContent")
+    async def stream_generate_content(version: str, model: str, request: Request):
+        prompt = _prompt_from_body(await request.json())
+        stream = fake.generate_content_async(prompt)
+        try:
+            # Errors are decided before the first chunk, so they can still be a proper status code
+            first = await stream.__anext__()
+        except FakeModelError as e:
+            return error_response(e)
+
+        async def events():
+            yield f"data: {json.dumps(_candidate(first))}\r\n\r\n"
+            async for chunk in stream:
+                yield f"data: {json.dumps(_candidate(chunk))}\r\n\r\n"
+            yield f"data: {json.dumps(_candidate('', finished=True))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/{version}/models/{model}:generateContent")
+    async def generate_content(version: str, model: str, request: Request):
+        prompt = _prompt_from_body(await request.json())
+        try:
+            text = "".join([chunk async for chunk in fake.generate_content_async(prompt)])
+        except FakeModelError as e:
+            return error_response(e)
+        return _candidate(text, finished=True)
+
+    @app.get("/{version}/models/{model}")
+    async def get_model(version: str, model: str):
+        # Model metadata, as used by the client warm-up
+        return {"name": f"models/{model}", "displayName": model, "supportedGenerationMethods": ["generateContent"]}
+
+    @app.get("/stats")
+    async def stats():
+        return fake.stats()
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Local Gemini stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:0.2",
+                        help="fixed:S | lognormal:MEDIAN,SIGMA | bimodal:FAST,SLOW,SLOW_FRACTION (seconds)")
+    parser.add_argument("--chunk-size", type=int, default=16)
+    parser.add_argument("--chunk-delay", type=float, default=0.01)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-500", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, help="Requests per minute before answering 429")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    config = FakeGeminiConfig(
+        latency=args.latency, chunk_size=args.chunk_size, chunk_delay=args.chunk_delay,
+        malformed_rate=args.malformed_rate, rate_429=args.rate_429, rate_500=args.rate_500,
+        rpm=args.rpm, seed=args.seed
+    )
+    LatencyDistribution.parse(config.latency)
+    uvicorn.run(create_app(FakeGemini(config)), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
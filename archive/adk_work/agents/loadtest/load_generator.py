@@ -0,0 +1,204 @@
+"""
+Open-loop load generator for server.py and the main.py handlers
+Sends requests at a target rate regardless of how fast responses come back, and
+measures each latency from the request's scheduled start so queueing inside the
+generator is not hidden (no coordinated omission).
+
+    # FastAPI server
+    python -m loadtest.load_generator --url http://127.0.0.1:8000/score_open_ended/stream --payload open_ended --rps 20
+    # A functions_framework handler from main.py
+    functions-framework --source main.py --target process_assessment_http --port 8081
+    python -m loadtest.load_generator --url http://127.0.0.1:8081 --payload assessment --rps 50 --duration 60
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel, Field
+
+AGENTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_SESSION_PATH = os.path.join(AGENTS_DIR, "test_agent_with_scores.json")
+
+OPEN_ENDED_QUESTIONS = {
+    "q3": "Tell us about your entrepreneurial journey.",
+    "q8": "Describe a business challenge you faced and how you handled it.",
+    "q18": "Tell us about a setback and how you responded.",
+    "q23": "What is your long-term vision for your business?",
+}
+
+
+def payload_factory(kind: str, seed: int = 0) -> Callable[[], Dict]:
+    """Request bodies of one kind; open-ended responses vary so caches do not answer everything."""
+    rng = random.Random(seed)
+    counter = itertools.count()
+
+    def open_ended_question(question_id: str) -> Dict:
+        return {
+            "question_id": question_id,
+            "response": f"Bootstrapped for {rng.randint(1, 9)} years, {rng.randint(1, 50)} customers "
+                        f"and a plan to hire (request {next(counter)})",
+            "question_text": OPEN_ENDED_QUESTIONS[question_id],
+        }
+
+    if kind == "assessment":
+        with open(SAMPLE_SESSION_PATH) as f:
+            sample = json.load(f)
+
+        def assessment() -> Dict:
+            return {
+                "session_id": f"load-{next(counter)}",
+                "user_id": "load-test",
+                "industry": sample["industry"],
+                "location": sample["location"],
+                "overall_score": sum(sample["scores"].values()),
+                "category_scores": sample["scores"],
+                "question_scores": {},
+                "responses": sample["responses"],
+            }
+        return assessment
+    if kind == "open_ended":
+        return lambda: open_ended_question(rng.choice(list(OPEN_ENDED_QUESTIONS)))
+    if kind == "open_ended_batch":
+        return lambda: {"questions": [open_ended_question(q) for q in OPEN_ENDED_QUESTIONS]}
+    raise ValueError(f"Unknown payload kind: {kind}")
+
+
+class LoadReport(BaseModel):
+    """Outcome of one load run; latencies in milliseconds from the scheduled start"""
+    target_rps: float
+    achieved_rps: float = Field(description="Completed requests per second of run time")
+    duration_seconds: float
+    sent: int
+    completed: int
+    dropped: int = Field(description="Not sent because max_in_flight requests were outstanding")
+    status_codes: Dict[str, int]
+    errors: Dict[str, int] = Field(description="Transport errors by exception type")
+    latency_ms: Dict[str, float]
+    first_byte_ms: Dict[str, float]
+
+
+def quantiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"p50": at(0.50), "p90": at(0.90), "p99": at(0.99), "max": round(ordered[-1], 2),
+            "mean": round(sum(ordered) / len(ordered), 2)}
+
+
+class LoadGenerator:
+    """Fires requests at a target rate for a fixed duration and collects their outcomes."""
+
+    def __init__(self, client: httpx.AsyncClient, url: str, payload: Callable[[], Dict], rps: float,
+                 duration: float, arrival: str = "constant", max_in_flight: int = 1000, seed: int = 0):
+        if arrival not in ("constant", "poisson"):
+            raise ValueError(f"Unknown arrival process: {arrival}")
+        self.client = client
+        self.url = url
+        self.payload = payload
+        self.rps = rps
+        self.duration = duration
+        self.arrival = arrival
+        self.max_in_flight = max_in_flight
+        self.rng = random.Random(seed)
+
+        self.latencies: List[float] = []
+        self.first_bytes: List[float] = []
+        self.status_codes: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.dropped = 0
+        self._in_flight = 0
+
+    async def run(self) -> LoadReport:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tasks = []
+        scheduled = 0.0
+        for i in itertools.count(1):
+            if scheduled >= self.duration:
+                break
+            delay = start + scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._in_flight >= self.max_in_flight:
+                self.dropped += 1
+            else:
+                tasks.append(asyncio.create_task(self._send(start + scheduled)))
+            # Constant arrivals are computed from the index so float error does not add up
+            scheduled = scheduled + self.rng.expovariate(self.rps) if self.arrival == "poisson" else i / self.rps
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - start
+
+        return LoadReport(
+            target_rps=self.rps,
+            achieved_rps=round(len(self.latencies) / elapsed, 2),
+            duration_seconds=round(elapsed, 2),
+            sent=len(tasks),
+            completed=len(self.latencies),
+            dropped=self.dropped,
+            status_codes={str(code): count for code, count in sorted(self.status_codes.items())},
+            errors=dict(self.errors),
+            latency_ms=quantiles(self.latencies),
+            first_byte_ms=quantiles(self.first_bytes),
+        )
+
+    async def _send(self, scheduled_at: float):
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        try:
+            async with self.client.stream("POST", self.url, json=self.payload()) as response:
+                first_byte = None
+                async for _ in response.aiter_raw():
+                    if first_byte is None:
+                        first_byte = loop.time()
+                finished = loop.time()
+            self.status_codes[response.status_code] += 1
+            self.latencies.append((finished - scheduled_at) * 1000)
+            self.first_bytes.append(((first_byte or finished) - scheduled_at) * 1000)
+        except Exception as e:
+            self.errors[type(e).__name__] += 1
+        finally:
+            self._in_flight -= 1
+
+
+async def run_load(url: str, payload_kind: str, rps: float, duration: float, arrival: str = "constant",
+                   max_in_flight: int = 1000, timeout: float = 60.0, seed: int = 0,
+                   transport: Optional[httpx.AsyncBaseTransport] = None) -> LoadReport:
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits, transport=transport) as client:
+        generator = LoadGenerator(client, url, payload_factory(payload_kind, seed), rps, duration,
+                                  arrival, max_in_flight, seed)
+        return await generator.run()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the agent endpoints")
+    parser.add_argument("--url", required=True, help="Endpoint to POST to")
+    parser.add_argument("--payload", required=True, choices=["assessment", "open_ended", "open_ended_batch"])
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to send for")
+    parser.add_argument("--arrival", choices=["constant", "poisson"], default="poisson")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(args.url, args.payload, args.rps, args.duration, args.arrival,
+                                  args.max_in_flight, args.timeout, args.seed))
+    print(json.dumps(report.model_dump(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
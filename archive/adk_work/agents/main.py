@@ -2,126 +2,83 @@
 """
 Cloud Functions entry point for Assessment Analysis Agent
 This file is the entry point specified in cloudbuild.yaml
+
+Agents and heavy SDKs are imported on first use, so each deployed entry point
+only pays for what it actually calls. The FastAPI app lives in server.py.
 """
 
 import os
 import json
 import logging
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import ValidationError
 import functions_framework
 
-# Import the agents
-from assessment_analysis_agent.agent import AssessmentAgent
-from open_ended_scoring_agent.agent import root_agent as open_ended_agent
+from runtime.admission import AdmissionRejected, get_admission_controller
+from runtime.event_loop import run_sync
+from runtime.http_errors import busy_response, validation_error_message
+from runtime.persistence import persist_assessment
+from runtime.scheduler import request_work_class
+from runtime.singleflight import SingleFlight, request_fingerprint
+from runtime.startup_profile import profile_stage
+from runtime.warmup import get_probe, serve_probes, start_background_warmup
+from monitoring.cloud_monitoring import log_coalesced_request, track_latency
+from monitoring.tracing import span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI app
-app = FastAPI(
-    title="Assessment Analysis Agent API",
-    description="AI-powered assessment analysis and insights generation",
-    version="1.0.0"
-)
-
-# Add CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Initialize the agent
-try:
-    agent = AssessmentAgent()
-    logger.info("Assessment agent initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize agent: {e}")
-    agent = None
-
-class AssessmentRequest(BaseModel):
-    """Request model for assessment analysis"""
-    session_id: str
-    user_id: str
-    industry: str
-    location: str
-    overall_score: float
-    category_scores: Dict[str, float]
-    question_scores: Dict[str, float]
-    responses: list
-
-class AssessmentResponse(BaseModel):
-    """Response model for assessment analysis"""
-    success: bool
-    data: Dict[str, Any] = None
-    error: str = None
-
-@app.get("/")
-async def root():
-    """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": "Assessment Analysis Agent",
-        "version": "1.0.0"
-    }
+# Agents are created lazily by the entry point that needs them
+agent = None
+open_ended_agent = None
 
-@app.post("/process_assessment", response_model=AssessmentResponse)
-async def process_assessment(request: AssessmentRequest):
-    """
-    Process an assessment and generate AI-powered insights
-    """
-    if not agent:
-        raise HTTPException(status_code=500, detail="Agent not initialized")
-    
-    try:
-        logger.info(f"Processing assessment for session: {request.session_id}")
-        
-        # Convert request to the format expected by the agent
-        assessment_data = {
-            "session_id": request.session_id,
-            "user_id": request.user_id,
-            "industry": request.industry,
-            "location": request.location,
-            "overall_score": request.overall_score,
-            "category_scores": request.category_scores,
-            "question_scores": request.question_scores,
-            "responses": request.responses
-        }
-        
-        # Process with the agent
-        result = await agent.run(json.dumps(assessment_data))
-        
-        # Parse the JSON response
-        if isinstance(result, str):
-            try:
-                parsed_result = json.loads(result)
-            except json.JSONDecodeError:
-                parsed_result = {"analysis": result}
-        else:
-            parsed_result = result
-        
-        logger.info(f"Successfully processed assessment for session: {request.session_id}")
-        
-        return AssessmentResponse(
-            success=True,
-            data=parsed_result
-        )
-        
-    except Exception as e:
-        logger.error(f"Error processing assessment: {e}")
-        return AssessmentResponse(
-            success=False,
-            error=str(e)
-        )
+def get_assessment_agent():
+    """Get or create the assessment agent; None if it cannot be initialized."""
+    global agent
+    if agent is None:
+        try:
+            with profile_stage("import assessment_analysis_agent"):
+                from assessment_analysis_agent.agent import get_root_agent
+            with profile_stage("construct AssessmentAgent"):
+                agent = get_root_agent()
+            logger.info("Assessment agent initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize agent: {e}")
+            return None
+    return agent
+
+def get_open_ended_agent():
+    """Get or create the open-ended scoring agent."""
+    global open_ended_agent
+    if open_ended_agent is None:
+        with profile_stage("import open_ended_scoring_agent"):
+            from open_ended_scoring_agent.agent import get_root_agent
+        with profile_stage("construct OpenEndedScoringAgent"):
+            open_ended_agent = get_root_agent()
+    return open_ended_agent
+
+def __getattr__(name: str):
+    # Kept for callers that still do `from main import app`
+    if name == "app":
+        from server import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Identical concurrent requests (double-submits, client retries) share one agent call
+assessment_flight = SingleFlight("process_assessment", on_coalesced=log_coalesced_request)
+open_ended_flight = SingleFlight("process_open_ended_scoring", on_coalesced=log_coalesced_request)
+open_ended_batch_flight = SingleFlight("process_open_ended_batch_scoring", on_coalesced=log_coalesced_request)
+
+def _open_ended_question_type(request) -> str:
+    """Question type label for open-ended scoring latency histograms"""
+    from open_ended_scoring_agent.agent import QUESTION_TYPE_MAP
+    request_json = request.get_json(silent=True) or {}
+    return QUESTION_TYPE_MAP.get(request_json.get('question_id'), '')
 
 # Cloud Functions entry point
 @functions_framework.http
+@serve_probes
+@track_latency("process_assessment")
 def process_assessment_http(request):
     """
     HTTP Cloud Function entry point
@@ -154,64 +111,41 @@ def process_assessment_http(request):
             }), 200, headers)
         
         elif request.method == 'POST':
-            # Get JSON data from request
-            request_json = request.get_json(silent=True)
-            if not request_json:
+            # Parse and validate the body in one pass
+            from assessment_analysis_agent.agent import AssessmentRequest, AssessmentResult
+            try:
+                with span("parse_validate"):
+                    assessment = AssessmentRequest.model_validate_json(request.get_data())
+            except ValidationError as e:
                 return (json.dumps({
                     "success": False,
-                    "error": "No JSON data provided"
+                    "error": validation_error_message(e)
                 }), 400, headers)
             
-            # Validate required fields
-            required_fields = ['session_id', 'user_id', 'industry', 'location', 
-                             'overall_score', 'category_scores', 'question_scores', 'responses']
-            for field in required_fields:
-                if field not in request_json:
-                    return (json.dumps({
-                        "success": False,
-                        "error": f"Missing required field: {field}"
-                    }), 400, headers)
-            
             # Process with agent
+            agent = get_assessment_agent()
             if not agent:
                 return (json.dumps({
                     "success": False,
                     "error": "Agent not initialized"
                 }), 500, headers)
             
-            logger.info(f"Processing assessment for session: {request_json['session_id']}")
-            
-            # Convert to the format expected by the agent
-            assessment_data = {
-                "session_id": request_json['session_id'],
-                "user_id": request_json['user_id'],
-                "industry": request_json['industry'],
-                "location": request_json['location'],
-                "overall_score": request_json['overall_score'],
-                "category_scores": request_json['category_scores'],
-                "question_scores": request_json['question_scores'],
-                "responses": request_json['responses']
-            }
-            
-            # Process with the agent (we need to run this synchronously for Cloud Functions)
-            import asyncio
-            result = asyncio.run(agent.run(json.dumps(assessment_data)))
+            logger.info(f"Processing assessment for session: {assessment.session_id}")
             
-            # Parse the JSON response
-            if isinstance(result, str):
-                try:
-                    parsed_result = json.loads(result)
-                except json.JSONDecodeError:
-                    parsed_result = {"analysis": result}
-            else:
-                parsed_result = result
+            # Process with the agent on the shared event loop (handlers are synchronous in Cloud Functions)
+            session = assessment.to_session()
+            with get_admission_controller().slot("process_assessment"):
+                analysis = run_sync(assessment_flight.do(
+                    request_fingerprint(assessment.model_dump(mode="json")),
+                    lambda: agent.analyze(session)
+                ))
+            persist_assessment(assessment, analysis)
             
-            logger.info(f"Successfully processed assessment for session: {request_json['session_id']}")
+            logger.info(f"Successfully processed assessment for session: {assessment.session_id}")
             
-            return (json.dumps({
-                "success": True,
-                "data": parsed_result
-            }), 200, headers)
+            with span("serialize"):
+                body = AssessmentResult(success=True, data=analysis).model_dump_json(exclude_none=True)
+            return (body, 200, headers)
         
         else:
             return (json.dumps({
@@ -219,6 +153,8 @@ def process_assessment_http(request):
                 "error": f"Method {request.method} not allowed"
             }), 405, headers)
     
+    except AdmissionRejected as e:
+        return busy_response(e, headers)
     except Exception as e:
         logger.error(f"Error processing request: {e}")
         return (json.dumps({
@@ -227,6 +163,8 @@ def process_assessment_http(request):
         }), 500, headers)
 
 @functions_framework.http
+@serve_probes
+@track_latency("process_open_ended_scoring", question_type=_open_ended_question_type)
 def process_open_ended_scoring_http(request):
     """
     Cloud Functions HTTP entry point for open-ended question scoring
@@ -256,58 +194,185 @@ def process_open_ended_scoring_http(request):
         }), 405, {**cors_headers, 'Content-Type': 'application/json'})
 
     try:
-        # Parse the request
-        request_json = request.get_json()
-        if not request_json:
+        # Parse and validate the body in one pass
+        from open_ended_scoring_agent.agent import ScoringRequest
+        try:
+            with span("parse_validate"):
+                scoring_request = ScoringRequest.model_validate_json(request.get_data())
+        except ValidationError as e:
             return (json.dumps({
                 'success': False,
-                'error': 'No JSON data provided'
+                'error': validation_error_message(e)
             }), 400, {**cors_headers, 'Content-Type': 'application/json'})
 
-        # Validate required fields
-        required_fields = ['question_id', 'response', 'question_text']
-        for field in required_fields:
-            if field not in request_json:
-                return (json.dumps({
-                    'success': False,
-                    'error': f'Missing required field: {field}'
-                }), 400, {**cors_headers, 'Content-Type': 'application/json'})
-
-        # Convert to JSON string for the agent
-        input_data = {
-            'question_id': request_json['question_id'],
-            'response': request_json['response'],
-            'question_text': request_json['question_text']
-        }
-        input_json = json.dumps(input_data)
+        # Call the agent on the shared event loop
+        open_ended_agent = get_open_ended_agent()
+        with request_work_class(request.headers), get_admission_controller().slot("process_open_ended_scoring"):
+            result = run_sync(open_ended_flight.do(
+                request_fingerprint(scoring_request.model_dump()),
+                lambda: open_ended_agent.score(scoring_request)
+            ))
+
+        with span("serialize"):
+            body = json.dumps({
+                'success': True,
+                'score': result.score,
+                'explanation': result.explanation
+            })
+        return (body, 200, {**cors_headers, 'Content-Type': 'application/json'})
+
+    except AdmissionRejected as e:
+        return busy_response(e, {**cors_headers, 'Content-Type': 'application/json'})
+    except Exception as e:
+        logger.error(f'Error processing open-ended scoring request: {str(e)}')
+        return (json.dumps({
+            'success': False,
+            'error': f'Processing failed: {str(e)}'
+        }), 500, {**cors_headers, 'Content-Type': 'application/json'})
 
-        # Call the agent synchronously
-        import asyncio
-        result = asyncio.run(open_ended_agent.run(input_json))
+@functions_framework.http
+@serve_probes
+@track_latency("process_open_ended_batch_scoring", question_type=lambda request: "batch")
+def process_open_ended_batch_scoring_http(request):
+    """
+    Cloud Functions HTTP entry point for scoring all open-ended questions of a session
+    The model calls for each question run concurrently in one event loop
+    """
+    # CORS headers for all responses
+    cors_headers = {
+        'Access-Control-Allow-Origin': 'https://gutcheck-score-mvp.web.app',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type'
+    }
+    
+    # Handle CORS preflight requests
+    if request.method == 'OPTIONS':
+        return ('', 204, {**cors_headers, 'Access-Control-Max-Age': '3600'})
+
+    # Only allow POST requests
+    if request.method != 'POST':
+        return (json.dumps({
+            'success': False,
+            'error': 'Only POST requests are allowed'
+        }), 405, {**cors_headers, 'Content-Type': 'application/json'})
 
-        # Parse the result
+    try:
+        # Parse and validate the batch in one pass (question ids, required fields, batch size)
+        from open_ended_scoring_agent.agent import BatchScoringRequest
         try:
-            scoring_data = json.loads(result)
-            return (json.dumps({
-                'success': True,
-                'score': scoring_data.get('score'),
-                'explanation': scoring_data.get('explanation')
-            }), 200, {**cors_headers, 'Content-Type': 'application/json'})
-        except json.JSONDecodeError:
-            logger.error(f'Failed to parse agent response: {result}')
+            with span("parse_validate"):
+                batch = BatchScoringRequest.model_validate_json(request.get_data())
+        except ValidationError as e:
             return (json.dumps({
                 'success': False,
-                'error': 'Failed to parse agent response'
-            }), 500, {**cors_headers, 'Content-Type': 'application/json'})
+                'error': validation_error_message(e)
+            }), 400, {**cors_headers, 'Content-Type': 'application/json'})
 
+        # Score every question concurrently
+        with request_work_class(request.headers), get_admission_controller().slot("process_open_ended_batch_scoring"):
+            result = run_sync(open_ended_batch_flight.do(
+                request_fingerprint(batch.model_dump()),
+                lambda: get_open_ended_agent().score_batch(batch)
+            ))
+
+        with span("serialize"):
+            body = json.dumps({
+                'success': True,
+                **result.model_dump()
+            })
+        return (body, 200, {**cors_headers, 'Content-Type': 'application/json'})
+
+    except AdmissionRejected as e:
+        return busy_response(e, {**cors_headers, 'Content-Type': 'application/json'})
     except Exception as e:
-        logger.error(f'Error processing open-ended scoring request: {str(e)}')
+        logger.error(f'Error processing open-ended batch scoring request: {str(e)}')
         return (json.dumps({
             'success': False,
             'error': f'Processing failed: {str(e)}'
         }), 500, {**cors_headers, 'Content-Type': 'application/json'})
 
 @functions_framework.http
+@serve_probes
+@track_latency("jobs")
+def jobs_http(request):
+    """
+    Cloud Functions HTTP entry point for asynchronous jobs
+    POST a JobSubmission to enqueue an assessment or scoring run (202 with its job_id);
+    GET ?job_id=... (or /jobs/<job_id>) for its status and result.
+    Jobs run on a worker pool in this instance, so deploy it with CPU always allocated.
+    Instances only share jobs through a shared store (JOB_STORE_FACTORY); without one,
+    deploy a single instance (--max-instances=1, JOB_SINGLE_INSTANCE=true) or get 503.
+    """
+    cors_headers = {
+        'Access-Control-Allow-Origin': 'https://gutcheck-score-mvp.web.app',
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type'
+    }
+    json_headers = {**cors_headers, 'Content-Type': 'application/json'}
+
+    if request.method == 'OPTIONS':
+        return ('', 204, {**cors_headers, 'Access-Control-Max-Age': '3600'})
+
+    from runtime.jobs import (
+        JobSubmission, get_job_store, job_response, shared_store_configured, start_job_runner_in_background, submit_job
+    )
+    if not shared_store_configured():
+        # A job on one instance's own queue file is invisible to (and lost with) that instance
+        return (json.dumps({
+            'success': False,
+            'error': 'Jobs need a shared job store: set JOB_STORE_FACTORY, or deploy a single instance '
+                     'and set JOB_SINGLE_INSTANCE=true'
+        }), 503, json_headers)
+
+    try:
+        start_job_runner_in_background()
+        if request.method == 'POST':
+            try:
+                submission = JobSubmission.model_validate_json(request.get_data())
+            except ValidationError as e:
+                return (json.dumps({
+                    'success': False,
+                    'error': validation_error_message(e)
+                }), 400, json_headers)
+            try:
+                job = submit_job(submission)
+            except ValidationError as e:
+                return (json.dumps({
+                    'success': False,
+                    'error': f'Invalid {submission.kind} payload: {e.errors(include_url=False, include_context=False)}'
+                }), 400, json_headers)
+            return (json.dumps({
+                'success': True,
+                'job_id': job.job_id,
+                'status': job.status
+            }), 202, json_headers)
+
+        if request.method == 'GET':
+            job_id = request.args.get('job_id') or request.path.rstrip('/').rsplit('/', 1)[-1]
+            job = get_job_store().get(job_id) if job_id else None
+            if job is None:
+                return (json.dumps({
+                    'success': False,
+                    'error': f'Unknown job: {job_id}'
+                }), 404, json_headers)
+            return (json.dumps({'success': True, **job_response(job)}), 200, json_headers)
+
+        return (json.dumps({
+            'success': False,
+            'error': 'Only GET and POST requests are allowed'
+        }), 405, json_headers)
+
+    except AdmissionRejected as e:
+        return busy_response(e, json_headers)
+    except Exception as e:
+        logger.error(f'Error handling job request: {str(e)}')
+        return (json.dumps({
+            'success': False,
+            'error': f'Processing failed: {str(e)}'
+        }), 500, json_headers)
+
+@functions_framework.http
+@serve_probes
 def health_check_http(request):
     """
     Health check endpoint for the open-ended scoring agent
@@ -327,22 +392,20 @@ def health_check_http(request):
             'error': 'Only GET requests are allowed'
         }), 405, {**headers, 'Content-Type': 'application/json'})
 
-    try:
-        # Simple health check without calling the agent
-        return (json.dumps({
-            'success': True,
-            'service': 'Open-Ended Question Scoring Agent',
-            'status': 'healthy',
-            'version': '1.0.0',
-            'message': 'Service is running'
-        }), 200, {**headers, 'Content-Type': 'application/json'})
-    except Exception as e:
-        return (json.dumps({
-            'success': False,
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 500, {**headers, 'Content-Type': 'application/json'})
+    # Cached result of the background deep check; never calls the model
+    readiness, ready = get_probe().readiness()
+    return (json.dumps({
+        'success': ready,
+        'service': 'Open-Ended Question Scoring Agent',
+        'status': 'healthy' if ready else 'unhealthy',
+        'version': '1.0.0',
+        'readiness': readiness
+    }), 200 if ready else 503, {**headers, 'Content-Type': 'application/json'})
+
+# Warm the deployed entry point (FUNCTION_TARGET) in the background; /readyz reports when done
+start_background_warmup()
 
 if __name__ == "__main__":
     import uvicorn
+    from server import app
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
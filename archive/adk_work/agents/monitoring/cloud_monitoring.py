@@ -3,15 +3,27 @@ Cloud Monitoring and Logging System
 Provides comprehensive monitoring for the assessment agent Cloud Function.
 """
 
+import atexit
+import functools
 import logging
+import math
+import threading
 import time
 import json
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
-from google.cloud import monitoring_v3
-from google.cloud import logging as cloud_logging
+from typing import Dict, Any, List, Optional, Tuple
 import os
 
+from monitoring.tracing import trace, trace_id_from_headers
+
+# Cloud Monitoring accepts at most 200 time series per create_time_series call
+MAX_SERIES_PER_REQUEST = 200
+
+# Tool timers a request started but never ended are evicted beyond this many
+MAX_OPEN_TOOL_TIMERS = 1000
+
 # Configure structured logging
 class StructuredLogger:
     def __init__(self, name: str = "assessment_agent"):
@@ -62,6 +74,42 @@ class StructuredLogger:
         
         self.logger.info(json.dumps(log_data))
     
+    def log_trace(self, trace_data: Dict[str, Any]):
+        """Log a finished request trace with its spans."""
+        log_data = {
+            'event_type': 'request_trace',
+            **trace_data,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        # Lets Cloud Logging group the line with the request's other logs
+        project_id = os.getenv('GOOGLE_CLOUD_PROJECT')
+        if project_id:
+            log_data['logging.googleapis.com/trace'] = f"projects/{project_id}/traces/{trace_data['trace_id']}"
+        
+        self.logger.info(json.dumps(log_data))
+    
+    def log_coalesced_request(self, endpoint: str):
+        """Log a request that attached to an identical in-flight call."""
+        log_data = {
+            'event_type': 'request_coalesced',
+            'endpoint': endpoint,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        
+        self.logger.info(json.dumps(log_data))
+    
+    def log_admission_rejected(self, endpoint: str, reason: str, queue_depth: int):
+        """Log a request shed by admission control."""
+        log_data = {
+            'event_type': 'admission_rejected',
+            'endpoint': endpoint,
+            'reason': reason,
+            'queue_depth': queue_depth,
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        
+        self.logger.warning(json.dumps(log_data))
+    
     def log_rate_limit(self, client_ip: str, request_count: int):
         """Log rate limiting events."""
         log_data = {
@@ -73,44 +121,177 @@ class StructuredLogger:
         
         self.logger.warning(json.dumps(log_data))
 
+class MetricsBuffer:
+    """
+    In-memory aggregation of metric points per (metric, labels) series.
+    Recording is O(1); memory is bounded by max_series, dropping the oldest
+    series when a new one arrives while full.
+    """
+    
+    def __init__(self, max_series: int = 1000):
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]]" = OrderedDict()
+        self._aggregations: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+    
+    def record(self, metric_type: str, value: float, labels: Dict[str, str] = None,
+               aggregation: str = "last"):
+        """Merge one point into its series for the current window."""
+        key = (metric_type, tuple(sorted((k, str(v)) for k, v in (labels or {}).items())))
+        value = float(value)
+        with self._lock:
+            self._aggregations[metric_type] = aggregation
+            entry = self._series.get(key)
+            if entry is None:
+                if len(self._series) >= self.max_series:
+                    self._series.popitem(last=False)
+                    self.dropped += 1
+                # [count, sum, max, last]
+                self._series[key] = [1, value, value, value]
+            else:
+                entry[0] += 1
+                entry[1] += value
+                entry[2] = max(entry[2], value)
+                entry[3] = value
+    
+    def drain(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """Remove and return one aggregated value per series."""
+        with self._lock:
+            series, self._series = self._series, OrderedDict()
+            aggregations = dict(self._aggregations)
+        
+        drained = []
+        for (metric_type, labels), (count, total, maximum, last) in series.items():
+            aggregation = aggregations.get(metric_type, "last")
+            if aggregation == "sum":
+                value = total
+            elif aggregation == "mean":
+                value = total / count
+            elif aggregation == "max":
+                value = maximum
+            else:
+                value = last
+            drained.append((metric_type, dict(labels), value))
+        return drained
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._series)
+
+def metrics_export_enabled() -> bool:
+    """Export to Cloud Monitoring when asked to (METRICS_EXPORT) or when deployed; off for local runs and tests."""
+    flag = os.getenv('METRICS_EXPORT')
+    if flag:
+        return flag.lower() in ('1', 'true', 'yes')
+    return any(os.getenv(name) for name in ('GOOGLE_CLOUD_PROJECT', 'K_SERVICE', 'FUNCTION_TARGET'))
+
 class CloudMetrics:
-    def __init__(self, project_id: str):
+    def __init__(self, project_id: str, client=None, flush_interval: float = None,
+                 max_series: int = None, export: bool = None):
         self.project_id = project_id
-        self.client = monitoring_v3.MetricServiceClient()
+        self._client = client
+        # Without export points are still aggregated (bounded) but never leave the process
+        self.export = export if export is not None else (client is not None or metrics_export_enabled())
         self.project_name = f"projects/{project_id}"
+        # Cloud Monitoring rejects more than one point per series every 5 seconds
+        self.flush_interval = max(5.0, flush_interval if flush_interval is not None
+                                  else float(os.getenv('METRICS_FLUSH_INTERVAL_SECONDS', '10')))
+        self.buffer = MetricsBuffer(max_series if max_series is not None
+                                    else int(os.getenv('METRICS_BUFFER_MAX_SERIES', '1000')))
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._stop = threading.Event()
+        self._worker_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+    
+    @property
+    def client(self):
+        """Metric client, created on first write so construction never needs credentials."""
+        if self._client is None:
+            # Deferred: the monitoring SDK is slow to import and only the exporter needs it
+            from google.cloud import monitoring_v3
+            self._client = monitoring_v3.MetricServiceClient()
+        return self._client
     
     def create_time_series(self, metric_type: str, value: float, 
-                          labels: Dict[str, str] = None):
-        """Create a time series for custom metrics."""
-        try:
-            series = monitoring_v3.TimeSeries()
-            series.metric.type = f"custom.googleapis.com/{metric_type}"
-            series.resource.type = "cloud_function"
-            series.resource.labels["function_name"] = "assessment-agent"
-            series.resource.labels["project_id"] = self.project_id
-            series.resource.labels["region"] = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
-            
-            # Add custom labels
-            if labels:
-                for key, value in labels.items():
-                    series.metric.labels[key] = str(value)
-            
-            # Set the metric value
-            point = monitoring_v3.Point()
-            point.value.double_value = value
-            point.interval.end_time.seconds = int(time.time())
-            series.points = [point]
-            
-            # Write the time series
-            self.client.create_time_series(
-                request={
-                    "name": self.project_name,
-                    "time_series": [series]
-                }
-            )
+                          labels: Dict[str, str] = None, aggregation: str = "last"):
+        """Buffer a custom metric point; the background worker exports it."""
+        self.buffer.record(metric_type, value, labels, aggregation)
+        if self.export and self._worker_pid != os.getpid():
+            self._start_worker()
+    
+    def flush(self) -> int:
+        """Export all buffered series, up to MAX_SERIES_PER_REQUEST per RPC."""
+        if not self.export:
+            return 0
+        with self._flush_lock:
+            drained = self.buffer.drain()
+            if not drained:
+                return 0
             
-        except Exception as e:
-            logging.error(f"Failed to create time series: {e}")
+            end_seconds = int(time.time())
+            written = 0
+            for start in range(0, len(drained), MAX_SERIES_PER_REQUEST):
+                chunk = drained[start:start + MAX_SERIES_PER_REQUEST]
+                try:
+                    self.client.create_time_series(
+                        request={
+                            "name": self.project_name,
+                            "time_series": [self._build_series(metric_type, labels, value, end_seconds)
+                                            for metric_type, labels, value in chunk]
+                        }
+                    )
+                    written += len(chunk)
+                except Exception as e:
+                    logging.error(f"Failed to create time series: {e}")
+            return written
+    
+    def close(self):
+        """Stop the worker and export whatever is still buffered."""
+        self._stop.set()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout=self.flush_interval)
+        self.flush()
+    
+    def _build_series(self, metric_type: str, labels: Dict[str, str], value: float,
+                      end_seconds: int):
+        from google.cloud import monitoring_v3
+        series = monitoring_v3.TimeSeries()
+        series.metric.type = f"custom.googleapis.com/{metric_type}"
+        series.resource.type = "cloud_function"
+        series.resource.labels["function_name"] = "assessment-agent"
+        series.resource.labels["project_id"] = self.project_id
+        series.resource.labels["region"] = os.getenv('GOOGLE_CLOUD_LOCATION', 'us-central1')
+        
+        # Add custom labels
+        for key, label_value in labels.items():
+            series.metric.labels[key] = label_value
+        
+        # Set the metric value
+        interval = monitoring_v3.TimeInterval({"end_time": {"seconds": end_seconds}})
+        point = monitoring_v3.Point({"interval": interval, "value": {"double_value": value}})
+        series.points = [point]
+        return series
+    
+    def _start_worker(self):
+        with self._worker_lock:
+            if self._worker_pid == os.getpid():
+                return
+            # Forked children inherit the buffer but not the thread
+            self._stop = threading.Event()
+            self._worker = threading.Thread(target=self._run_worker, name="metrics-exporter",
+                                            daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+            atexit.register(self.close)
+    
+    def _run_worker(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Metrics flush failed: {e}")
     
     def record_request_metrics(self, processing_time: float, success: bool, 
                              tool_executions: Dict[str, float] = None):
@@ -119,14 +300,16 @@ class CloudMetrics:
         self.create_time_series(
             "assessment/processing_time_seconds",
             processing_time,
-            {"success": str(success).lower()}
+            {"success": str(success).lower()},
+            aggregation="mean"
         )
         
         # Record success/failure count
         self.create_time_series(
             "assessment/request_count",
             1,
-            {"success": str(success).lower()}
+            {"success": str(success).lower()},
+            aggregation="sum"
         )
         
         # Record tool execution times if provided
@@ -135,35 +318,243 @@ class CloudMetrics:
                 self.create_time_series(
                     "assessment/tool_execution_time_seconds",
                     execution_time,
-                    {"tool_name": tool_name}
+                    {"tool_name": tool_name},
+                    aggregation="mean"
                 )
     
+    def record_coalesced_metrics(self, endpoint: str):
+        """Record a request that was served by an identical in-flight call."""
+        self.create_time_series(
+            "assessment/coalesced_request_count",
+            1,
+            {"endpoint": endpoint},
+            aggregation="sum"
+        )
+    
+    def record_admission_metrics(self, endpoint: str, wait_seconds: float, queue_depth: int):
+        """Record queue wait and depth for an admitted request."""
+        self.create_time_series(
+            "assessment/admission_queue_wait_seconds",
+            wait_seconds,
+            {"endpoint": endpoint},
+            aggregation="mean"
+        )
+        self.create_time_series(
+            "assessment/admission_queue_depth",
+            queue_depth,
+            {"endpoint": endpoint},
+            aggregation="max"
+        )
+    
+    def record_span_metrics(self, endpoint: str, stage_seconds: Dict[str, float]):
+        """Record the time one request spent in each traced stage."""
+        for stage, seconds in stage_seconds.items():
+            self.create_time_series(
+                "assessment/stage_duration_seconds",
+                seconds,
+                {"endpoint": endpoint, "stage": stage},
+                aggregation="mean"
+            )
+    
+    def record_scheduler_metrics(self, priority: str, tenant: str, wait_seconds: float):
+        """Record how long a model call waited for a scheduler slot."""
+        self.create_time_series(
+            "assessment/scheduler_wait_seconds",
+            wait_seconds,
+            {"priority": priority, "tenant": tenant},
+            aggregation="mean"
+        )
+    
+    def record_admission_rejected_metrics(self, endpoint: str, reason: str, queue_depth: int):
+        """Record a request shed by admission control."""
+        self.create_time_series(
+            "assessment/admission_rejected_count",
+            1,
+            {"endpoint": endpoint, "reason": reason},
+            aggregation="sum"
+        )
+        self.create_time_series(
+            "assessment/admission_queue_depth",
+            queue_depth,
+            {"endpoint": endpoint},
+            aggregation="max"
+        )
+    
+    def record_hedge_metrics(self, call_site: str, backup_won: bool):
+        """Record a hedged model call and which of the two calls won."""
+        self.create_time_series(
+            "assessment/hedged_request_count",
+            1,
+            {"call_site": call_site, "winner": "backup" if backup_won else "primary"},
+            aggregation="sum"
+        )
+    
+    def record_parse_metrics(self, question_type: str, outcome: str):
+        """Record how a scoring response was parsed (clean, recovered or defaulted)."""
+        self.create_time_series(
+            "assessment/score_parse_count",
+            1,
+            {"question_type": question_type, "outcome": outcome},
+            aggregation="sum"
+        )
+    
     def record_rate_limit_metrics(self, client_ip: str, request_count: int):
         """Record rate limiting metrics."""
         self.create_time_series(
             "assessment/rate_limit_requests",
             request_count,
-            {"client_ip": client_ip}
+            {"client_ip": client_ip},
+            aggregation="max"
         )
 
+class LatencyHistogram:
+    """
+    Mergeable streaming histogram with HDR-style logarithmic buckets.
+    Every quantile is reported within relative_error of the true value, using
+    memory proportional to the dynamic range rather than the sample count.
+    """
+    
+    def __init__(self, relative_error: float = 0.01, min_value: float = 1e-4):
+        self.relative_error = relative_error
+        self.min_value = min_value
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = 0.0
+    
+    def record(self, value: float):
+        """Add one observation (seconds)."""
+        index = 0 if value <= self.min_value else math.ceil(math.log(value / self.min_value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+    
+    def merge(self, other: "LatencyHistogram"):
+        """Fold another histogram with the same bucket layout into this one."""
+        if other._gamma != self._gamma or other.min_value != self.min_value:
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        for index, bucket_count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+    
+    def quantile(self, q: float) -> float:
+        """Estimate the q-th quantile (0 <= q <= 1)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                if index == 0:
+                    value = self.min_value
+                else:
+                    # Midpoint of (min * gamma^(i-1), min * gamma^i] in relative terms
+                    value = self.min_value * self._gamma ** index * 2 / (1 + self._gamma)
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+    
+    def summary(self) -> Dict[str, float]:
+        """Count, sum, extremes and the standard quantiles."""
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": round(self.minimum, 6) if self.count else 0.0,
+            "max": round(self.maximum, 6),
+            "p50": round(self.quantile(0.50), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+class LatencyHistograms:
+    """Latency histograms labelled by endpoint, question type and success."""
+    
+    METRIC_NAME = "gutcheck_request_latency_seconds"
+    QUANTILES = (0.5, 0.95, 0.99)
+    
+    def __init__(self, relative_error: float = 0.01):
+        self.relative_error = relative_error
+        self._histograms: Dict[Tuple[str, str, str], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, endpoint: str, seconds: float, success: bool = True,
+                question_type: str = ""):
+        """Record one request latency."""
+        key = (endpoint, question_type or "", str(success).lower())
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram(self.relative_error)
+            histogram.record(seconds)
+    
+    def merged(self, endpoint: str = None) -> LatencyHistogram:
+        """Merge every series (optionally for one endpoint) into one histogram."""
+        result = LatencyHistogram(self.relative_error)
+        with self._lock:
+            for (series_endpoint, _, _), histogram in self._histograms.items():
+                if endpoint is None or series_endpoint == endpoint:
+                    result.merge(histogram)
+        return result
+    
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """JSON-friendly summary of every labelled series."""
+        with self._lock:
+            return [
+                {"endpoint": endpoint, "question_type": question_type, "success": success,
+                 **histogram.summary()}
+                for (endpoint, question_type, success), histogram in sorted(self._histograms.items())
+            ]
+    
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition (summary type) of every labelled series."""
+        lines = [
+            f"# HELP {self.METRIC_NAME} Request latency by endpoint, question type and outcome",
+            f"# TYPE {self.METRIC_NAME} summary",
+        ]
+        with self._lock:
+            for (endpoint, question_type, success), histogram in sorted(self._histograms.items()):
+                labels = (f'endpoint="{_escape_label(endpoint)}",'
+                          f'question_type="{_escape_label(question_type)}",success="{success}"')
+                for q in self.QUANTILES:
+                    lines.append(f'{self.METRIC_NAME}{{{labels},quantile="{q}"}} {histogram.quantile(q):.6f}')
+                lines.append(f"{self.METRIC_NAME}_sum{{{labels}}} {histogram.total:.6f}")
+                lines.append(f"{self.METRIC_NAME}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
 class PerformanceMonitor:
     def __init__(self, project_id: str):
         self.logger = StructuredLogger()
         self.metrics = CloudMetrics(project_id)
-        self.start_times = {}
+        self.latency = LatencyHistograms()
+        # (request_id, tool_name) -> perf_counter start; bounded, since a failed request may never end its timers
+        self.start_times: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._timers_lock = threading.Lock()
     
     def start_tool_timer(self, request_id: str, tool_name: str):
         """Start timing a tool execution."""
-        key = f"{request_id}_{tool_name}"
-        self.start_times[key] = time.time()
+        with self._timers_lock:
+            self.start_times[(request_id, tool_name)] = time.perf_counter()
+            while len(self.start_times) > MAX_OPEN_TOOL_TIMERS:
+                self.start_times.popitem(last=False)
     
     def end_tool_timer(self, request_id: str, tool_name: str, success: bool = True, 
                       error: str = None):
         """End timing a tool execution and log metrics."""
-        key = f"{request_id}_{tool_name}"
-        if key in self.start_times:
-            execution_time = time.time() - self.start_times[key]
-            del self.start_times[key]
+        with self._timers_lock:
+            start = self.start_times.pop((request_id, tool_name), None)
+        if start is not None:
+            execution_time = time.perf_counter() - start
             
             # Log tool execution
             self.logger.log_tool_execution(request_id, tool_name, execution_time, success, error)
@@ -172,7 +563,8 @@ class PerformanceMonitor:
             self.metrics.create_time_series(
                 "assessment/tool_execution_time_seconds",
                 execution_time,
-                {"tool_name": tool_name, "success": str(success).lower()}
+                {"tool_name": tool_name, "success": str(success).lower()},
+                aggregation="mean"
             )
             
             return execution_time
@@ -188,6 +580,42 @@ class PerformanceMonitor:
         # Record metrics
         self.metrics.record_request_metrics(processing_time, success, tool_executions)
     
+    def record_latency(self, endpoint: str, seconds: float, success: bool = True,
+                       question_type: str = ""):
+        """Record a request latency in the in-process histograms."""
+        self.latency.observe(endpoint, seconds, success, question_type)
+    
+    def record_coalesced_request(self, endpoint: str):
+        """Record a coalesced (deduplicated) request."""
+        self.logger.log_coalesced_request(endpoint)
+        self.metrics.record_coalesced_metrics(endpoint)
+    
+    def record_admission(self, endpoint: str, wait_seconds: float, queue_depth: int):
+        """Record an admitted request's queue wait and the queue depth behind it."""
+        self.metrics.record_admission_metrics(endpoint, wait_seconds, queue_depth)
+    
+    def record_scheduler_wait(self, priority: str, tenant: str, wait_seconds: float):
+        """Record a model call's wait for a scheduler slot."""
+        self.metrics.record_scheduler_metrics(priority, tenant, wait_seconds)
+    
+    def record_admission_rejected(self, endpoint: str, reason: str, queue_depth: int):
+        """Record a request shed by admission control."""
+        self.logger.log_admission_rejected(endpoint, reason, queue_depth)
+        self.metrics.record_admission_rejected_metrics(endpoint, reason, queue_depth)
+    
+    def record_trace(self, trace):
+        """Export a finished request trace to the structured log and per-stage metrics."""
+        self.logger.log_trace(trace.to_dict())
+        self.metrics.record_span_metrics(trace.endpoint, trace.stage_totals())
+    
+    def record_hedged_request(self, call_site: str, backup_won: bool):
+        """Record a hedged model call."""
+        self.metrics.record_hedge_metrics(call_site, backup_won)
+    
+    def record_score_parse(self, question_type: str, outcome: str):
+        """Record the parse outcome of a scoring response."""
+        self.metrics.record_parse_metrics(question_type, outcome)
+    
     def record_rate_limit(self, client_ip: str, request_count: int):
         """Record rate limiting events."""
         self.logger.log_rate_limit(client_ip, request_count)
@@ -229,3 +657,85 @@ def log_rate_limit_event(client_ip: str, request_count: int):
     """Log rate limiting events."""
     monitor = get_monitor()
     monitor.record_rate_limit(client_ip, request_count)
+
+def log_coalesced_request(endpoint: str):
+    """Log a request that was coalesced onto an identical in-flight call."""
+    monitor = get_monitor()
+    monitor.record_coalesced_request(endpoint)
+
+def log_admission(endpoint: str, wait_seconds: float, queue_depth: int):
+    """Record a request admitted by admission control."""
+    monitor = get_monitor()
+    monitor.record_admission(endpoint, wait_seconds, queue_depth)
+
+def log_admission_rejected(endpoint: str, reason: str, queue_depth: int):
+    """Record a request shed by admission control."""
+    monitor = get_monitor()
+    monitor.record_admission_rejected(endpoint, reason, queue_depth)
+
+def log_scheduler_wait(priority: str, tenant: str, wait_seconds: float):
+    """Record the time a model call waited for a scheduler slot."""
+    monitor = get_monitor()
+    monitor.record_scheduler_wait(priority, tenant, wait_seconds)
+
+def log_trace(trace):
+    """Export a finished request trace."""
+    monitor = get_monitor()
+    monitor.record_trace(trace)
+
+@contextmanager
+def tool_timer(request_id: str, tool_name: str):
+    """Time a tool execution; the timer is ended (as failed) even if the tool raises."""
+    log_tool_start(request_id, tool_name)
+    try:
+        yield
+    except Exception as e:
+        log_tool_end(request_id, tool_name, success=False, error=str(e))
+        raise
+    log_tool_end(request_id, tool_name)
+
+def log_hedged_request(call_site: str, backup_won: bool):
+    """Record a model call that was hedged with a second identical call."""
+    monitor = get_monitor()
+    monitor.record_hedged_request(call_site, backup_won)
+
+def log_score_parse(question_type: str, outcome: str):
+    """Record how a model scoring response was parsed."""
+    monitor = get_monitor()
+    monitor.record_score_parse(question_type, outcome)
+
+def log_latency(endpoint: str, seconds: float, success: bool = True, question_type: str = ""):
+    """Record a request latency in the in-process histograms."""
+    monitor = get_monitor()
+    monitor.record_latency(endpoint, seconds, success, question_type)
+
+def track_latency(endpoint: str, question_type=None):
+    """
+    Decorator for functions_framework handlers returning (body, status, headers).
+    question_type optionally maps the request to a question type label.
+    The handler runs inside a request trace, so the stages it calls record spans.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(request):
+            if request.method == 'OPTIONS':
+                return handler(request)
+            
+            start = time.perf_counter()
+            success = False
+            try:
+                with trace(endpoint, trace_id_from_headers(request.headers)):
+                    response = handler(request)
+                status = response[1] if isinstance(response, tuple) and len(response) > 1 else 200
+                success = status < 400
+                return response
+            finally:
+                label = ""
+                if question_type is not None:
+                    try:
+                        label = question_type(request) or ""
+                    except Exception:
+                        label = ""
+                log_latency(endpoint, time.perf_counter() - start, success, label)
+        return wrapper
+    return decorator
@@ -0,0 +1,240 @@
+"""
+Request tracing with per-stage spans
+A trace follows one request (or job) from the handler through the agent to the
+model call. It lives in a contextvar, so it reaches every coroutine and task the
+request starts, including coroutines a synchronous handler submits to the shared
+event loop, without being passed along as an argument. Stages record spans:
+
+    with span("prompt_render", question_id="q3"):
+        ...
+
+span() costs one contextvar lookup outside a trace. Finished traces are kept in
+a bounded in-process buffer (GET /metrics/traces on the server) and exported as
+one structured log line each, with per-stage totals also recorded as metrics.
+"""
+
+import collections
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# A batch request records a handful of spans per question; anything past this is counted, not kept
+MAX_SPANS_PER_TRACE = 128
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Spans of one request; finished when its last holder releases it."""
+
+    def __init__(self, endpoint: str, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.dropped_spans = 0
+        self.error: Optional[str] = None
+        self._holds = 1
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, start: float, duration: float,
+                 attributes: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """Record a finished span; start is a time.perf_counter() reading."""
+        record = {
+            "name": name,
+            "start_ms": round((start - self._start) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+        }
+        if attributes:
+            record["attributes"] = attributes
+        if error:
+            record["error"] = error
+        with self._lock:
+            # Spans from work that outlives the request (or past the cap) would grow a finished trace
+            if self.duration is not None or len(self.spans) >= MAX_SPANS_PER_TRACE:
+                self.dropped_spans += 1
+                return
+            self.spans.append(record)
+
+    def hold(self):
+        """Keep the trace open past its handler, e.g. while a streamed response is still being sent."""
+        with self._lock:
+            self._holds += 1
+
+    def release(self, error: Optional[str] = None):
+        """Drop one hold; the last one finishes the trace and hands it to the store."""
+        with self._lock:
+            if error and self.error is None:
+                self.error = error
+            self._holds -= 1
+            if self._holds > 0 or self.duration is not None:
+                return
+            self.duration = time.perf_counter() - self._start
+        get_trace_store().add(self)
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Seconds spent per span name; concurrent spans of the same name add up."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for record in self.spans:
+                totals[record["name"]] = totals.get(record["name"], 0.0) + record["duration_ms"] / 1000
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                "trace_id": self.trace_id,
+                "endpoint": self.endpoint,
+                "started_at": self.started_at,
+                "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+                "spans": list(self.spans),
+            }
+            if self.dropped_spans:
+                data["dropped_spans"] = self.dropped_spans
+            if self.error:
+                data["error"] = self.error
+        return data
+
+
+class span:
+    """Context manager timing one stage of the current trace; a no-op outside a trace."""
+
+    __slots__ = ("name", "attributes", "_trace", "_start")
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._trace = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._trace = _current.get()
+        if self._trace is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace is not None:
+            # Cancellation and generator close are not failures of the stage
+            error = (str(exc) or exc_type.__name__) if isinstance(exc, Exception) else None
+            self._trace.add_span(self.name, self._start, time.perf_counter() - self._start,
+                                 self.attributes, error)
+        return False
+
+
+def record_span(name: str, seconds: float, **attributes):
+    """Record a stage whose time was accumulated piecemeal (e.g. parsing a stream chunk by chunk)."""
+    current = _current.get()
+    if current is not None:
+        current.add_span(name, time.perf_counter() - seconds, seconds, attributes)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def trace_id_from_headers(headers: Mapping[str, str]) -> Optional[str]:
+    """Trace id from Cloud Run's X-Cloud-Trace-Context or a W3C traceparent header."""
+    cloud = headers.get("X-Cloud-Trace-Context")
+    if cloud:
+        trace_id = cloud.split("/", 1)[0].strip()
+        if trace_id:
+            return trace_id
+    match = _TRACEPARENT.match(headers.get("traceparent", "").strip())
+    return match.group(1) if match else None
+
+
+@contextlib.contextmanager
+def trace(endpoint: str, trace_id: Optional[str] = None):
+    """Trace the block as one request; yields the Trace, or None when it is not sampled."""
+    if _current.get() is not None or not get_trace_store().sampled():
+        # Nested entry points (a handler calling agent.run) stay part of the outer trace
+        yield _current.get()
+        return
+    current = Trace(endpoint, trace_id)
+    token = _current.set(current)
+    error = None
+    try:
+        yield current
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        current.release(error)
+
+
+class TraceStore:
+    """The most recent finished traces, bounded; each is exported once as it arrives."""
+
+    def __init__(self, capacity: int = 200, sample_rate: float = 1.0, export=None,
+                 rng=random.random):
+        self.sample_rate = sample_rate
+        self.export = export
+        self.rng = rng
+        self._traces = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.finished = 0
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or self.rng() < self.sample_rate
+
+    def add(self, finished: Trace):
+        with self._lock:
+            self._traces.append(finished)
+            self.finished += 1
+        if self.export is not None:
+            try:
+                self.export(finished)
+            except Exception as e:
+                logger.warning(f"Failed to export trace {finished.trace_id}: {e}")
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Newest first."""
+        with self._lock:
+            traces = list(self._traces)[-limit:] if limit > 0 else []
+        return [finished.to_dict() for finished in reversed(traces)]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for finished in reversed(self._traces):
+                if finished.trace_id == trace_id:
+                    return finished.to_dict()
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"stored": len(self._traces), "capacity": self._traces.maxlen,
+                    "finished": self.finished, "sample_rate": self.sample_rate}
+
+
+# Global trace store (one per process)
+trace_store = None
+_store_lock = threading.Lock()
+
+
+def get_trace_store() -> TraceStore:
+    """Get or create the process-wide trace store, exporting to the structured log."""
+    global trace_store
+    with _store_lock:
+        if trace_store is None:
+            from monitoring.cloud_monitoring import log_trace
+            trace_store = TraceStore(
+                capacity=int(os.getenv("TRACE_BUFFER_SIZE", "200")),
+                sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+                export=log_trace
+            )
+        return trace_store
@@ -1,5 +1,8 @@
 # Must import agent.py for ADK discovery
 from . import agent
 
-# ADK pattern: root_agent must be defined for discovery
-root_agent = agent.root_agent
+# ADK pattern: root_agent must be defined for discovery (resolved lazily)
+def __getattr__(name: str):
+    if name == "root_agent":
+        return agent.get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
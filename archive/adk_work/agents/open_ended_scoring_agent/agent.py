@@ -6,11 +6,22 @@ USES EXACT MISSION-CRITICAL PROMPTS - NO MODIFICATIONS ALLOWED
 """
 
 import os
-from typing import Dict, Any
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from google.adk import Agent
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError, field_validator
 import json
 
+from monitoring.tracing import record_span, span, trace
+from runtime.hedging import get_hedger
+from runtime.model_client import ModelClient, get_model_client
+from runtime.persistence import persist_score
+from .cache import get_scoring_cache, make_cache_key
+from .streaming import DEFAULT_SCORE, DEFAULTED, ScoreStreamParser, parse_outcomes
+
 # 🔒 MISSION-CRITICAL SCORING PROMPTS - EXACT COPY FROM functions/src/index.ts
 # DO NOT MODIFY - THESE ARE MISSION-CRITICAL TO SCORING LOGIC
 SCORING_PROMPTS = {
@@ -67,17 +78,73 @@ QUESTION_TYPE_MAP = {
     'q23': 'finalVision'
 }
 
+# Bump whenever SCORING_PROMPTS, response parsing or the cached entry changes so cached scores are not reused
+PROMPT_VERSION = "2024-08-v4"
+
+# Outcome of a scoring call whose model request failed; not a parse outcome
+FAILED = "failed"
+# The default score stands in for these, so it is never stored as the user's score
+UNSCORED_OUTCOMES = (DEFAULTED, FAILED)
+
+logger = logging.getLogger(__name__)
+
+def record_parse_outcome(question_type: str, outcome: str):
+    """Count how a model response was parsed; a defaulted score is not the model's, so it is logged"""
+    parse_outcomes.record(outcome)
+    if outcome == DEFAULTED:
+        logger.warning(f"No score found in model response for {question_type}; using default {DEFAULT_SCORE}")
+    from monitoring.cloud_monitoring import log_score_parse
+    log_score_parse(question_type, outcome)
+
 class ScoringRequest(BaseModel):
     """Request for scoring an open-ended question"""
     question_id: str = Field(description="Question identifier (e.g., q3, q8, q18, q23)")
     response: str = Field(description="User's response to the open-ended question")
     question_text: str = Field(description="The question text for context")
+    session_id: Optional[str] = Field(default=None, description="Assessment session the result is stored under")
+    user_id: Optional[str] = Field(default=None, description="User the session belongs to")
 
 class ScoringResult(BaseModel):
     """Result of scoring an open-ended question"""
     score: int = Field(description="Score from 1-5", ge=1, le=5)
     explanation: str = Field(description="Explanation for the score")
 
+class BatchScoringRequest(BaseModel):
+    """Request for scoring every open-ended question of a session in one call"""
+    session_id: Optional[str] = Field(default=None, description="Assessment session identifier")
+    user_id: Optional[str] = Field(default=None, description="User the session belongs to")
+    questions: List[ScoringRequest] = Field(
+        description="Open-ended questions to score (q3, q8, q18, q23)",
+        min_length=1,
+        max_length=len(QUESTION_TYPE_MAP)
+    )
+
+    @field_validator("questions")
+    @classmethod
+    def check_question_ids(cls, questions: List[ScoringRequest]) -> List[ScoringRequest]:
+        seen = set()
+        for question in questions:
+            if question.question_id not in QUESTION_TYPE_MAP:
+                raise ValueError(f"Invalid question ID for open-ended scoring: {question.question_id}")
+            if question.question_id in seen:
+                raise ValueError(f"Duplicate question ID: {question.question_id}")
+            seen.add(question.question_id)
+        return questions
+
+class BatchScoringItem(BaseModel):
+    """Outcome of scoring a single question within a batch"""
+    question_id: str = Field(description="Question identifier")
+    success: bool = Field(description="Whether the question was scored")
+    score: Optional[int] = Field(default=None, description="Score from 1-5")
+    explanation: Optional[str] = Field(default=None, description="Explanation for the score")
+    error: Optional[str] = Field(default=None, description="Error message if scoring failed")
+
+class BatchScoringResult(BaseModel):
+    """Per-question results of a batch scoring request"""
+    session_id: Optional[str] = Field(default=None, description="Assessment session identifier")
+    results: List[BatchScoringItem] = Field(description="Results in request order")
+    failed_count: int = Field(description="Number of questions that could not be scored")
+
 class OpenEndedScoringAgent(Agent):
     """AI Agent for scoring open-ended questions using EXACT mission-critical prompts"""
     
@@ -117,31 +184,96 @@ class OpenEndedScoringAgent(Agent):
             instruction=instruction
         )
     
+    @property
+    def model_client(self) -> ModelClient:
+        """Instance-wide pooled, quota-aware client for this agent's model"""
+        return get_model_client(str(self.model))
+    
     async def run(self, user_input: str) -> str:
         """
         Main entry point following ADK pattern
         Handles JSON scoring requests and conversational queries
         """
         try:
-            # Try to parse as JSON first (production mode)
-            request_data = json.loads(user_input)
-            request = ScoringRequest(**request_data)
-            
-            # Score the question
-            result = await self._score_question(request)
-            
-            # Return JSON response
-            return json.dumps(result.dict(), indent=2)
+            with trace("open_ended_scoring_agent.run"):
+                # Parse and validate in one pass (production mode)
+                with span("parse_validate"):
+                    request = ScoringRequest.model_validate_json(user_input)
+                
+                # Score the question
+                result = await self.score(request)
+                
+                # Return JSON response
+                with span("serialize"):
+                    return result.model_dump_json()
             
-        except json.JSONDecodeError:
-            # Handle conversational queries (testing mode)
-            return self._handle_conversational_query(user_input)
+        except ValidationError as e:
+            if e.errors()[0]["type"] == "json_invalid":
+                # Handle conversational queries (testing mode)
+                return self._handle_conversational_query(user_input)
+            return json.dumps({
+                "error": f"Scoring failed: {str(e)}",
+                "success": False
+            })
         except Exception as e:
             return json.dumps({
                 "error": f"Scoring failed: {str(e)}",
                 "success": False
             })
     
+    async def score(self, request: ScoringRequest, raise_errors: bool = False) -> ScoringResult:
+        """
+        Typed entry point: score a validated open-ended question
+        A failed model call gives the default score, or raises with raise_errors (for callers that retry)
+        """
+        result, outcome = await self._score_with_outcome(request, raise_errors)
+        if outcome not in UNSCORED_OUTCOMES:
+            persist_score(request, result)
+        return result
+    
+    async def score_batch(self, batch: BatchScoringRequest) -> BatchScoringResult:
+        """
+        Score all open-ended questions of a session concurrently
+        Latency is bounded by the slowest question; failures are reported per question,
+        including responses without a score, instead of as the default score
+        """
+        outcomes = await asyncio.gather(
+            *(self._score_with_outcome(request, raise_errors=True) for request in batch.questions),
+            return_exceptions=True
+        )
+        
+        results = []
+        for request, outcome in zip(batch.questions, outcomes):
+            if isinstance(outcome, Exception):
+                results.append(BatchScoringItem(
+                    question_id=request.question_id,
+                    success=False,
+                    error=f"Scoring failed: {str(outcome)}"
+                ))
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            elif outcome[1] == DEFAULTED:
+                results.append(BatchScoringItem(
+                    question_id=request.question_id,
+                    success=False,
+                    error="Scoring failed: no score found in model response"
+                ))
+            else:
+                result = outcome[0]
+                persist_score(request, result, batch.session_id, batch.user_id)
+                results.append(BatchScoringItem(
+                    question_id=request.question_id,
+                    success=True,
+                    score=result.score,
+                    explanation=result.explanation
+                ))
+        
+        return BatchScoringResult(
+            session_id=batch.session_id,
+            results=results,
+            failed_count=sum(1 for item in results if not item.success)
+        )
+    
     def _handle_conversational_query(self, query: str) -> str:
         """Handle conversational queries for testing and debugging"""
         query_lower = query.lower()
@@ -168,51 +300,128 @@ I'll return a JSON object with score (1-5) and explanation."""
     
     async def _score_question(self, request: ScoringRequest) -> ScoringResult:
         """Score an open-ended question using mission-critical prompts"""
+        result, _ = await self._score_with_outcome(request)
+        return result
+    
+    async def _score_with_outcome(self, request: ScoringRequest,
+                                  raise_errors: bool = False) -> Tuple[ScoringResult, str]:
+        """Score an open-ended question and report how the score was obtained (parse outcome or FAILED)"""
+        result = outcome = None
+        with span("score_question", question_id=request.question_id):
+            async for event, data in self.stream_score(request, raise_errors):
+                if event == "outcome":
+                    outcome = data
+                elif event == "result":
+                    result = data
+        return result, outcome
+    
+    async def stream_score(self, request: ScoringRequest, raise_errors: bool = False) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Score an open-ended question, yielding events as the model output arrives:
+        ("score", int) as soon as it is parsed, ("explanation", text delta) as it grows,
+        ("outcome", how the score was obtained), then ("result", ScoringResult), which is authoritative.
+        A failed model call yields the default score with outcome FAILED, or raises with raise_errors.
+        """
         
-        # Get question type from mapping
-        question_type = QUESTION_TYPE_MAP.get(request.question_id)
-        if not question_type:
-            raise ValueError(f"Invalid question ID for open-ended scoring: {request.question_id}")
-        
-        # Get the appropriate prompt for the question type
-        prompt_template = SCORING_PROMPTS.get(question_type)
-        if not prompt_template:
-            raise ValueError(f"Invalid question type: {question_type}")
+        with span("prompt_render", question_id=request.question_id):
+            # Get question type from mapping
+            question_type = QUESTION_TYPE_MAP.get(request.question_id)
+            if not question_type:
+                raise ValueError(f"Invalid question ID for open-ended scoring: {request.question_id}")
+            
+            # Get the appropriate prompt for the question type
+            prompt_template = SCORING_PROMPTS.get(question_type)
+            if not prompt_template:
+                raise ValueError(f"Invalid question type: {question_type}")
+            
+            # Replace placeholder with actual response
+            prompt = prompt_template.replace('{{RESPONSE}}', request.response)
+            cache_key = make_cache_key(question_type, prompt, str(self.model), PROMPT_VERSION)
         
-        # Replace placeholder with actual response
-        prompt = prompt_template.replace('{{RESPONSE}}', request.response)
+        # Identical prompts (retries, double-submits, pasted boilerplate) reuse the earlier score
+        cache = get_scoring_cache()
+        with span("cache_lookup", question_id=request.question_id):
+            cached = cache.get(cache_key)
+        if cached is not None:
+            # Only scores the model produced are cached, each with the parse outcome it was stored with
+            cached_result, cached_outcome = cached
+            yield "score", cached_result.score
+            yield "explanation", cached_result.explanation
+            yield "outcome", cached_outcome
+            yield "result", cached_result.model_copy()
+            return
         
         try:
-            # Use the EXACT SAME LLM calling pattern as the assessment agent
-            # This is the pattern that WORKS
-            async for result in self.canonical_model.generate_content_async(prompt):
-                response_text = result if isinstance(result, str) else result.text
-                break  # Take the first result
+            # Shared client: connection reuse, quota-aware scheduling and retries on 429/5xx
+            parser = ScoreStreamParser()
+            hedger = get_hedger("open_ended_scoring")
+            # Parsing is interleaved with the stream; its share is timed chunk by chunk
+            parse_seconds = 0.0
+            with span("model_call", question_id=request.question_id, hedged=hedger is not None):
+                if hedger is None:
+                    async with aclosing(self.model_client.generate_content_async(prompt)) as stream:
+                        async for chunk in stream:
+                            parse_start = time.perf_counter()
+                            events = parser.feed(chunk if isinstance(chunk, str) else chunk.text)
+                            parse_seconds += time.perf_counter() - parse_start
+                            for event in events:
+                                yield event
+                            if parser.complete:
+                                # Closing the stream stops generation of the closing brace and any trailing text
+                                break
+                else:
+                    # Hedged calls race to a complete response, so events arrive all at once
+                    text = await hedger.run(lambda: self._generate_text(prompt))
+                    parse_start = time.perf_counter()
+                    events = parser.feed(text)
+                    parse_seconds += time.perf_counter() - parse_start
+                    for event in events:
+                        yield event
             
-            # Parse JSON response (same format as old system)
-            try:
-                scoring_data = json.loads(response_text)
-                return ScoringResult(
-                    score=scoring_data.get("score", 3),
-                    explanation=scoring_data.get("explanation", "")
-                )
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try to extract score from text
-                import re
-                score_match = re.search(r'"score":\s*(\d+)', response_text)
-                explanation_match = re.search(r'"explanation":\s*"([^"]*)"', response_text)
-                
-                score = int(score_match.group(1)) if score_match else 3
-                explanation = explanation_match.group(1) if explanation_match else "Score extracted from AI response"
-                
-                return ScoringResult(score=score, explanation=explanation)
+            parse_start = time.perf_counter()
+            score, explanation, outcome = parser.finish()
+            record_span("response_parse", parse_seconds + time.perf_counter() - parse_start,
+                        question_id=request.question_id, outcome=outcome)
+            record_parse_outcome(question_type, outcome)
+            result = ScoringResult(score=score, explanation=explanation)
+            if outcome != DEFAULTED:
+                # Only cache scores the model actually produced, never the default
+                cache.set(cache_key, (result.model_copy(), outcome))
+            yield "outcome", outcome
+            yield "result", result
                 
         except Exception as e:
+            if raise_errors:
+                raise
             # Return default score on error (same as old system)
-            return ScoringResult(
-                score=3,
+            yield "outcome", FAILED
+            yield "result", ScoringResult(
+                score=DEFAULT_SCORE,
                 explanation=f"Scoring failed: {str(e)}"
             )
 
+    async def _generate_text(self, prompt: str) -> str:
+        """Model response for a prompt, read until the score and explanation are complete"""
+        parser = ScoreStreamParser()
+        async with aclosing(self.model_client.generate_content_async(prompt)) as stream:
+            async for chunk in stream:
+                parser.feed(chunk if isinstance(chunk, str) else chunk.text)
+                if parser.complete:
+                    break
+        return parser.text
+
 # ADK pattern: root_agent must be defined for discovery
-root_agent = OpenEndedScoringAgent()
+# It is built on first access so importing this module does not construct an agent
+_root_agent = None
+
+def get_root_agent() -> OpenEndedScoringAgent:
+    """Get or create the shared open-ended scoring agent."""
+    global _root_agent
+    if _root_agent is None:
+        _root_agent = OpenEndedScoringAgent()
+    return _root_agent
+
+def __getattr__(name: str):
+    if name == "root_agent":
+        return get_root_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,151 @@
+"""
+Content-addressed cache for open-ended scoring results
+Gutcheck.AI - Skips the Gemini round trip when an identical prompt was scored recently
+An optional shared tier (a SQLite file) lets every server worker on the instance
+reuse scores computed by the others.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from runtime.shared_cache import SharedCache
+
+
+def make_cache_key(question_type: str, prompt: str, model_name: str, prompt_version: str) -> str:
+    """Hash everything that can change the model's answer into a cache key."""
+    digest = hashlib.sha256()
+    for part in (question_type, prompt, model_name, prompt_version):
+        encoded = part.encode("utf-8")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") never collide
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class ScoringCache:
+    """
+    Size-bounded LRU cache with per-entry TTL and hit/miss/eviction counters,
+    backed by an optional cross-process shared tier consulted on local misses.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0,
+                 shared: Optional[SharedCache] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+
+        # Another worker may have scored it; the lookup runs outside the lock
+        value = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+        self._set_local(key, value)
+        return value
+
+    def set(self, key: str, value: Any):
+        """Store a value locally and in the shared tier, evicting the least recently used entries if full."""
+        self._set_local(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def _set_local(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries, including the shared tier's (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def make_shared_tier(path: str, ttl_seconds: float = 3600.0, max_entries: int = 100_000) -> SharedCache:
+    """Shared tier holding (ScoringResult, parse outcome) entries as JSON."""
+    from .agent import ScoringResult
+
+    def decode(text: str):
+        entry = json.loads(text)
+        return ScoringResult.model_validate(entry["result"]), entry["outcome"]
+
+    return SharedCache(
+        path,
+        ttl_seconds=ttl_seconds,
+        max_entries=max_entries,
+        encode=lambda entry: json.dumps({"result": entry[0].model_dump(), "outcome": entry[1]}),
+        decode=decode,
+    )
+
+
+# Global cache instance
+scoring_cache = None
+
+
+def get_scoring_cache() -> ScoringCache:
+    """Get or create the global scoring cache instance."""
+    global scoring_cache
+    if scoring_cache is None:
+        ttl_seconds = float(os.getenv("SCORING_CACHE_TTL_SECONDS", "3600"))
+        shared = None
+        shared_path = os.getenv("SCORING_SHARED_CACHE_PATH")
+        if shared_path:
+            shared = make_shared_tier(
+                shared_path, ttl_seconds, int(os.getenv("SCORING_SHARED_CACHE_MAX_ENTRIES", "100000"))
+            )
+        scoring_cache = ScoringCache(
+            max_entries=int(os.getenv("SCORING_CACHE_MAX_ENTRIES", "1024")),
+            ttl_seconds=ttl_seconds,
+            shared=shared,
+        )
+    return scoring_cache
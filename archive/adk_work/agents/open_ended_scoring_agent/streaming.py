@@ -0,0 +1,155 @@
+"""
+Incremental parsing of streamed scoring responses
+Pulls the score and explanation out of a partially received JSON object so they
+can be forwarded to the client before the model has finished generating, and
+tells the caller when both are in so it can stop reading the stream. Markdown
+code fences, text around the object and a missing closing brace are tolerated.
+Fields are only read from the JSON object, so a "score" quoted in prose before it
+is ignored; a score found outside any object is a last-resort, recovered parse.
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Scores are sometimes quoted ("4") or written as floats (4.0)
+SCORE_PATTERN = re.compile(r'"score"\s*:\s*"?(\d+)(?=\D)')
+EXPLANATION_PATTERN = re.compile(r'"explanation"\s*:\s*"')
+# Where the JSON object starts (after any code fence and preamble)
+OBJECT_START = re.compile(r'\{\s*"')
+
+MIN_SCORE = 1
+MAX_SCORE = 5
+DEFAULT_SCORE = 3
+DEFAULT_EXPLANATION = "Score extracted from AI response"
+
+# Parse outcomes: both fields read in full from the object, score read but
+# explanation cut off or missing (or score found only outside the object), or no
+# score at all (DEFAULT_SCORE is used)
+CLEAN = "clean"
+RECOVERED = "recovered"
+DEFAULTED = "defaulted"
+
+JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class ScoreStreamParser:
+    """Feed model output chunks in; get ("score", int) and ("explanation", text delta) events out."""
+
+    def __init__(self):
+        self.text = ""
+        self.score: Optional[int] = None
+        # A score off the 1-5 scale is never sent; the response is treated as having none
+        self.score_invalid = False
+        self.explanation = ""
+        self.explanation_complete = False
+        self._object_pos: Optional[int] = None
+        self._explanation_pos: Optional[int] = None
+
+    @property
+    def complete(self) -> bool:
+        """Both fields have been read; the rest of the stream carries nothing we use."""
+        return (self.score is not None or self.score_invalid) and self.explanation_complete
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Add a chunk and return the events it completes."""
+        self.text += chunk
+        events = []
+
+        if self._object_pos is None:
+            match = OBJECT_START.search(self.text)
+            if match is None:
+                return events
+            self._object_pos = match.start()
+
+        if self.score is None and not self.score_invalid:
+            match = SCORE_PATTERN.search(self.text, self._object_pos)
+            if match:
+                score = int(match.group(1))
+                if MIN_SCORE <= score <= MAX_SCORE:
+                    self.score = score
+                    events.append(("score", self.score))
+                else:
+                    self.score_invalid = True
+
+        if self._explanation_pos is None:
+            match = EXPLANATION_PATTERN.search(self.text, self._object_pos)
+            if match:
+                self._explanation_pos = match.end()
+
+        if self._explanation_pos is not None and not self.explanation_complete:
+            delta = self._decode_explanation()
+            if delta:
+                self.explanation += delta
+                events.append(("explanation", delta))
+
+        return events
+
+    def finish(self) -> Tuple[int, str, str]:
+        """Score, explanation and parse outcome once the stream has ended or been stopped."""
+        if self.score is None and not self.score_invalid:
+            # No score in the object: fall back to one anywhere in the text, flagged as recovered
+            match = SCORE_PATTERN.search(self.text)
+            if match and MIN_SCORE <= int(match.group(1)) <= MAX_SCORE:
+                return int(match.group(1)), self.explanation or DEFAULT_EXPLANATION, RECOVERED
+        if self.score is None:
+            return DEFAULT_SCORE, DEFAULT_EXPLANATION, DEFAULTED
+        if self.explanation_complete:
+            return self.score, self.explanation, CLEAN
+        # Keep whatever part of the explanation arrived rather than dropping it
+        return self.score, self.explanation or DEFAULT_EXPLANATION, RECOVERED
+
+    def _decode_explanation(self) -> str:
+        # Decode as much of the JSON string as has arrived, stopping before a split escape
+        pieces = []
+        pos = self._explanation_pos
+        text = self.text
+        while pos < len(text):
+            char = text[pos]
+            if char == '"':
+                self.explanation_complete = True
+                pos += 1
+                break
+            if char != '\\':
+                pieces.append(char)
+                pos += 1
+                continue
+            if pos + 1 >= len(text):
+                break
+            escape = text[pos + 1]
+            if escape == 'u':
+                if pos + 6 > len(text):
+                    break
+                pieces.append(chr(int(text[pos + 2:pos + 6], 16)))
+                pos += 6
+            else:
+                pieces.append(JSON_ESCAPES.get(escape, escape))
+                pos += 2
+        self._explanation_pos = pos
+        return "".join(pieces)
+
+
+class ParseOutcomes:
+    """Thread-safe counts of clean, recovered and defaulted parses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {CLEAN: 0, RECOVERED: 0, DEFAULTED: 0}
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of outcome counters."""
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                **self.counts,
+                "total": total,
+                "defaulted_rate": round(self.counts[DEFAULTED] / total, 4) if total else 0.0,
+            }
+
+
+# Global counters for every scoring call in the process
+parse_outcomes = ParseOutcomes()
@@ -5,19 +5,37 @@ Gutcheck.AI - Deployed to Google Cloud Functions
 """
 
 import functions_framework
-import asyncio
 import json
 import logging
-from typing import Dict, Any
+from pydantic import ValidationError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Import the agent
-from open_ended_scoring_agent.agent import root_agent
+# Request models only; the agent itself is built by the first handler that needs it
+from open_ended_scoring_agent.agent import BatchScoringRequest, ScoringRequest, QUESTION_TYPE_MAP, get_root_agent
+from runtime.admission import AdmissionRejected, get_admission_controller
+from runtime.event_loop import run_sync
+from runtime.http_errors import busy_response, validation_error_message
+from runtime.scheduler import request_work_class
+from runtime.singleflight import SingleFlight, request_fingerprint
+from runtime.warmup import get_probe, serve_probes, start_background_warmup
+from monitoring.cloud_monitoring import log_coalesced_request, track_latency
+from monitoring.tracing import span
+
+# Identical concurrent requests (double-submits, client retries) share one agent call
+open_ended_flight = SingleFlight("process_open_ended_scoring", on_coalesced=log_coalesced_request)
+open_ended_batch_flight = SingleFlight("process_open_ended_batch_scoring", on_coalesced=log_coalesced_request)
+
+def _open_ended_question_type(request) -> str:
+    """Question type label for open-ended scoring latency histograms"""
+    request_json = request.get_json(silent=True) or {}
+    return QUESTION_TYPE_MAP.get(request_json.get('question_id'), '')
 
 @functions_framework.http
+@serve_probes
+@track_latency("process_open_ended_scoring", question_type=_open_ended_question_type)
 def process_open_ended_scoring_http(request):
     """
     Cloud Functions HTTP entry point for open-ended question scoring
@@ -40,57 +58,101 @@ def process_open_ended_scoring_http(request):
         }), 405, {'Content-Type': 'application/json'}
 
     try:
-        # Parse the request
-        request_json = request.get_json()
-        if not request_json:
+        # Parse and validate the body in one pass
+        try:
+            with span("parse_validate"):
+                scoring_request = ScoringRequest.model_validate_json(request.get_data())
+        except ValidationError as e:
             return json.dumps({
                 'success': False,
-                'error': 'No JSON data provided'
+                'error': validation_error_message(e)
             }), 400, {'Content-Type': 'application/json'}
 
-        # Validate required fields
-        required_fields = ['question_id', 'response', 'question_text']
-        for field in required_fields:
-            if field not in request_json:
-                return json.dumps({
-                    'success': False,
-                    'error': f'Missing required field: {field}'
-                }), 400, {'Content-Type': 'application/json'}
-
-        # Convert to JSON string for the agent
-        input_data = {
-            'question_id': request_json['question_id'],
-            'response': request_json['response'],
-            'question_text': request_json['question_text']
+        # Call the agent on the shared event loop
+        with request_work_class(request.headers), get_admission_controller().slot("process_open_ended_scoring"):
+            result = run_sync(open_ended_flight.do(
+                request_fingerprint(scoring_request.model_dump()),
+                lambda: get_root_agent().score(scoring_request)
+            ))
+
+        with span("serialize"):
+            body = json.dumps({
+                'success': True,
+                'score': result.score,
+                'explanation': result.explanation
+            })
+        return body, 200, {'Content-Type': 'application/json'}
+
+    except AdmissionRejected as e:
+        return busy_response(e, {'Content-Type': 'application/json'})
+    except Exception as e:
+        logger.error(f'Error processing open-ended scoring request: {str(e)}')
+        return json.dumps({
+            'success': False,
+            'error': f'Processing failed: {str(e)}'
+        }), 500, {'Content-Type': 'application/json'}
+
+@functions_framework.http
+@serve_probes
+@track_latency("process_open_ended_batch_scoring", question_type=lambda request: "batch")
+def process_open_ended_batch_scoring_http(request):
+    """
+    Cloud Functions HTTP entry point for scoring all open-ended questions of a session
+    The model calls for each question run concurrently in one event loop
+    """
+    # Handle CORS preflight requests
+    if request.method == 'OPTIONS':
+        headers = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': 'POST, OPTIONS',
+            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Max-Age': '3600'
         }
-        input_json = json.dumps(input_data)
+        return ('', 204, headers)
 
-        # Call the agent synchronously
-        result = asyncio.run(root_agent.run(input_json))
+    # Only allow POST requests
+    if request.method != 'POST':
+        return json.dumps({
+            'success': False,
+            'error': 'Only POST requests are allowed'
+        }), 405, {'Content-Type': 'application/json'}
 
-        # Parse the result
+    try:
+        # Parse and validate the batch in one pass (question ids, required fields, batch size)
         try:
-            scoring_data = json.loads(result)
-            return json.dumps({
-                'success': True,
-                'score': scoring_data.get('score'),
-                'explanation': scoring_data.get('explanation')
-            }), 200, {'Content-Type': 'application/json'}
-        except json.JSONDecodeError:
-            logger.error(f'Failed to parse agent response: {result}')
+            with span("parse_validate"):
+                batch = BatchScoringRequest.model_validate_json(request.get_data())
+        except ValidationError as e:
             return json.dumps({
                 'success': False,
-                'error': 'Failed to parse agent response'
-            }), 500, {'Content-Type': 'application/json'}
+                'error': validation_error_message(e)
+            }), 400, {'Content-Type': 'application/json'}
 
+        # Score every question concurrently
+        with request_work_class(request.headers), get_admission_controller().slot("process_open_ended_batch_scoring"):
+            result = run_sync(open_ended_batch_flight.do(
+                request_fingerprint(batch.model_dump()),
+                lambda: get_root_agent().score_batch(batch)
+            ))
+
+        with span("serialize"):
+            body = json.dumps({
+                'success': True,
+                **result.model_dump()
+            })
+        return body, 200, {'Content-Type': 'application/json'}
+
+    except AdmissionRejected as e:
+        return busy_response(e, {'Content-Type': 'application/json'})
     except Exception as e:
-        logger.error(f'Error processing open-ended scoring request: {str(e)}')
+        logger.error(f'Error processing open-ended batch scoring request: {str(e)}')
         return json.dumps({
             'success': False,
             'error': f'Processing failed: {str(e)}'
         }), 500, {'Content-Type': 'application/json'}
 
 @functions_framework.http
+@serve_probes
 def health_check_http(request):
     """
     Health check endpoint for the open-ended scoring agent
@@ -110,19 +172,15 @@ def health_check_http(request):
             'error': 'Only GET requests are allowed'
         }), 405, {'Content-Type': 'application/json'}
 
-    try:
-        # Test the agent with a simple query
-        result = asyncio.run(root_agent.run("hello"))
-        return json.dumps({
-            'success': True,
-            'service': 'Open-Ended Question Scoring Agent',
-            'status': 'healthy',
-            'version': '1.0.0',
-            'agent_response': result
-        }), 200, {'Content-Type': 'application/json'}
-    except Exception as e:
-        return json.dumps({
-            'success': False,
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 500, {'Content-Type': 'application/json'}
+    # Cached result of the background deep check; never calls the model
+    readiness, ready = get_probe().readiness()
+    return json.dumps({
+        'success': ready,
+        'service': 'Open-Ended Question Scoring Agent',
+        'status': 'healthy' if ready else 'unhealthy',
+        'version': '1.0.0',
+        'readiness': readiness
+    }), 200 if ready else 503, {'Content-Type': 'application/json'}
+
+# Warm the deployed entry point (FUNCTION_TARGET) in the background; /readyz reports when done
+start_background_warmup()
@@ -0,0 +1 @@
+"""Shared runtime infrastructure for the agent entry points."""
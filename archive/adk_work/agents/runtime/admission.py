@@ -0,0 +1,244 @@
+"""
+Admission control and load shedding
+Caps how many requests one instance works on at once. Excess requests wait in a
+bounded FIFO queue; when the queue is full, or the expected wait already exceeds
+the queue deadline, they are rejected immediately so the client can retry
+elsewhere instead of every request slowing down until they all time out.
+
+Works from synchronous handler threads (functions_framework) and from async
+handlers (FastAPI) against the same per-instance limit.
+"""
+
+import asyncio
+import collections
+import contextlib
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FULL = "queue_full"
+DEADLINE = "deadline"
+
+
+class AdmissionRejected(Exception):
+    """Request shed by admission control; maps to an HTTP status with Retry-After."""
+
+    def __init__(self, reason: str, retry_after: int):
+        self.reason = reason
+        self.retry_after = retry_after
+        # 429 when we are simply full, 503 when we could not serve it in time
+        self.status_code = 429 if reason == QUEUE_FULL else 503
+        super().__init__(f"Server busy ({reason}); retry after {retry_after}s")
+
+
+class _Waiter:
+    """A queued request; granted a slot by whoever releases one."""
+
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Admission:
+    """A held slot; release it exactly once when the request is done."""
+
+    def __init__(self, controller: "AdmissionController", endpoint: str):
+        self.controller = controller
+        self.endpoint = endpoint
+        self.start = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(time.monotonic() - self.start)
+
+
+class AdmissionController:
+    """Per-instance concurrency limit with a bounded wait queue and queue-time deadline."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 on_admit: Optional[Callable[[str, float, int], None]] = None,
+                 on_reject: Optional[Callable[[str, str, int], None]] = None):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.on_admit = on_admit
+        self.on_reject = on_reject
+
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._active = 0
+        # Moving average of how long a request holds a slot, for wait estimates
+        self._service_time = 0.0
+        self.admitted = 0
+        self.rejected = {QUEUE_FULL: 0, DEADLINE: 0}
+
+    def acquire(self, endpoint: str) -> Admission:
+        """Block the calling thread until a slot is free, or raise AdmissionRejected."""
+        start = time.monotonic()
+        waiter = self._enqueue(endpoint)
+        if waiter is not None and not waiter.event.wait(self.queue_timeout):
+            self._abandon(endpoint, waiter)
+        return self._admitted(endpoint, start)
+
+    async def acquire_async(self, endpoint: str) -> Admission:
+        """Wait on the running loop until a slot is free, or raise AdmissionRejected."""
+        start = time.monotonic()
+        waiter = self._enqueue(endpoint, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter.future, self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._abandon(endpoint, waiter)
+            except asyncio.CancelledError:
+                # Give back a slot that was granted while we were being cancelled
+                with self._lock:
+                    if waiter.granted:
+                        self._hand_over()
+                    else:
+                        self._queue.remove(waiter)
+                raise
+        return self._admitted(endpoint, start)
+
+    @contextlib.contextmanager
+    def slot(self, endpoint: str):
+        """Hold a slot for the duration of a synchronous block."""
+        admission = self.acquire(endpoint)
+        try:
+            yield admission
+        finally:
+            admission.release()
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self, endpoint: str):
+        """Hold a slot for the duration of an async block."""
+        admission = await self.acquire_async(endpoint)
+        try:
+            yield admission
+        finally:
+            admission.release()
+
+    def stats(self):
+        """Snapshot of admission counters."""
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+                "service_time_seconds": round(self._service_time, 3),
+            }
+
+    def _enqueue(self, endpoint: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        # Returns None when admitted immediately, else the waiter to block on
+        with self._lock:
+            if self._active < self.max_concurrent and not self._queue:
+                self._active += 1
+                return None
+
+            depth = len(self._queue)
+            if depth >= self.max_queue:
+                reason = QUEUE_FULL
+            elif self._expected_wait(depth + 1) > self.queue_timeout:
+                reason = DEADLINE
+            else:
+                waiter = _Waiter(loop)
+                self._queue.append(waiter)
+                return waiter
+            retry_after = self._retry_after(depth + 1)
+            self.rejected[reason] += 1
+
+        self._notify_reject(endpoint, reason, depth)
+        raise AdmissionRejected(reason, retry_after)
+
+    def _abandon(self, endpoint: str, waiter: _Waiter):
+        # Deadline passed while queued; keep the slot if it was granted in the meantime
+        with self._lock:
+            if waiter.granted:
+                return
+            self._queue.remove(waiter)
+            depth = len(self._queue)
+            retry_after = self._retry_after(depth + 1)
+            self.rejected[DEADLINE] += 1
+
+        self._notify_reject(endpoint, DEADLINE, depth)
+        raise AdmissionRejected(DEADLINE, retry_after)
+
+    def _admitted(self, endpoint: str, start: float) -> Admission:
+        with self._lock:
+            self.admitted += 1
+            depth = len(self._queue)
+        if self.on_admit is not None:
+            try:
+                self.on_admit(endpoint, time.monotonic() - start, depth)
+            except Exception as e:
+                logger.warning(f"Failed to record admission for {endpoint}: {e}")
+        return Admission(self, endpoint)
+
+    def _release(self, held_seconds: float):
+        with self._lock:
+            self._service_time = held_seconds if self._service_time == 0 else \
+                0.8 * self._service_time + 0.2 * held_seconds
+            self._hand_over()
+
+    def _hand_over(self):
+        # Called with the lock held: pass the slot straight to the oldest waiter
+        if self._queue:
+            self._queue.popleft().grant()
+        else:
+            self._active -= 1
+
+    def _expected_wait(self, position: int) -> float:
+        return self._service_time * position / self.max_concurrent
+
+    def _retry_after(self, position: int) -> int:
+        return max(1, math.ceil(self._expected_wait(position)))
+
+    def _notify_reject(self, endpoint: str, reason: str, depth: int):
+        if self.on_reject is not None:
+            try:
+                self.on_reject(endpoint, reason, depth)
+            except Exception as e:
+                logger.warning(f"Failed to record rejection for {endpoint}: {e}")
+
+
+# Global admission controller (one per instance)
+admission = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create the instance-wide admission controller."""
+    global admission
+    if admission is None:
+        from monitoring.cloud_monitoring import log_admission, log_admission_rejected
+        admission = AdmissionController(
+            max_concurrent=int(os.getenv("MAX_CONCURRENT_REQUESTS", "8")),
+            max_queue=int(os.getenv("MAX_QUEUE_DEPTH", "16")),
+            queue_timeout=float(os.getenv("QUEUE_TIMEOUT_SECONDS", "30")),
+            on_admit=log_admission,
+            on_reject=log_admission_rejected
+        )
+    return admission
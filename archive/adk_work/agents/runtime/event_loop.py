@@ -0,0 +1,141 @@
+"""
+Persistent event loop runtime
+Keeps one long-lived asyncio loop per instance on a background thread so that
+synchronous functions_framework handlers can run coroutines without paying for
+asyncio.run() on every request, and async clients/caches bound to the loop
+survive across invocations.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import contextvars
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """An asyncio event loop running forever on a dedicated daemon thread."""
+
+    def __init__(self, name: str = "agent-event-loop"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop, started on first use (and restarted after fork)."""
+        if self._loop is None or self._pid != os.getpid() or not self._loop.is_running():
+            self.start()
+        return self._loop
+
+    def start(self):
+        """Start the loop thread if it is not already running in this process."""
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid() and self._loop.is_running():
+                return
+
+            # A forked child inherits the loop object but not its thread; build a fresh one
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_forever():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=run_forever, name=self.name, daemon=True)
+            thread.start()
+            ready.wait()
+
+            self._loop = loop
+            self._thread = thread
+            self._pid = os.getpid()
+            logger.info(f"Started background event loop '{self.name}'")
+
+    def submit(self, coro: Coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop, carrying over the caller's contextvars."""
+        loop = self.loop
+        context = contextvars.copy_context()
+        future: concurrent.futures.Future = concurrent.futures.Future()
+
+        def create_task():
+            if future.cancelled():
+                coro.close()
+                return
+            task = loop.create_task(coro, context=context)
+
+            def copy_result(done: asyncio.Task):
+                if future.done():
+                    return
+                if done.cancelled():
+                    future.cancel()
+                elif done.exception() is not None:
+                    future.set_exception(done.exception())
+                else:
+                    future.set_result(done.result())
+
+            def cancel_task(done: concurrent.futures.Future):
+                # Cancelling the caller's future cancels the task on the loop
+                if done.cancelled():
+                    loop.call_soon_threadsafe(task.cancel)
+
+            task.add_done_callback(copy_result)
+            future.add_done_callback(cancel_task)
+
+        loop.call_soon_threadsafe(create_task)
+        return future
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and block the calling thread for its result."""
+        if self._is_loop_thread():
+            coro.close()
+            raise RuntimeError("run() called from the event loop thread; await the coroutine instead")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the loop and join its thread."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            if loop is None or self._pid != os.getpid():
+                return
+            loop.call_soon_threadsafe(loop.stop)
+            if thread is not None:
+                thread.join(timeout)
+            if not loop.is_running():
+                loop.close()
+            self._loop = None
+            self._thread = None
+
+    def _is_loop_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+
+# Global runtime instance
+runtime = None
+
+
+def get_runtime() -> BackgroundEventLoop:
+    """Get or create the global background event loop."""
+    global runtime
+    if runtime is None:
+        runtime = BackgroundEventLoop()
+        atexit.register(runtime.stop)
+    return runtime
+
+
+def run_sync(coro: Coroutine, timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on the shared loop from synchronous handler code."""
+    return get_runtime().run(coro, timeout=timeout)
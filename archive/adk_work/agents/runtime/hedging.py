@@ -0,0 +1,165 @@
+"""
+Hedged requests
+If a call has not finished by an adaptive percentile of recent latencies, issue a
+second identical call; the first to succeed wins and the other is cancelled.
+Extra calls are capped by a budget that accrues a fraction of a hedge per call,
+so hedging cannot multiply load when the model is uniformly slow.
+"""
+
+import asyncio
+import collections
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Hedger:
+    """Runs a coroutine factory with at most one hedged duplicate."""
+
+    def __init__(self, name: str, percentile: float = 0.95, budget: float = 0.1, max_credit: float = 10.0,
+                 min_samples: int = 20, window: int = 500,
+                 on_hedge: Optional[Callable[[str, bool], None]] = None):
+        self.name = name
+        self.percentile = percentile
+        self.budget = budget
+        self.max_credit = max_credit
+        self.min_samples = min_samples
+        self.on_hedge = on_hedge
+
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._threshold: Optional[float] = None
+        self._samples_since_threshold = 0
+        self._credit = 0.0
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_exhausted = 0
+
+    def threshold(self) -> Optional[float]:
+        """Current hedge delay in seconds, or None until there is enough history."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            # Recompute lazily; the percentile moves slowly
+            if self._threshold is None or self._samples_since_threshold >= 10:
+                ordered = sorted(self._latencies)
+                self._threshold = ordered[min(len(ordered) - 1, int(self.percentile * len(ordered)))]
+                self._samples_since_threshold = 0
+            return self._threshold
+
+    def record(self, seconds: float):
+        """Add a latency sample to the history the hedge delay is computed from."""
+        with self._lock:
+            self._latencies.append(seconds)
+            self._samples_since_threshold += 1
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn(), hedging with a second fn() call if the first is slow."""
+        start = time.perf_counter()
+        with self._lock:
+            self.calls += 1
+            self._credit = min(self.max_credit, self._credit + self.budget)
+
+        delay = self.threshold()
+        primary = asyncio.ensure_future(fn())
+        if delay is None:
+            return await self._finish(primary, start)
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._take_credit():
+            return await self._finish(primary, start)
+
+        backup = asyncio.ensure_future(fn())
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._report(won=task is backup)
+                        return self._finish_result(task, start)
+            # Both failed: surface the original call's error
+            self._report(won=False)
+            return self._finish_result(primary, start)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of hedging counters."""
+        threshold = self.threshold()
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+                "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+                "budget_exhausted": self.budget_exhausted,
+                "threshold_seconds": threshold,
+            }
+
+    async def _finish(self, task: asyncio.Future, start: float) -> Any:
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        return self._finish_result(task, start)
+
+    def _finish_result(self, task: asyncio.Future, start: float) -> Any:
+        result = task.result()
+        # One sample per call, timed from run(): the latency the caller saw. When a backup wins
+        # this is also how long the losing primary had run, so slow primaries stay in the history
+        # instead of being replaced by the backup's shorter time, which would drag the delay down
+        self.record(time.perf_counter() - start)
+        return result
+
+    def _take_credit(self) -> bool:
+        with self._lock:
+            if self._credit < 1.0:
+                self.budget_exhausted += 1
+                return False
+            self._credit -= 1.0
+            self.hedged += 1
+            return True
+
+    def _report(self, won: bool):
+        with self._lock:
+            self.hedge_wins += 1 if won else 0
+        if self.on_hedge is not None:
+            try:
+                self.on_hedge(self.name, won)
+            except Exception as e:
+                logger.warning(f"Failed to record hedge for {self.name}: {e}")
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("HEDGE_REQUESTS", "").lower() in ("1", "true", "yes")
+
+
+# Global hedgers, one per call site
+hedgers: Dict[str, Hedger] = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(name: str) -> Optional[Hedger]:
+    """Get or create the hedger for a call site; None when HEDGE_REQUESTS is off."""
+    if not hedging_enabled():
+        return None
+    with _hedgers_lock:
+        if name not in hedgers:
+            from monitoring.cloud_monitoring import log_hedged_request
+            hedgers[name] = Hedger(
+                name,
+                percentile=float(os.getenv("HEDGE_PERCENTILE", "0.95")),
+                budget=float(os.getenv("HEDGE_BUDGET", "0.1")),
+                min_samples=int(os.getenv("HEDGE_MIN_SAMPLES", "20")),
+                on_hedge=log_hedged_request
+            )
+        return hedgers[name]
@@ -0,0 +1,41 @@
+"""
+Error responses shared by the Cloud Functions entry points
+Both main.py and open_ended_scoring_agent_main.py report validation failures and
+admission rejections the same way, so the body and headers are built here.
+"""
+
+import json
+from typing import Dict
+
+from pydantic import ValidationError
+
+from .admission import AdmissionRejected
+
+
+def field_path(loc) -> str:
+    """Dotted path of a validation error location, e.g. responses[0].questionId"""
+    path = ""
+    for part in loc:
+        if isinstance(part, int):
+            path += f"[{part}]"
+        else:
+            path += f".{part}" if path else str(part)
+    return path
+
+
+def validation_error_message(e: ValidationError) -> str:
+    """Client-facing message for a request body that failed validation"""
+    error = e.errors(include_url=False, include_context=False)[0]
+    if error["type"] in ("json_invalid", "model_type"):
+        return "No JSON data provided"
+    if error["type"] == "missing":
+        return f"Missing required field: {field_path(error['loc'])}"
+    return f"Invalid request: {e.errors(include_url=False, include_context=False)}"
+
+
+def busy_response(e: AdmissionRejected, headers: Dict[str, str]):
+    """429/503 with Retry-After for a request shed by admission control"""
+    return (json.dumps({
+        'success': False,
+        'error': str(e)
+    }), e.status_code, {**headers, 'Retry-After': str(e.retry_after), 'Access-Control-Expose-Headers': 'Retry-After'})
@@ -0,0 +1,514 @@
+"""
+Asynchronous job mode
+Long assessments and scoring runs are submitted as jobs instead of holding an
+HTTP connection (and an instance slot) open for the whole model call. Jobs go
+into a durable queue, a worker pool runs them at a fixed concurrency, and the
+result is stored for polling by job id or POSTed to a webhook.
+
+The queue is a SQLite file by default, so it survives restarts and is shared by
+every worker process on the instance, but not between instances. Any object with
+the same methods as SqliteJobStore (enqueue, claim, complete, fail, retry, get,
+purge, stats) can replace it, e.g. one backed by Firestore or Cloud Tasks: set
+JOB_STORE_FACTORY to "module:callable" returning the store. Deployments that
+scale out (Cloud Functions) need such a shared store; jobs_http refuses to run
+on the per-instance file unless JOB_SINGLE_INSTANCE says there is only one.
+
+Model calls made by jobs are scheduled as batch (or backfill) work, so they only
+use the capacity interactive requests leave free.
+
+A running job holds a lease; if its worker dies the lease expires and another
+worker picks the job up again, up to max_attempts times. A job whose handler hit
+a retryable error (429, 5xx, timeouts) is queued again with backoff, within the
+same max_attempts. A job is only finished
+by the attempt that holds it, so a worker that lost its lease cannot overwrite
+the result of the one that took over.
+
+Submissions are refused with 429 once JOB_MAX_QUEUED jobs are waiting. Webhooks
+are only sent to hosts listed in JOB_WEBHOOK_ALLOWED_HOSTS (none by default) and
+are signed with JOB_WEBHOOK_SECRET when it is set.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Literal, Optional
+from urllib.parse import urlparse
+
+import httpx
+from pydantic import BaseModel, Field, field_validator
+
+from monitoring.tracing import trace
+from .admission import QUEUE_FULL, AdmissionRejected
+from .model_client import is_retryable
+from .persistence import persist_assessment
+from .scheduler import BATCH, work_class
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Header carrying the webhook body's HMAC-SHA256 ("sha256=<hex>") over "<timestamp>.<body>"
+SIGNATURE_HEADER = "X-Webhook-Signature"
+TIMESTAMP_HEADER = "X-Webhook-Timestamp"
+
+
+class JobSubmission(BaseModel):
+    """A job to run: the kind of work, its request body, and an optional webhook"""
+    kind: Literal["assessment", "open_ended", "open_ended_batch"] = Field(description="Type of work")
+    payload: Dict[str, Any] = Field(description="Request body, as sent to the synchronous endpoint")
+    webhook_url: Optional[str] = Field(default=None, description="URL to POST the finished job to")
+    priority: Literal["batch", "backfill"] = Field(default="batch", description="Scheduling class of its model calls")
+    tenant: Optional[str] = Field(default=None, description="Tenant or pilot cohort whose share the job uses")
+
+    @field_validator("webhook_url")
+    @classmethod
+    def check_webhook_url(cls, url: Optional[str]) -> Optional[str]:
+        if url is None:
+            return url
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError("webhook_url must be an http(s) URL")
+        # Deny by default: the worker would otherwise POST to any address it can reach
+        allowed = [host.strip() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()]
+        if parsed.hostname not in allowed:
+            raise ValueError(f"webhook host {parsed.hostname} is not allowed")
+        return url
+
+
+class Job(BaseModel):
+    """A submitted job and, once finished, its result"""
+    job_id: str
+    kind: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    webhook_url: Optional[str] = None
+    priority: str = BATCH
+    tenant: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class SqliteJobStore:
+    """Durable job queue in a SQLite file, safe to share between processes."""
+
+    COLUMNS = ("job_id, kind, status, payload, result, error, attempts, webhook_url, priority, tenant, "
+               "created_at, updated_at")
+
+    def __init__(self, path: str, max_attempts: int = 3, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork; each worker process opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, payload TEXT NOT NULL, "
+                "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, webhook_url TEXT, "
+                "priority TEXT NOT NULL DEFAULT 'batch', tenant TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL, lease_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+            self._migrate(conn)
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    # Columns added since the first release, for queue files created before them
+    ADDED_COLUMNS = (("priority", "TEXT NOT NULL DEFAULT 'batch'"), ("tenant", "TEXT"))
+
+    def _migrate(self, conn: sqlite3.Connection):
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for name, definition in self.ADDED_COLUMNS:
+            if name in existing:
+                continue
+            try:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            except sqlite3.OperationalError as e:
+                # Another process added it first
+                if "duplicate column" not in str(e):
+                    raise
+
+    def _job(self, row) -> Job:
+        (job_id, kind, status, payload, result, error, attempts, webhook_url, priority, tenant,
+         created_at, updated_at) = row
+        return Job(
+            job_id=job_id, kind=kind, status=status, payload=json.loads(payload),
+            result=json.loads(result) if result is not None else None, error=error, attempts=attempts,
+            webhook_url=webhook_url, priority=priority, tenant=tenant, created_at=created_at, updated_at=updated_at,
+        )
+
+    def enqueue(self, submission: JobSubmission) -> Job:
+        now = self.clock()
+        job = Job(job_id=uuid.uuid4().hex, kind=submission.kind, status=QUEUED, payload=submission.payload,
+                  webhook_url=submission.webhook_url, priority=submission.priority, tenant=submission.tenant,
+                  created_at=now, updated_at=now)
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO jobs (job_id, kind, status, payload, webhook_url, priority, tenant, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.job_id, job.kind, job.status, json.dumps(job.payload), job.webhook_url, job.priority, job.tenant,
+                 now, now)
+            )
+        return job
+
+    def claim(self, lease_seconds: float) -> Optional[Job]:
+        """Take the oldest runnable job (queued, or running with an expired lease) and lease it."""
+        now = self.clock()
+        with self._lock:
+            conn = self._connection()
+            # Jobs whose worker died too many times are given up on
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ?, lease_until = NULL "
+                "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "Worker lost the job too many times", now, RUNNING, now, self.max_attempts)
+            )
+            # A single UPDATE is atomic, so two processes never claim the same job.
+            # A queued job's lease_until, when set, is the time a retry may start
+            row = conn.execute(
+                f"UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ? "
+                f"WHERE job_id = (SELECT job_id FROM jobs WHERE (status = ? AND (lease_until IS NULL OR lease_until < ?)) "
+                f"OR (status = ? AND lease_until < ?) ORDER BY created_at LIMIT 1) RETURNING {self.COLUMNS}",
+                (RUNNING, now + lease_seconds, now, QUEUED, now, RUNNING, now)
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def complete(self, job_id: str, result: Dict[str, Any], attempt: int) -> bool:
+        """Store the result of the claimed attempt; False if that attempt no longer holds the job."""
+        return self._finish(job_id, attempt, SUCCEEDED, json.dumps(result), None)
+
+    def fail(self, job_id: str, error: str, attempt: int) -> bool:
+        return self._finish(job_id, attempt, FAILED, None, error)
+
+    def retry(self, job_id: str, error: str, attempt: int, delay: float) -> bool:
+        """Queue the claimed attempt's job again, to be claimed no sooner than delay seconds from now."""
+        return self._finish(job_id, attempt, QUEUED, None, error, self.clock() + delay)
+
+    def _finish(self, job_id: str, attempt: int, status: str, result: Optional[str], error: Optional[str],
+                lease_until: Optional[float] = None) -> bool:
+        # Fenced on the attempt: after a lease expires the job belongs to the next claim
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, lease_until = ? "
+                "WHERE job_id = ? AND status = ? AND attempts = ?",
+                (status, result, error, self.clock(), lease_until, job_id, RUNNING, attempt)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {self.COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs last updated more than older_than_seconds ago."""
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (SUCCEEDED, FAILED, self.clock() - older_than_seconds)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts by status."""
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0, **dict(rows)}
+
+
+async def run_assessment(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from assessment_analysis_agent.agent import AssessmentRequest, AssessmentResult, get_root_agent
+
+    request = AssessmentRequest.model_validate(payload)
+    analysis = await get_root_agent().analyze(request.to_session())
+    persist_assessment(request, analysis)
+    return AssessmentResult(success=True, data=analysis).model_dump(mode="json", exclude_none=True)
+
+
+async def run_open_ended(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from open_ended_scoring_agent.agent import ScoringRequest, get_root_agent
+
+    # A failed model call fails the attempt (and is retried) instead of storing the default score
+    result = await get_root_agent().score(ScoringRequest.model_validate(payload), raise_errors=True)
+    return {"success": True, **result.model_dump()}
+
+
+async def run_open_ended_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from open_ended_scoring_agent.agent import BatchScoringRequest, get_root_agent
+
+    result = await get_root_agent().score_batch(BatchScoringRequest.model_validate(payload))
+    return {"success": True, **result.model_dump()}
+
+
+# Job kind -> coroutine function taking the payload and returning the result body
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = {
+    "assessment": run_assessment,
+    "open_ended": run_open_ended,
+    "open_ended_batch": run_open_ended_batch,
+}
+
+
+def validate_payload(submission: JobSubmission):
+    """Reject a payload its job would fail on, at submit time rather than in the worker."""
+    if submission.kind == "assessment":
+        from assessment_analysis_agent.agent import AssessmentRequest as model
+    elif submission.kind == "open_ended":
+        from open_ended_scoring_agent.agent import ScoringRequest as model
+    else:
+        from open_ended_scoring_agent.agent import BatchScoringRequest as model
+    model.model_validate(submission.payload)
+
+
+class JobRunner:
+    """Worker pool: runs jobs from the store at a fixed concurrency on one event loop."""
+
+    def __init__(self, store: SqliteJobStore,
+                 handlers: Optional[Dict[str, Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]]] = None,
+                 concurrency: int = 4, poll_interval: float = 1.0, lease_seconds: float = 600.0,
+                 retention_seconds: float = 86400.0, webhook_retries: int = 3, webhook_timeout: float = 10.0,
+                 webhook_transport: Optional[httpx.AsyncBaseTransport] = None,
+                 webhook_secret: Optional[str] = None, retry_delay: float = 10.0):
+        self.store = store
+        self.handlers = handlers if handlers is not None else JOB_HANDLERS
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.webhook_retries = webhook_retries
+        self.webhook_timeout = webhook_timeout
+        self.webhook_transport = webhook_transport
+        self.webhook_secret = webhook_secret
+        self.retry_delay = retry_delay
+        self._deliveries = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.webhooks_failed = 0
+
+    async def run(self):
+        """Run the workers until cancelled."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            while True:
+                await asyncio.to_thread(self.store.purge, self.retention_seconds)
+                await asyncio.sleep(3600)
+        finally:
+            for task in [*workers, *self._deliveries]:
+                task.cancel()
+            await asyncio.gather(*workers, *self._deliveries, return_exceptions=True)
+
+    def notify(self):
+        """Wake an idle worker (callable from any thread) after a job was submitted."""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def run_once(self) -> Optional[Job]:
+        """Claim and run one job; None when the queue is empty."""
+        # Store calls can wait on another process's write lock; keep them off the loop
+        job = await asyncio.to_thread(self.store.claim, self.lease_seconds)
+        if job is None:
+            return None
+        handler = self.handlers.get(job.kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Unknown job kind: {job.kind}")
+            # Model calls made by the job are scheduled as its class, behind interactive traffic
+            with work_class(job.priority, job.tenant), trace(f"job:{job.kind}", job.job_id):
+                result = await handler(job.payload)
+        except Exception as e:
+            if is_retryable(e) and job.attempts < self.store.max_attempts:
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                logger.warning(f"Job {job.job_id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay}s: {e}")
+                if await asyncio.to_thread(self.store.retry, job.job_id, str(e), job.attempts, delay):
+                    with self._lock:
+                        self.retried += 1
+                return await asyncio.to_thread(self.store.get, job.job_id)
+            logger.error(f"Job {job.job_id} ({job.kind}) failed: {e}")
+            finished_here = await asyncio.to_thread(self.store.fail, job.job_id, str(e), job.attempts)
+            if finished_here:
+                with self._lock:
+                    self.failed += 1
+        else:
+            finished_here = await asyncio.to_thread(self.store.complete, job.job_id, result, job.attempts)
+            if finished_here:
+                with self._lock:
+                    self.completed += 1
+        if not finished_here:
+            # The lease expired and another attempt owns the job; it reports the outcome
+            logger.warning(f"Job {job.job_id} attempt {job.attempts} lost its lease; result discarded")
+            return await asyncio.to_thread(self.store.get, job.job_id)
+        finished = await asyncio.to_thread(self.store.get, job.job_id)
+        if finished is not None and finished.webhook_url:
+            # Sent from its own task, so a slow or dead receiver does not hold a worker
+            delivery = asyncio.create_task(self._deliver(finished))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+        return finished
+
+    async def wait_for_webhooks(self):
+        """Wait until every webhook started so far has been delivered or given up on."""
+        while self._deliveries:
+            await asyncio.gather(*list(self._deliveries), return_exceptions=True)
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+                job = None
+            if job is None:
+                # Idle: wait for a local submission or poll for ones from other processes
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _deliver(self, job: Job):
+        body = json.dumps(job.model_dump(mode="json", exclude={"payload"})).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.webhook_secret:
+            headers.update(sign_webhook(body, self.webhook_secret, int(time.time())))
+        async with httpx.AsyncClient(timeout=self.webhook_timeout, transport=self.webhook_transport) as client:
+            for attempt in range(self.webhook_retries):
+                try:
+                    response = await client.post(job.webhook_url, content=body, headers=headers)
+                    if response.status_code < 500:
+                        if response.status_code >= 400:
+                            logger.warning(f"Webhook for job {job.job_id} rejected: {response.status_code}")
+                        return
+                except httpx.HTTPError as e:
+                    logger.warning(f"Webhook for job {job.job_id} failed: {e}")
+                if attempt + 1 < self.webhook_retries:
+                    await asyncio.sleep(2 ** attempt)
+        with self._lock:
+            self.webhooks_failed += 1
+        logger.error(f"Giving up on webhook for job {job.job_id}; the result can still be polled")
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of runner counters and queue depth."""
+        with self._lock:
+            counters = {"completed": self.completed, "failed": self.failed, "retried": self.retried,
+                        "webhooks_failed": self.webhooks_failed}
+        return {"concurrency": self.concurrency, **counters, "jobs": self.store.stats()}
+
+
+def sign_webhook(body: bytes, secret: str, timestamp: int) -> Dict[str, str]:
+    """Headers that let the receiver verify a webhook came from us (and reject stale replays)."""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return {TIMESTAMP_HEADER: str(timestamp), SIGNATURE_HEADER: f"sha256={digest}"}
+
+
+# Retry-After for a submission refused because the queue is full
+JOB_QUEUE_RETRY_AFTER = 30
+
+# Global store and runner, one per process
+job_store = None
+job_runner = None
+_runner_pid: Optional[int] = None
+_jobs_lock = threading.Lock()
+
+
+def shared_store_configured() -> bool:
+    """Whether every instance sees the same jobs: a shared store, or a deployment of one instance."""
+    return bool(os.getenv("JOB_STORE_FACTORY")) or \
+        os.getenv("JOB_SINGLE_INSTANCE", "false").lower() in ("1", "true", "yes")
+
+
+def get_job_store() -> SqliteJobStore:
+    """Get or create the process-wide job store (JOB_STORE_FACTORY's, or the SQLite file)."""
+    global job_store
+    with _jobs_lock:
+        if job_store is None:
+            max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+            factory = os.getenv("JOB_STORE_FACTORY")
+            if factory:
+                module, _, name = factory.partition(":")
+                job_store = getattr(importlib.import_module(module), name)(max_attempts=max_attempts)
+            else:
+                job_store = SqliteJobStore(os.getenv("JOB_QUEUE_PATH", "/tmp/gutcheck/jobs.sqlite3"),
+                                           max_attempts=max_attempts)
+        return job_store
+
+
+def get_job_runner() -> JobRunner:
+    """Get or create the process-wide job runner (not started)."""
+    global job_runner
+    store = get_job_store()
+    with _jobs_lock:
+        if job_runner is None:
+            job_runner = JobRunner(
+                store,
+                concurrency=int(os.getenv("JOB_WORKERS", "4")),
+                lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "600")),
+                retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", "86400")),
+                webhook_secret=os.getenv("JOB_WEBHOOK_SECRET") or None,
+                retry_delay=float(os.getenv("JOB_RETRY_DELAY_SECONDS", "10")),
+            )
+        return job_runner
+
+
+def start_job_runner_in_background():
+    """Start the runner on the shared background event loop (sync handlers); once per process."""
+    global _runner_pid
+    with _jobs_lock:
+        if _runner_pid == os.getpid():
+            return
+        _runner_pid = os.getpid()
+    from .event_loop import get_runtime
+    get_runtime().submit(get_job_runner().run())
+
+
+def submit_job(submission: JobSubmission) -> Job:
+    """
+    Validate the payload, enqueue the job and wake a local worker.
+    Raises AdmissionRejected (429) once JOB_MAX_QUEUED jobs are already waiting.
+    """
+    validate_payload(submission)
+    store = get_job_store()
+    max_queued = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+    if max_queued and store.stats()[QUEUED] >= max_queued:
+        raise AdmissionRejected(QUEUE_FULL, JOB_QUEUE_RETRY_AFTER)
+    job = store.enqueue(submission)
+    if job_runner is not None:
+        job_runner.notify()
+    return job
+
+
+def job_response(job: Job) -> Dict[str, Any]:
+    """Client view of a job: everything but the submitted payload."""
+    return job.model_dump(mode="json", exclude={"payload"})
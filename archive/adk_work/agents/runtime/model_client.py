@@ -0,0 +1,281 @@
+"""
+Shared, quota-aware model client
+One pool per model for the whole instance: a long-lived async client per API key
+(so HTTP connections are kept alive and reused), token buckets sized to the
+per-minute request and token quota, least-loaded selection across pooled keys,
+and jittered exponential backoff on 429/5xx. Calls first take a slot from the
+priority / fair-share scheduler, so bulk work cannot crowd out interactive calls.
+
+Any object with an async generator `generate_content_async(prompt)` yielding text
+chunks can stand in for a backend, which is how the tests drive it with a fake model.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from contextlib import aclosing, nullcontext
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+
+from .scheduler import FairScheduler, get_scheduler
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Refills at rate_per_minute, holding at most one minute of quota."""
+
+    def __init__(self, rate_per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(rate_per_minute)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken (0 if it can be taken now)."""
+        amount = min(amount, self.capacity)
+        deficit = amount - self.available()
+        return 0.0 if deficit <= 0 else deficit / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self._tokens -= amount
+
+    def refund(self, amount: float):
+        """Return (or, if negative, additionally charge) tokens after the real cost is known."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class GenAIBackend:
+    """google-genai async client for one API key; one instance per key for connection reuse."""
+
+    def __init__(self, model: str, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        from google import genai
+        from google.genai import types
+
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self.model = model
+        self.client = genai.Client(api_key=api_key, http_options=http_options)
+
+    async def generate_content_async(self, prompt: str) -> AsyncIterator[str]:
+        stream = await self.client.aio.models.generate_content_stream(model=self.model, contents=prompt)
+        async with aclosing(stream):
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+
+    async def warm(self):
+        """Open the connection with a model metadata lookup; no tokens are generated."""
+        await self.client.aio.models.get(model=self.model)
+
+
+class ModelEndpoint:
+    """One API key or project with its own quota."""
+
+    def __init__(self, name: str, backend: Any, rpm: float, tpm: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.backend = backend
+        self.clock = clock
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+    def wait_time(self, tokens: float) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens),
+                   self.cooldown_until - self.clock(), 0.0)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of a model call failure, from google-genai, api_core or httpx errors."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if code is None and response is not None:
+        code = getattr(response, "status_code", None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Server-requested delay in seconds, if the error response carried one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    return status_code(error) in RETRYABLE_STATUS_CODES or \
+        isinstance(error, (httpx.TransportError, ConnectionError, asyncio.TimeoutError))
+
+
+class ModelClient:
+    """Schedules model calls across pooled endpoints within quota, with retries."""
+
+    def __init__(self, endpoints: List[ModelEndpoint], max_concurrency: int = 32, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 20.0, expected_output_tokens: int = 256,
+                 rng: Callable[[], float] = random.random, scheduler: Optional[FairScheduler] = None):
+        if not endpoints:
+            raise ValueError("ModelClient needs at least one endpoint")
+        self.endpoints = endpoints
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.expected_output_tokens = expected_output_tokens
+        self.rng = rng
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.calls = 0
+        self.retries = 0
+
+    async def generate_content_async(self, prompt: str) -> AsyncIterator[str]:
+        """Stream the model's response to prompt, retrying throttled or failed calls."""
+        estimate = estimate_tokens(prompt) + self.expected_output_tokens
+        # The slot is held across retries; closing the stream early releases it
+        async with self.scheduler.slot() if self.scheduler is not None else nullcontext():
+            attempt = 0
+            while True:
+                endpoint = await self._reserve(estimate)
+                output_chars = 0
+                try:
+                    # Closing this stream early (the caller has what it needs) closes the backend's too
+                    async with aclosing(endpoint.backend.generate_content_async(prompt)) as stream:
+                        async for chunk in stream:
+                            output_chars += len(chunk)
+                            yield chunk
+                    return
+                except Exception as e:
+                    # A partially streamed response cannot be retried without duplicating output
+                    if output_chars or not is_retryable(e) or attempt >= self.max_retries:
+                        raise
+                    delay = self._backoff(attempt, retry_after(e))
+                    if status_code(e) == 429:
+                        # Steer other calls to the remaining keys while this one is throttled
+                        endpoint.cooldown_until = endpoint.clock() + delay
+                    attempt += 1
+                    with self._lock:
+                        self.retries += 1
+                    logger.warning(f"Model call on {endpoint.name} failed ({e}); retry {attempt} in {delay:.2f}s")
+                finally:
+                    self._settle(endpoint, estimate, estimate_tokens(prompt) + math.ceil(output_chars / 4))
+                await asyncio.sleep(delay)
+
+    async def warm(self):
+        """Have every backend that supports it open its connection ahead of the first call."""
+        async def warm_endpoint(endpoint: ModelEndpoint):
+            try:
+                await endpoint.backend.warm()
+            except Exception as e:
+                logger.warning(f"Warming {endpoint.name} failed: {e}")
+
+        await asyncio.gather(*(warm_endpoint(ep) for ep in self.endpoints if hasattr(ep.backend, "warm")))
+
+    async def _reserve(self, tokens: float) -> ModelEndpoint:
+        # Poll rather than hold loop-bound primitives so one pool serves every event loop
+        while True:
+            with self._lock:
+                wait = 0.05
+                if self._in_flight < self.max_concurrency:
+                    endpoint = min(self.endpoints, key=lambda ep: (
+                        ep.wait_time(tokens), ep.in_flight, -ep.tokens.available()))
+                    wait = endpoint.wait_time(tokens)
+                    if wait <= 0:
+                        endpoint.requests.take(1)
+                        endpoint.tokens.take(tokens)
+                        endpoint.in_flight += 1
+                        self._in_flight += 1
+                        self.calls += 1
+                        return endpoint
+            await asyncio.sleep(min(wait, 1.0))
+
+    def _settle(self, endpoint: ModelEndpoint, estimated: float, actual: float):
+        with self._lock:
+            endpoint.in_flight -= 1
+            self._in_flight -= 1
+            endpoint.tokens.refund(estimated - actual)
+
+    def _backoff(self, attempt: int, server_delay: Optional[float] = None) -> float:
+        # Full jitter keeps retries from many callers from arriving in lockstep
+        delay = self.rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+        return max(delay, server_delay or 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool usage."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "in_flight": self._in_flight,
+                "endpoints": [
+                    {
+                        "name": ep.name,
+                        "in_flight": ep.in_flight,
+                        "requests_available": round(ep.requests.available(), 1),
+                        "tokens_available": round(ep.tokens.available()),
+                    }
+                    for ep in self.endpoints
+                ],
+            }
+
+
+# Global pools, one per model name
+model_clients: Dict[str, ModelClient] = {}
+_model_clients_lock = threading.Lock()
+
+
+def get_model_client(model: str = "gemini-2.0-flash") -> ModelClient:
+    """Get or create the instance-wide pool for a model."""
+    with _model_clients_lock:
+        if model not in model_clients:
+            model_clients[model] = _client_from_env(model)
+        return model_clients[model]
+
+
+def _client_from_env(model: str) -> ModelClient:
+    # GEMINI_API_KEYS pools several keys/projects; without keys the client uses ADC / Vertex settings
+    keys = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()]
+    if not keys:
+        keys = [os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")]
+    rpm = float(os.getenv("MODEL_RPM", "1000"))
+    tpm = float(os.getenv("MODEL_TPM", "1000000"))
+    base_url = os.getenv("GEMINI_BASE_URL")
+
+    endpoints = [
+        ModelEndpoint(f"key-{i}", GenAIBackend(model, api_key=key, base_url=base_url), rpm, tpm)
+        for i, key in enumerate(keys)
+    ]
+    return ModelClient(
+        endpoints,
+        max_concurrency=int(os.getenv("MODEL_MAX_CONCURRENCY", "32")),
+        max_retries=int(os.getenv("MODEL_MAX_RETRIES", "4")),
+        scheduler=get_scheduler()
+    )
@@ -0,0 +1,262 @@
+"""
+Write-behind persistence of results to Firestore
+Scoring results and assessment analyses are written into a per-process buffer
+and returned to the caller immediately; a background thread commits them in
+Firestore batch writes of up to 500 operations, when the buffer fills a batch
+or every flush interval, whichever comes first. Repeated writes to the same
+document before a flush are merged into one operation. Failed commits are
+retried with backoff and then put back in the buffer for the next flush; what
+is still buffered is flushed when the process exits.
+
+Both collections belong to this service; the web app neither reads nor writes
+them. It still stores its own copy of each score in openEndedScores (and its
+feedback on assessmentSessions), so writing there too would show every score
+twice. Documents are keyed by session (and question) so a retried write
+overwrites instead of duplicating:
+
+    agentOpenEndedScores/{sessionId}_{questionId}
+        The fields of the web app's openEndedScores documents. Only scores the
+        model produced are written; a default stand-in is not.
+    assessmentAnalyses/{sessionId}
+
+Off unless PERSIST_RESULTS is set. The client honours FIRESTORE_EMULATOR_HOST, so
+the same code runs against the local emulator.
+"""
+
+import atexit
+import collections
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects batched writes with more than 500 operations
+MAX_BATCH_OPERATIONS = 500
+
+SCORES_COLLECTION = "agentOpenEndedScores"
+ANALYSES_COLLECTION = "assessmentAnalyses"
+
+
+class FirestoreWriter:
+    """Buffers document writes and commits them to Firestore in batches from a background thread."""
+
+    def __init__(self, client=None, project: Optional[str] = None, batch_size: int = MAX_BATCH_OPERATIONS,
+                 flush_interval: float = 1.0, max_buffered: int = 10_000, max_retries: int = 3,
+                 base_delay: float = 0.5, sleep: Callable[[float], None] = time.sleep):
+        self.project = project
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_OPERATIONS))
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.sleep = sleep
+        self._client = client
+        self._client_pid = os.getpid() if client is not None else None
+        # (collection, document id) -> fields, oldest write first
+        self._buffer: "collections.OrderedDict[Tuple[str, str], Dict[str, Any]]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self.written = 0
+        self.commits = 0
+        self.merged = 0
+        self.retries = 0
+        self.failed_commits = 0
+        self.dropped = 0
+
+    @property
+    def client(self):
+        """Firestore client, created on first flush in each process (gRPC channels do not survive fork)."""
+        if self._client is None or self._client_pid != os.getpid():
+            from google.cloud import firestore
+            self._client = firestore.Client(project=self.project)
+            self._client_pid = os.getpid()
+        return self._client
+
+    def write(self, collection: str, document_id: str, fields: Dict[str, Any]):
+        """Buffer a merge-write of fields into collection/document_id; never blocks on Firestore."""
+        with self._lock:
+            key = (collection, document_id)
+            if key in self._buffer:
+                self._buffer[key] = {**self._buffer[key], **fields}
+                self.merged += 1
+            else:
+                self._buffer[key] = dict(fields)
+                self._trim()
+            full = len(self._buffer) >= self.batch_size
+        if self._worker_pid != os.getpid():
+            self._start_worker()
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Commit everything buffered, batch_size operations per batch; returns documents written."""
+        with self._flush_lock:
+            with self._lock:
+                pending = list(self._buffer.items())
+                self._buffer.clear()
+            written = 0
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                if self._commit(chunk):
+                    written += len(chunk)
+                else:
+                    self._requeue(chunk)
+            return written
+
+    def close(self):
+        """Stop the worker and flush whatever is still buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None and self._worker_pid == os.getpid():
+            self._worker.join(timeout=max(self.flush_interval, 5.0))
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of buffer depth and write counters."""
+        with self._lock:
+            return {
+                "buffered": len(self._buffer),
+                "written": self.written,
+                "commits": self.commits,
+                "merged": self.merged,
+                "retries": self.retries,
+                "failed_commits": self.failed_commits,
+                "dropped": self.dropped,
+            }
+
+    def _commit(self, chunk) -> bool:
+        # Batches are all-or-nothing and every operation is a keyed set, so a retry cannot duplicate
+        for attempt in range(self.max_retries + 1):
+            try:
+                client = self.client
+                batch = client.batch()
+                for (collection, document_id), fields in chunk:
+                    batch.set(client.collection(collection).document(document_id), fields, merge=True)
+                batch.commit()
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.error(f"Firestore batch of {len(chunk)} writes failed, will retry next flush: {e}")
+                    with self._lock:
+                        self.failed_commits += 1
+                    return False
+                with self._lock:
+                    self.retries += 1
+                logger.warning(f"Firestore batch commit failed ({e}); retry {attempt + 1}")
+                self.sleep(self.base_delay * 2 ** attempt)
+            else:
+                with self._lock:
+                    self.written += len(chunk)
+                    self.commits += 1
+                return True
+        return False
+
+    def _requeue(self, chunk):
+        # Put failed writes back ahead of newer ones; a newer write to the same document wins
+        with self._lock:
+            for key, fields in reversed(chunk):
+                if key in self._buffer:
+                    self._buffer[key] = {**fields, **self._buffer[key]}
+                else:
+                    self._buffer[key] = fields
+                    self._buffer.move_to_end(key, last=False)
+            self._trim()
+
+    def _trim(self):
+        # Called with the lock held: bound memory while Firestore is unreachable, oldest writes first
+        while len(self._buffer) > self.max_buffered:
+            key, _ = self._buffer.popitem(last=False)
+            self.dropped += 1
+            logger.error(f"Firestore write buffer full; dropped write to {key[0]}/{key[1]}")
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            # Forked children inherit the buffer but not the thread
+            self._stop = threading.Event()
+            self._wake = threading.Event()
+            self._worker = threading.Thread(target=self._run_worker, name="firestore-writer", daemon=True)
+            self._worker_pid = os.getpid()
+            self._worker.start()
+            atexit.register(self.close)
+
+    def _run_worker(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Firestore flush failed: {e}")
+
+
+def persistence_enabled() -> bool:
+    return os.getenv("PERSIST_RESULTS", "false").lower() in ("1", "true", "yes")
+
+
+# Global writer (one per process)
+writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> Optional[FirestoreWriter]:
+    """Get or create the process-wide writer; None when persistence is off."""
+    global writer
+    with _writer_lock:
+        if writer is None and persistence_enabled():
+            writer = FirestoreWriter(
+                project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+                batch_size=int(os.getenv("FIRESTORE_BATCH_SIZE", str(MAX_BATCH_OPERATIONS))),
+                flush_interval=float(os.getenv("FIRESTORE_FLUSH_INTERVAL_SECONDS", "1")),
+                max_buffered=int(os.getenv("FIRESTORE_MAX_BUFFERED", "10000")),
+            )
+        return writer
+
+
+def persist_score(request, result, session_id: Optional[str] = None, user_id: Optional[str] = None):
+    """
+    Queue an open-ended ScoringResult; skipped without a session id to file it under.
+    Callers only pass results the model scored, not the default used when it failed.
+    """
+    current = get_writer()
+    session_id = session_id or request.session_id
+    if current is None or not session_id:
+        return
+    fields = {
+        "sessionId": session_id,
+        "questionId": request.question_id,
+        "questionText": request.question_text,
+        "response": request.response,
+        "aiScore": result.score,
+        "aiExplanation": result.explanation,
+        "createdAt": datetime.now(timezone.utc),
+    }
+    user_id = user_id or request.user_id
+    if user_id:
+        fields["userId"] = user_id
+    current.write(SCORES_COLLECTION, f"{session_id}_{request.question_id}", fields)
+
+
+def persist_assessment(request, analysis):
+    """Queue the AssessmentAnalysis of an AssessmentRequest (assessmentAnalyses, see above)."""
+    current = get_writer()
+    if current is None:
+        return
+    current.write(ANALYSES_COLLECTION, request.session_id, {
+        "sessionId": request.session_id,
+        "userId": request.user_id,
+        "industry": request.industry,
+        "location": request.location,
+        "overallScore": request.overall_score,
+        "categoryScores": request.category_scores,
+        "analysis": analysis.model_dump(mode="json", exclude_none=True),
+        "createdAt": datetime.now(timezone.utc),
+    })
@@ -0,0 +1,297 @@
+"""
+Priority and fair-share scheduling of model calls
+Interactive scoring (a user waiting on their results), batch work (admin
+re-scoring, pilot uploads submitted as jobs) and backfills share the same model
+capacity. Every model call takes a slot from the scheduler first:
+
+  * priority classes - a free slot goes to the highest class with a waiter,
+                       so interactive calls never queue behind bulk ones
+  * class caps       - each class holds at most its cap of the slots, so bulk
+                       work always leaves room for interactive calls that arrive
+                       while it runs
+  * fair queuing     - within a class, waiters are ordered by weighted virtual
+                       finish time per tenant (e.g. a pilot cohort), so one large
+                       upload cannot starve the other tenants' work. Only tenants
+                       with a configured weight are told apart; any other name
+                       shares DEFAULT_TENANT, so a caller cannot mint tenants to
+                       jump the queue or grow the per-tenant state
+
+The class and tenant of a call come from the caller's context (work_class()),
+set once per request or job and inherited by every task it starts.
+"""
+
+import asyncio
+import collections
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKFILL = "backfill"
+# Highest priority first
+PRIORITY_CLASSES = (INTERACTIVE, BATCH, BACKFILL)
+DEFAULT_TENANT = "default"
+
+PRIORITY_HEADER = "X-Priority"
+TENANT_HEADER = "X-Tenant"
+
+_work_class: contextvars.ContextVar[Tuple[str, str]] = contextvars.ContextVar(
+    "work_class", default=(INTERACTIVE, DEFAULT_TENANT)
+)
+
+
+@contextlib.contextmanager
+def work_class(priority: str = INTERACTIVE, tenant: Optional[str] = None):
+    """Run the block (and the tasks it starts) as priority / tenant work."""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class: {priority}")
+    token = _work_class.set((priority, tenant or DEFAULT_TENANT))
+    try:
+        yield
+    finally:
+        _work_class.reset(token)
+
+
+def current_work_class() -> Tuple[str, str]:
+    """(priority, tenant) of the running request or job; interactive by default."""
+    return _work_class.get()
+
+
+def request_work_class(headers: Mapping[str, str]):
+    """work_class() for an HTTP request; unknown priorities fall back to interactive."""
+    priority = (headers.get(PRIORITY_HEADER) or INTERACTIVE).lower()
+    return work_class(priority if priority in PRIORITY_CLASSES else INTERACTIVE, headers.get(TENANT_HEADER))
+
+
+class _Waiter:
+    """A queued call; granted a slot by whoever releases one."""
+
+    __slots__ = ("priority", "tenant", "loop", "future", "granted", "cancelled")
+
+    def __init__(self, priority: str, tenant: str, loop: asyncio.AbstractEventLoop):
+        self.priority = priority
+        self.tenant = tenant
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.cancelled = False
+
+    def grant(self):
+        self.granted = True
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class _ClassQueue:
+    """Waiters of one priority class, ordered by per-tenant weighted virtual finish time."""
+
+    def __init__(self):
+        self.heap = []
+        self.waiting = 0
+        self.virtual_time = 0.0
+        self.finish: Dict[str, float] = {}
+        self._order = itertools.count()
+
+    def push(self, waiter: _Waiter, weight: float):
+        # A tenant that was idle restarts at the current virtual time instead of
+        # cashing in credit for the time it did not use
+        start = max(self.virtual_time, self.finish.get(waiter.tenant, 0.0))
+        self.finish[waiter.tenant] = start + 1.0 / weight
+        heapq.heappush(self.heap, (self.finish[waiter.tenant], start, next(self._order), waiter))
+        self.waiting += 1
+
+    def pop(self) -> Optional[_Waiter]:
+        while self.heap:
+            _, start, _, waiter = heapq.heappop(self.heap)
+            if waiter.cancelled:
+                continue
+            self.waiting -= 1
+            self.virtual_time = start
+            return waiter
+        return None
+
+    def remove(self, waiter: _Waiter):
+        # Lazily dropped from the heap by pop()
+        waiter.cancelled = True
+        self.waiting -= 1
+
+
+class Grant:
+    """A held slot; release it exactly once when the model call is done."""
+
+    def __init__(self, scheduler: "FairScheduler", priority: str):
+        self.scheduler = scheduler
+        self.priority = priority
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.scheduler._release(self.priority)
+
+
+class FairScheduler:
+    """Shares capacity slots between priority classes and, within a class, between tenants."""
+
+    def __init__(self, capacity: int, class_limits: Optional[Dict[str, int]] = None,
+                 tenant_weights: Optional[Dict[str, float]] = None,
+                 on_wait: Optional[Callable[[str, str, float], None]] = None, window: int = 1000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.class_limits = {name: capacity for name in PRIORITY_CLASSES}
+        self.class_limits.update(class_limits or {})
+        self.tenant_weights = tenant_weights or {}
+        self.on_wait = on_wait
+
+        # Waiters may come from any event loop; everything below is guarded by one thread lock
+        self._lock = threading.Lock()
+        self._active = 0
+        self._class_active = {name: 0 for name in PRIORITY_CLASSES}
+        self._queues = {name: _ClassQueue() for name in PRIORITY_CLASSES}
+        self._waits = {name: collections.deque(maxlen=window) for name in PRIORITY_CLASSES}
+        self._granted = {name: 0 for name in PRIORITY_CLASSES}
+        self._tenant_granted: Dict[str, Dict[str, int]] = {name: {} for name in PRIORITY_CLASSES}
+
+    async def acquire(self, priority: Optional[str] = None, tenant: Optional[str] = None) -> Grant:
+        """Wait until the current work class (or the one given) may start a model call."""
+        current_priority, current_tenant = current_work_class()
+        priority = priority or current_priority
+        tenant = self.known_tenant(tenant or current_tenant)
+        start = time.monotonic()
+        waiter = _Waiter(priority, tenant, asyncio.get_running_loop())
+        with self._lock:
+            self._queues[priority].push(waiter, self.tenant_weights.get(tenant, 1.0))
+            self._dispatch()
+        if not waiter.granted:
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter.granted:
+                        # Give back a slot that was granted while we were being cancelled
+                        self._hand_back(priority)
+                    else:
+                        self._queues[priority].remove(waiter)
+                raise
+        self._granted_to(waiter, time.monotonic() - start)
+        return Grant(self, priority)
+
+    def known_tenant(self, tenant: str) -> str:
+        """The tenant a call is scheduled (and reported) as: itself if it has a weight, else the default."""
+        return tenant if tenant in self.tenant_weights else DEFAULT_TENANT
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: Optional[str] = None, tenant: Optional[str] = None):
+        """Hold a slot for the duration of an async block."""
+        grant = await self.acquire(priority, tenant)
+        try:
+            yield grant
+        finally:
+            grant.release()
+
+    def stats(self):
+        """Snapshot of per-class slot usage, queue depth and recent wait times."""
+        with self._lock:
+            classes = {}
+            for name in PRIORITY_CLASSES:
+                waits = sorted(self._waits[name])
+                classes[name] = {
+                    "limit": self.class_limits[name],
+                    "active": self._class_active[name],
+                    "queued": self._queues[name].waiting,
+                    "granted": self._granted[name],
+                    "wait_p50_ms": _percentile_ms(waits, 0.50),
+                    "wait_p95_ms": _percentile_ms(waits, 0.95),
+                    "tenants": dict(self._tenant_granted[name]),
+                }
+            return {"capacity": self.capacity, "active": self._active, "classes": classes}
+
+    def _dispatch(self):
+        # Called with the lock held: hand free slots to the highest class that may take one
+        while self._active < self.capacity:
+            for name in PRIORITY_CLASSES:
+                if self._queues[name].waiting and self._class_active[name] < self.class_limits[name]:
+                    waiter = self._queues[name].pop()
+                    self._active += 1
+                    self._class_active[name] += 1
+                    waiter.grant()
+                    break
+            else:
+                return
+
+    def _hand_back(self, priority: str):
+        # Called with the lock held
+        self._active -= 1
+        self._class_active[priority] -= 1
+        self._dispatch()
+
+    def _release(self, priority: str):
+        with self._lock:
+            self._hand_back(priority)
+
+    def _granted_to(self, waiter: _Waiter, wait_seconds: float):
+        with self._lock:
+            self._waits[waiter.priority].append(wait_seconds)
+            self._granted[waiter.priority] += 1
+            tenants = self._tenant_granted[waiter.priority]
+            tenants[waiter.tenant] = tenants.get(waiter.tenant, 0) + 1
+        if self.on_wait is not None:
+            try:
+                self.on_wait(waiter.priority, waiter.tenant, wait_seconds)
+            except Exception as e:
+                logger.warning(f"Failed to record scheduler wait for {waiter.priority}: {e}")
+
+
+def _percentile_ms(sorted_waits, q: float) -> float:
+    if not sorted_waits:
+        return 0.0
+    index = min(len(sorted_waits) - 1, math.ceil(q * len(sorted_waits)) - 1)
+    return round(sorted_waits[index] * 1000, 2)
+
+
+def _parse_mapping(value: str, convert: Callable[[str], float]) -> Dict[str, float]:
+    # "a=2,b=1" -> {"a": 2, "b": 1}
+    mapping = {}
+    for item in value.split(","):
+        if "=" in item:
+            key, number = item.split("=", 1)
+            mapping[key.strip()] = convert(number.strip())
+    return mapping
+
+
+# Global scheduler (one per process, shared by every model client)
+scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler:
+    """Get or create the process-wide model call scheduler."""
+    global scheduler
+    with _scheduler_lock:
+        if scheduler is None:
+            from monitoring.cloud_monitoring import log_scheduler_wait
+            capacity = int(os.getenv("SCHEDULER_CAPACITY") or os.getenv("MODEL_MAX_CONCURRENCY", "32"))
+            # By default bulk classes leave half (batch) and three quarters (backfill) of the slots free
+            limits = {BATCH: max(1, capacity // 2), BACKFILL: max(1, capacity // 4)}
+            limits.update(_parse_mapping(os.getenv("SCHEDULER_CLASS_LIMITS", ""), int))
+            scheduler = FairScheduler(
+                capacity,
+                class_limits=limits,
+                tenant_weights=_parse_mapping(os.getenv("SCHEDULER_TENANT_WEIGHTS", ""), float),
+                on_wait=log_scheduler_wait
+            )
+        return scheduler
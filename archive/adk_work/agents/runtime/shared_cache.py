@@ -0,0 +1,138 @@
+"""
+Cross-process cache backed by a local SQLite file
+Lets every worker of a multi-worker server (and any other process on the
+instance) reuse results another one computed. WAL mode keeps readers from
+blocking on the writer; lookups are a single indexed read of a local file, cheap
+enough to run inline on the event loop. Failures are logged and treated as
+misses so a broken cache file never fails a request.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Bounding the table costs a count and a delete, so only do it every this many writes
+PRUNE_EVERY = 256
+
+
+class SharedCache:
+    """String-keyed cache with per-entry TTL in a SQLite file shared between processes."""
+
+    def __init__(self, path: str, ttl_seconds: float = 3600.0, max_entries: int = 100_000,
+                 encode: Callable[[Any], str] = str, decode: Callable[[str], Any] = str,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.encode = encode
+        self.decode = decode
+        # Wall-clock time: expiry times are compared across processes
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._conn_pid: Optional[int] = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # A connection must not cross a fork; each worker opens its own
+        if self._conn is None or self._conn_pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+            self._conn = conn
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss, expired entry or error."""
+        with self._lock:
+            try:
+                row = self._connection().execute(
+                    "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, self.clock())
+                ).fetchone()
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"Shared cache read failed: {e}")
+                return None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            return self.decode(row[0])
+        except Exception as e:
+            logger.warning(f"Discarding undecodable shared cache entry: {e}")
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store a value for ttl_seconds, replacing any existing entry."""
+        if self.max_entries <= 0:
+            return
+        encoded = self.encode(value)
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, encoded, self.clock() + self.ttl_seconds)
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(conn)
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"Shared cache write failed: {e}")
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop expired entries, then the soonest-expiring ones beyond max_entries."""
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (self.clock(),))
+        excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires_at LIMIT ?)",
+                (excess,)
+            )
+
+    def clear(self):
+        """Drop all entries, for every process sharing the file."""
+        with self._lock:
+            try:
+                self._connection().execute("DELETE FROM entries")
+            except sqlite3.Error as e:
+                self.errors += 1
+                logger.warning(f"Shared cache clear failed: {e}")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._conn_pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._conn_pid = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of this process's counters against the shared cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
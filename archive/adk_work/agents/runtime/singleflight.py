@@ -0,0 +1,77 @@
+"""
+In-flight request coalescing (singleflight)
+Concurrent identical requests attach to the one computation already running for
+their key and all receive its result, so a double-click or client retry does not
+trigger a second model call.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Canonical hash of a JSON-compatible request payload."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self, name: str, on_coalesced: Optional[Callable[[str], None]] = None):
+        self.name = name
+        self.on_coalesced = on_coalesced
+        self._flights: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or wait for the identical call already in flight."""
+        loop = asyncio.get_running_loop()
+        # Tasks are bound to a loop, so only calls on the same loop can share one
+        flight_key = (id(loop), key)
+
+        with self._lock:
+            self.calls += 1
+            task = self._flights.get(flight_key)
+            leader = task is None
+            if leader:
+                task = loop.create_task(fn())
+                self._flights[flight_key] = task
+                task.add_done_callback(lambda done: self._finish(flight_key, done))
+            else:
+                self.coalesced += 1
+
+        if not leader and self.on_coalesced is not None:
+            try:
+                self.on_coalesced(self.name)
+            except Exception as e:
+                logger.warning(f"Failed to record coalesced call for {self.name}: {e}")
+
+        # Shield so a disconnecting caller does not cancel the work others are waiting on
+        return await asyncio.shield(task)
+
+    def _finish(self, flight_key: Tuple[int, str], task: asyncio.Task):
+        with self._lock:
+            if self._flights.get(flight_key) is task:
+                del self._flights[flight_key]
+        # Mark the exception retrieved even if every caller went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of coalescing counters."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._flights),
+            }
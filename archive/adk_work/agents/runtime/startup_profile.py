@@ -0,0 +1,129 @@
+"""
+Cold-start profiler
+Set STARTUP_PROFILE=1 to log how long each lazy import and agent construction
+takes, or run the CLI to attribute import time to individual packages:
+
+    python -m runtime.startup_profile main --call main:get_assessment_agent
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+_stages: List[Dict[str, float]] = []
+
+
+def profiling_enabled() -> bool:
+    return os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+@contextlib.contextmanager
+def profile_stage(name: str):
+    """Time a startup stage (import, client or agent construction) when profiling is on."""
+    if not profiling_enabled():
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        _stages.append({"stage": name, "elapsed_ms": round(elapsed_ms, 2)})
+        logger.info(json.dumps({
+            "event_type": "startup_stage",
+            "stage": name,
+            "elapsed_ms": round(elapsed_ms, 2),
+        }))
+
+
+def startup_stages() -> List[Dict[str, float]]:
+    """Stages recorded in this process so far."""
+    return list(_stages)
+
+
+def parse_importtime(output: str) -> Dict[str, float]:
+    """Sum `python -X importtime` self-times (ms) by top-level package."""
+    totals: Dict[str, float] = defaultdict(float)
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        totals[_package_name(name)] += int(self_us) / 1000
+    return dict(totals)
+
+
+def _package_name(module: str) -> str:
+    parts = module.split(".")
+    # google.* and google.cloud.* are namespace packages covering many distributions
+    if parts[0] == "google" and len(parts) > 1:
+        depth = 3 if parts[1] == "cloud" and len(parts) > 2 else 2
+        return ".".join(parts[:depth])
+    return parts[0]
+
+
+def _child_main(module: str, calls: List[str]):
+    """Runs inside the profiled interpreter: import the module, then build what was asked for."""
+    os.environ["STARTUP_PROFILE"] = "1"
+    logging.disable(logging.CRITICAL)
+    # Run as __main__, so record into the copy the entry-point modules import
+    profiler = importlib.import_module("runtime.startup_profile")
+    start = time.perf_counter()
+    with profiler.profile_stage(f"import {module}"):
+        importlib.import_module(module)
+    for call in calls:
+        target_module, _, function = call.partition(":")
+        with profiler.profile_stage(call):
+            getattr(importlib.import_module(target_module), function)()
+    report = {"total_ms": round((time.perf_counter() - start) * 1000, 2),
+              "stages": profiler.startup_stages()}
+    print(json.dumps(report))
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import and construction time")
+    parser.add_argument("module", help="Entry-point module to import, e.g. main")
+    parser.add_argument("--call", action="append", default=[],
+                        help="module:function to call after import, e.g. main:get_assessment_agent")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages to report")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _child_main(args.module, args.call)
+        return
+
+    # A fresh interpreter so nothing is already imported
+    command = [sys.executable, "-X", "importtime", "-m", "runtime.startup_profile", args.module, "--child"]
+    for call in args.call:
+        command += ["--call", call]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        sys.exit(completed.returncode)
+
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    packages = sorted(parse_importtime(completed.stderr).items(), key=lambda item: item[1], reverse=True)
+
+    print(f"Cold start for '{args.module}': {report['total_ms']:.1f} ms")
+    print("\nStages:")
+    for stage in report["stages"]:
+        print(f"  {stage['elapsed_ms']:>9.1f} ms  {stage['stage']}")
+    print(f"\nImport time by package (top {args.top}):")
+    for package, elapsed_ms in packages[:args.top]:
+        print(f"  {elapsed_ms:>9.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""
+Startup warm-up and health probes
+Warm-up builds what the first request would otherwise pay for: the agents, the
+model client pool with an open (TLS) connection per key, the percentile index
+snapshot, and a first pass through the request and result validators. Which
+stages run depends on the entry point (FUNCTION_TARGET for functions_framework,
+"server" for the FastAPI app).
+
+Probes never call the model:
+  * liveness  - the process is up and answering; always cheap
+  * readiness - warm-up has finished and the last background deep check passed;
+                the deep check runs on its own thread and probes only read its
+                cached result
+
+functions_framework handlers answer them on GET /healthz and /readyz through
+@serve_probes; server.py exposes the same paths.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .startup_profile import profile_stage
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_ASSESSMENT = {
+    "session_id": "warmup",
+    "user_id": "warmup",
+    "industry": "Technology",
+    "location": "United States",
+    "overall_score": 60,
+    "category_scores": {
+        "personalBackground": 12, "entrepreneurialSkills": 14, "resources": 10,
+        "behavioralMetrics": 11, "growthVision": 13,
+    },
+    "question_scores": {},
+    "responses": [],
+}
+SAMPLE_SCORING = {"question_id": "q3", "response": "warmup", "question_text": "warmup"}
+SAMPLE_MODEL_OUTPUT = '{"score": 3, "explanation": "warmup"}'
+
+
+async def warm_assessment():
+    from assessment_analysis_agent.agent import AssessmentRequest, AssessmentResult, get_root_agent
+    from assessment_analysis_agent.percentile_index import get_percentile_index
+
+    agent = get_root_agent()
+    session = AssessmentRequest.model_validate(SAMPLE_ASSESSMENT).to_session()
+    # The pure analysis path: nothing is recorded into the percentile index
+    analysis = await agent._analyze_assessment(session)
+    AssessmentResult(success=True, data=analysis).model_dump_json()
+    get_percentile_index()
+
+
+async def warm_open_ended():
+    from open_ended_scoring_agent.agent import (
+        BatchScoringRequest, ScoringRequest, ScoringResult, get_root_agent
+    )
+    from open_ended_scoring_agent.cache import get_scoring_cache
+    from open_ended_scoring_agent.streaming import ScoreStreamParser
+
+    get_root_agent()
+    ScoringRequest.model_validate(SAMPLE_SCORING)
+    BatchScoringRequest.model_validate({"questions": [SAMPLE_SCORING]})
+    ScoringResult(score=3, explanation="warmup").model_dump_json()
+    ScoreStreamParser().feed(SAMPLE_MODEL_OUTPUT)
+    get_scoring_cache()
+
+
+async def warm_model_client():
+    from open_ended_scoring_agent.agent import get_root_agent
+    from runtime.model_client import get_model_client
+
+    client = get_model_client(str(get_root_agent().model))
+    await client.warm()
+
+
+# Stage name -> coroutine function; run in this order
+STAGES: Dict[str, Callable[[], Any]] = {
+    "assessment": warm_assessment,
+    "open_ended": warm_open_ended,
+    "model_client": warm_model_client,
+}
+
+# Stages per entry point; unknown targets warm everything
+TARGET_STAGES: Dict[str, Tuple[str, ...]] = {
+    "process_assessment_http": ("assessment",),
+    "process_open_ended_scoring_http": ("open_ended", "model_client"),
+    "process_open_ended_batch_scoring_http": ("open_ended", "model_client"),
+    "health_check_http": (),
+    "server": ("assessment", "open_ended", "model_client"),
+}
+
+# Stages whose failure leaves the instance unable to serve; the rest only cost latency
+REQUIRED_STAGES = {"assessment", "open_ended"}
+
+
+class Warmup:
+    """Runs the warm-up stages for one entry point and remembers how they went."""
+
+    def __init__(self, target: str, stages: Optional[Dict[str, Callable[[], Any]]] = None):
+        self.target = target
+        stages = stages if stages is not None else STAGES
+        names = TARGET_STAGES.get(target, tuple(stages))
+        self.stages = {name: stages[name] for name in names}
+        self.state = "pending"
+        self.results: List[Dict[str, Any]] = []
+        self._done = threading.Event()
+
+    async def run(self):
+        self.state = "running"
+        failed = False
+        for name, stage in self.stages.items():
+            start = time.perf_counter()
+            error = None
+            try:
+                with profile_stage(f"warmup {name}"):
+                    await stage()
+            except Exception as e:
+                error = str(e)
+                failed = failed or name in REQUIRED_STAGES
+                logger.warning(f"Warm-up stage {name} failed: {e}")
+            self.results.append({
+                "stage": name,
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+                "error": error,
+            })
+        self.state = "failed" if failed else "done"
+        self._done.set()
+        logger.info(f"Warm-up for {self.target} {self.state}: {self.results}")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class HealthProbe:
+    """Liveness answered inline; readiness answered from a periodically refreshed deep check."""
+
+    def __init__(self, warmup: Optional[Warmup], interval: float = 10.0,
+                 checks: Optional[Dict[str, Callable[[], Any]]] = None):
+        self.warmup = warmup
+        self.interval = interval
+        self.checks = checks if checks is not None else DEEP_CHECKS
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._result: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def liveness(self) -> Dict[str, Any]:
+        return {"status": "alive", "uptime_seconds": round(time.time() - self.started_at, 1)}
+
+    def readiness(self) -> Tuple[Dict[str, Any], bool]:
+        """Cached deep-check result; stale results (the checker stopped) count as not ready."""
+        self.start()
+        with self._lock:
+            result, checked_at = self._result, self._checked_at
+        if result is None:
+            return {"status": "starting", "warmup": self._warmup_status()}, False
+        age = time.monotonic() - checked_at
+        if age > 3 * self.interval:
+            return {**result, "status": "stale", "checked_seconds_ago": round(age, 1)}, False
+        return {**result, "checked_seconds_ago": round(age, 1)}, result["status"] == "ready"
+
+    def check(self) -> Dict[str, Any]:
+        """Run the deep check now; cheap and local, it never calls the model."""
+        warmup = self._warmup_status()
+        checks = {}
+        ok = warmup["state"] == "done"
+        for name, check in self.checks.items():
+            try:
+                checks[name] = check()
+            except Exception as e:
+                checks[name] = {"error": str(e)}
+                ok = False
+        result = {"status": "ready" if ok else "not_ready", "warmup": warmup, "checks": checks}
+        with self._lock:
+            self._result = result
+            self._checked_at = time.monotonic()
+        return result
+
+    def start(self):
+        """Start the background checker (once per process)."""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="readiness-check", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Readiness check failed: {e}")
+            time.sleep(self.interval)
+
+    def _warmup_status(self) -> Dict[str, Any]:
+        if self.warmup is None:
+            return {"state": "done", "target": None, "stages": []}
+        return {"state": self.warmup.state, "target": self.warmup.target, "stages": list(self.warmup.results)}
+
+
+def check_event_loop() -> Dict[str, Any]:
+    """The shared loop used by the sync handlers still runs coroutines promptly."""
+    from .event_loop import runtime
+
+    if runtime is None:
+        return {"running": False}
+
+    async def noop():
+        return None
+
+    start = time.perf_counter()
+    runtime.run(noop(), timeout=2.0)
+    return {"running": True, "lag_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+
+def check_model_pool() -> Dict[str, Any]:
+    """Quota headroom of the pooled model client, from local counters only."""
+    from .model_client import model_clients
+
+    return {name: client.stats() for name, client in list(model_clients.items())}
+
+
+def check_admission() -> Dict[str, Any]:
+    from .admission import get_admission_controller
+
+    return get_admission_controller().stats()
+
+
+DEEP_CHECKS: Dict[str, Callable[[], Any]] = {
+    "event_loop": check_event_loop,
+    "model_pool": check_model_pool,
+    "admission": check_admission,
+}
+
+
+def warmup_enabled() -> bool:
+    return os.getenv("WARMUP_ON_START", "true").lower() in ("1", "true", "yes")
+
+
+# Global warm-up and probe, one per process
+warmup: Optional[Warmup] = None
+probe: Optional[HealthProbe] = None
+_lock = threading.Lock()
+
+
+def get_probe() -> HealthProbe:
+    """Get or create the process-wide health probe."""
+    global probe
+    with _lock:
+        if probe is None:
+            probe = HealthProbe(warmup, interval=float(os.getenv("READINESS_CHECK_INTERVAL_SECONDS", "10")))
+        return probe
+
+
+def _install_warmup(target: str) -> Optional[Warmup]:
+    global warmup
+    with _lock:
+        if warmup is not None or not warmup_enabled():
+            return None
+        warmup = Warmup(target)
+        if probe is not None:
+            probe.warmup = warmup
+        return warmup
+
+
+async def warm_up(target: str = "server") -> Optional[Warmup]:
+    """Run warm-up on the current loop (FastAPI startup); readiness reports it when done."""
+    current = _install_warmup(target)
+    if current is not None:
+        await current.run()
+        get_probe().check()
+    return current
+
+
+def start_background_warmup(target: Optional[str] = None) -> Optional[Warmup]:
+    """
+    Warm up the functions_framework entry point on the shared event loop, off the
+    import path; does nothing unless FUNCTION_TARGET (or target) names an entry point.
+    """
+    target = target or os.getenv("FUNCTION_TARGET")
+    if not target:
+        return None
+    current = _install_warmup(target)
+    if current is None:
+        return None
+
+    def run():
+        from .event_loop import get_runtime
+        try:
+            get_runtime().run(current.run())
+        finally:
+            get_probe().check()
+
+    threading.Thread(target=run, name="warmup", daemon=True).start()
+    return current
+
+
+LIVENESS_PATH = "/healthz"
+READINESS_PATH = "/readyz"
+
+
+def probe_response(path: str) -> Optional[Tuple[Dict[str, Any], int]]:
+    """(body, status) for a probe path, or None if path is not a probe."""
+    if path == LIVENESS_PATH:
+        return get_probe().liveness(), 200
+    if path == READINESS_PATH:
+        body, ready = get_probe().readiness()
+        return body, 200 if ready else 503
+    return None
+
+
+def serve_probes(handler):
+    """
+    Decorator for functions_framework handlers: answer GET /healthz and /readyz
+    before the handler (and its latency tracking) runs.
+    """
+    @functools.wraps(handler)
+    def wrapper(request):
+        if request.method == "GET":
+            response = probe_response(request.path)
+            if response is not None:
+                body, status = response
+                return json.dumps(body), status, {"Content-Type": "application/json"}
+        return handler(request)
+    return wrapper
@@ -4,26 +4,63 @@ FastAPI server for the Assessment Analysis Agent
 Production entry point for Cloud Functions deployment
 """
 
+import asyncio
 import os
 import json
 import logging
-from typing import Dict, Any
-from fastapi import FastAPI, HTTPException
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import ValidationError
+from starlette.routing import Match
 
 # Import the agent
-from assessment_analysis_agent.agent import AssessmentAgent
+from assessment_analysis_agent.agent import (
+    AssessmentAnalysis, AssessmentRequest, AssessmentResult, get_root_agent as get_assessment_root_agent
+)
+from open_ended_scoring_agent.agent import (
+    QUESTION_TYPE_MAP, UNSCORED_OUTCOMES, ScoringRequest, get_root_agent as get_open_ended_agent
+)
+from open_ended_scoring_agent.streaming import parse_outcomes
+from runtime.admission import Admission, AdmissionRejected, get_admission_controller
+from runtime.persistence import get_writer, persist_assessment, persist_score
+from runtime.scheduler import get_scheduler, request_work_class
+from runtime.singleflight import SingleFlight, request_fingerprint
+from runtime.jobs import JobSubmission, get_job_runner, get_job_store, job_response, submit_job
+from runtime.warmup import LIVENESS_PATH, READINESS_PATH, get_probe, warm_up
+from monitoring.cloud_monitoring import get_monitor, log_coalesced_request, log_latency
+from monitoring.tracing import current_trace, get_trace_store, span, trace, trace_id_from_headers
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Warm up in each worker before it accepts traffic, run the job workers alongside it,
+    and flush buffered Firestore writes on shutdown
+    """
+    await warm_up("server")
+    job_workers = asyncio.create_task(get_job_runner().run())
+    try:
+        yield
+    finally:
+        job_workers.cancel()
+        await asyncio.gather(job_workers, return_exceptions=True)
+        writer = get_writer()
+        if writer is not None:
+            await asyncio.to_thread(writer.close)
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Assessment Analysis Agent API",
     description="AI-powered assessment analysis and insights generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -35,30 +72,152 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the agent
-try:
-    agent = AssessmentAgent()
-    logger.info("Assessment agent initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize agent: {e}")
-    agent = None
-
-class AssessmentRequest(BaseModel):
-    """Request model for assessment analysis"""
-    session_id: str
-    user_id: str
-    industry: str
-    location: str
-    overall_score: float
-    category_scores: Dict[str, float]
-    question_scores: Dict[str, float]
-    responses: list
-
-class AssessmentResponse(BaseModel):
-    """Response model for assessment analysis"""
-    success: bool
-    data: Dict[str, Any] = None
-    error: str = None
+def _route_label(request: Request) -> str:
+    """
+    Route template a request is dispatched to (/jobs/{job_id}, not /jobs/abc123), so
+    per-endpoint series stay bounded; requests no route matches share one label
+    """
+    partial = None
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or "unmatched"
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """
+    Record per-endpoint latency in the in-process histograms, and trace the request, by route template.
+    Routes that score one question set request.state.question_type once the body is validated.
+    """
+    if (request.url.path.startswith("/metrics") or request.url.path in (LIVENESS_PATH, READINESS_PATH)
+            or request.method == "OPTIONS"):
+        return await call_next(request)
+    
+    start = time.perf_counter()
+    success = False
+    endpoint = _route_label(request)
+    try:
+        with trace(endpoint, trace_id_from_headers(request.headers)) as current:
+            response = await call_next(request)
+        if current is not None:
+            response.headers["X-Trace-Id"] = current.trace_id
+        success = response.status_code < 400
+        return response
+    finally:
+        log_latency(endpoint, time.perf_counter() - start, success, getattr(request.state, "question_type", ""))
+
+@app.middleware("http")
+async def scheduling_class(request: Request, call_next):
+    """Model calls made for this request are scheduled by its X-Priority / X-Tenant headers"""
+    with request_work_class(request.headers):
+        return await call_next(request)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    """Shed load early with 429/503 and a Retry-After hint"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"success": False, "error": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+# The agents are built on first use (or by warm-up and preload_agents), not on import
+agent = None
+
+def get_assessment_agent():
+    """Get or create the assessment agent; None if it cannot be initialized."""
+    global agent
+    if agent is None:
+        try:
+            agent = get_assessment_root_agent()
+            logger.info("Assessment agent initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize agent: {e}")
+            return None
+    return agent
+
+def preload_agents():
+    """
+    Build the agents and their schemas up front; the multi-worker server calls this
+    in the master so every forked worker starts with them instead of building its own.
+    No event loop, thread or network client may be created here: they do not survive fork.
+    """
+    agent = get_assessment_agent()
+    open_ended_agent = get_open_ended_agent()
+    # FastAPI otherwise builds the OpenAPI schema in each worker on first request
+    app.openapi()
+    logger.info(f"Preloaded agents: {agent.name if agent else None}, {open_ended_agent.name}")
+
+# Identical concurrent requests (double-submits, client retries) share one agent call
+assessment_flight = SingleFlight("process_assessment", on_coalesced=log_coalesced_request)
+
+def _result_response(result: AssessmentResult) -> Response:
+    """Serialize the envelope once, skipping FastAPI's response_model re-validation"""
+    with span("serialize"):
+        content = result.model_dump_json()
+    return Response(content=content, media_type="application/json")
+
+def _stream_format(request: Request) -> str:
+    """SSE when the client asks for text/event-stream, chunked NDJSON otherwise"""
+    return "sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson"
+
+def _encode_event(stream_format: str, event: str, data: Dict[str, Any]) -> str:
+    if stream_format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, "data": data}) + "\n"
+
+class _ReleasingStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs release() once it is done, however sending ended"""
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        # Not in the body generator: it never starts if the client is gone before the headers are sent
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+def _event_stream(events: AsyncIterator[Tuple[str, Dict[str, Any]]], stream_format: str,
+                  admission: Optional[Admission] = None) -> StreamingResponse:
+    """
+    Stream (event, data) pairs to the client as they are produced, then release the
+    admission slot and finish the request trace
+    """
+    # The handler returns before the body is sent; keep its trace open until the stream ends
+    current = current_trace()
+    if current is not None:
+        current.hold()
+    error = None
+    
+    async def body():
+        nonlocal error
+        try:
+            async for event, data in events:
+                yield _encode_event(stream_format, event, data)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Error while streaming: {e}")
+            yield _encode_event(stream_format, "error", {"error": str(e)})
+    
+    def release():
+        if admission is not None:
+            admission.release()
+        if current is not None:
+            current.release(error)
+    
+    return _ReleasingStreamingResponse(
+        body(),
+        release,
+        media_type="text/event-stream" if stream_format == "sse" else "application/x-ndjson",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/")
 async def root():
@@ -69,57 +228,76 @@ async def root():
         "version": "1.0.0"
     }
 
-@app.post("/process_assessment", response_model=AssessmentResponse)
+@app.get(LIVENESS_PATH)
+async def liveness():
+    """Liveness probe: the worker is up and its event loop is answering"""
+    return get_probe().liveness()
+
+@app.get(READINESS_PATH)
+async def readiness():
+    """Readiness probe: cached result of the background deep check, 503 until warmed up"""
+    body, ready = get_probe().readiness()
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Latency quantiles in Prometheus text format"""
+    return get_monitor().latency.render_prometheus()
+
+@app.get("/metrics/json")
+async def metrics_json():
+    """Latency quantiles, scoring parse outcomes and model call scheduling as a JSON snapshot"""
+    return {
+        "latency": get_monitor().latency.snapshot(),
+        "score_parse": parse_outcomes.stats(),
+        "scheduler": get_scheduler().stats(),
+    }
+
+@app.get("/metrics/traces")
+async def recent_traces(limit: int = 20):
+    """The most recent request traces with their per-stage spans, newest first"""
+    return {"traces": get_trace_store().recent(limit), "store": get_trace_store().stats()}
+
+@app.get("/metrics/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """One recent request trace; older ones are only in the structured log"""
+    found = get_trace_store().get(trace_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Trace not in the recent buffer: {trace_id}")
+    return found
+
+@app.post("/process_assessment", response_model=AssessmentResult)
 async def process_assessment(request: AssessmentRequest):
     """
     Process an assessment and generate AI-powered insights
     
     This is the main entry point for Cloud Functions deployment
     """
+    agent = get_assessment_agent()
     if not agent:
         raise HTTPException(status_code=500, detail="Agent not initialized")
     
     try:
         logger.info(f"Processing assessment for session: {request.session_id}")
         
-        # Convert request to the format expected by the agent
-        assessment_data = {
-            "session_id": request.session_id,
-            "user_id": request.user_id,
-            "industry": request.industry,
-            "location": request.location,
-            "overall_score": request.overall_score,
-            "category_scores": request.category_scores,
-            "question_scores": request.question_scores,
-            "responses": request.responses
-        }
-        
         # Process with the agent
-        result = await agent.run(json.dumps(assessment_data))
-        
-        # Parse the JSON response
-        if isinstance(result, str):
-            try:
-                parsed_result = json.loads(result)
-            except json.JSONDecodeError:
-                # If it's not JSON, wrap it in a data field
-                parsed_result = {"analysis": result}
-        else:
-            parsed_result = result
+        session = request.to_session()
+        async with get_admission_controller().async_slot("process_assessment"):
+            analysis = await assessment_flight.do(
+                request_fingerprint(request.model_dump(mode="json")),
+                lambda: agent.analyze(session)
+            )
+        persist_assessment(request, analysis)
         
         logger.info(f"Successfully processed assessment for session: {request.session_id}")
         
-        return AssessmentResponse(
-            success=True,
-            data=parsed_result
-        )
+        return _result_response(AssessmentResult(success=True, data=analysis))
         
+    except AdmissionRejected:
+        raise
     except Exception as e:
         logger.error(f"Error processing assessment: {e}")
-        return AssessmentResponse(
-            success=False,
-            error=str(e)
-        )
+        return _result_response(AssessmentResult(success=False, error=str(e)))
 
 @app.post("/analyze")
 async def analyze_assessment(request: AssessmentRequest):
@@ -128,6 +306,80 @@ async def analyze_assessment(request: AssessmentRequest):
     """
     return await process_assessment(request)
 
+@app.post("/process_assessment/stream")
+async def process_assessment_stream(request: AssessmentRequest, http_request: Request):
+    """
+    Streaming variant of /process_assessment
+    Sends the scores first, then each analysis section as it is built, then "done"
+    """
+    agent = get_assessment_agent()
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized")
+    
+    session = request.to_session()
+    admission = await get_admission_controller().acquire_async("process_assessment_stream")
+    
+    async def events():
+        yield "scores", {"overall_score": request.overall_score, "category_scores": request.category_scores}
+        sections = {}
+        async for name, value in agent.stream_analysis(session):
+            sections[name] = value
+            yield "section", {"name": name, "value": value}
+        persist_assessment(request, AssessmentAnalysis(**sections))
+        yield "done", {"session_id": request.session_id}
+    
+    return _event_stream(events(), _stream_format(http_request), admission)
+
+@app.post("/score_open_ended/stream")
+async def score_open_ended_stream(request: ScoringRequest, http_request: Request):
+    """
+    Stream an open-ended score: "score" as soon as the model emits it, "explanation"
+    deltas as the text arrives, then the authoritative "result"
+    """
+    if request.question_id not in QUESTION_TYPE_MAP:
+        raise HTTPException(status_code=400, detail=f"Invalid question ID for open-ended scoring: {request.question_id}")
+    http_request.state.question_type = QUESTION_TYPE_MAP[request.question_id]
+    
+    open_ended_agent = get_open_ended_agent()
+    admission = await get_admission_controller().acquire_async("score_open_ended_stream")
+    
+    async def events():
+        outcome = None
+        async for event, data in open_ended_agent.stream_score(request):
+            if event == "outcome":
+                outcome = data
+            elif event == "score":
+                yield "score", {"score": data}
+            elif event == "explanation":
+                yield "explanation", {"delta": data}
+            elif event == "result":
+                if outcome not in UNSCORED_OUTCOMES:
+                    persist_score(request, data)
+                yield "result", data.model_dump()
+    
+    return _event_stream(events(), _stream_format(http_request), admission)
+
+@app.post("/jobs", status_code=202)
+async def create_job(submission: JobSubmission):
+    """
+    Submit an assessment or scoring run as a job and return immediately
+    Poll GET /jobs/{job_id} for the result, or pass webhook_url to have it POSTed
+    Refused with 429 (via admission_rejected) while the queue is full
+    """
+    try:
+        job = await asyncio.to_thread(submit_job, submission)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid {submission.kind} payload: {e.errors(include_url=False)}")
+    return {"job_id": job.job_id, "status": job.status, "poll_url": f"/jobs/{job.job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a job, with its result once it has finished"""
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job_response(job)
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tests for per-instance admission control and load shedding
+"""
+
+import asyncio
+import threading
+import time
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime.admission import AdmissionController, AdmissionRejected, DEADLINE, QUEUE_FULL
+
+
+def test_full_queue_is_rejected_with_429():
+    rejected = []
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5,
+                                     on_reject=lambda endpoint, reason, depth: rejected.append((endpoint, reason, depth)))
+    held = controller.acquire("a")
+    admitted = threading.Event()
+
+    def queued():
+        with controller.slot("a"):
+            admitted.set()
+
+    waiter = threading.Thread(target=queued)
+    waiter.start()
+    while controller.stats()["queued"] == 0:
+        time.sleep(0.001)
+
+    with pytest.raises(AdmissionRejected) as info:
+        controller.acquire("a")
+    assert info.value.status_code == 429
+    assert info.value.retry_after >= 1
+    assert rejected == [("a", QUEUE_FULL, 1)]
+
+    # Releasing hands the slot straight to the queued request
+    held.release()
+    waiter.join(1)
+    assert admitted.is_set()
+    assert controller.stats()["active"] == 0
+
+
+def test_queue_deadline_is_rejected_with_503():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+    with controller.slot("a"):
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected) as info:
+            controller.acquire("a")
+    assert info.value.status_code == 503
+    assert info.value.reason == DEADLINE
+    assert time.monotonic() - start >= 0.05
+    assert controller.stats()["queued"] == 0
+
+
+def test_unmeetable_deadline_is_rejected_without_waiting():
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=1)
+    controller._service_time = 10.0
+    with controller.slot("a"):
+        start = time.monotonic()
+        with pytest.raises(AdmissionRejected) as info:
+            controller.acquire("a")
+    assert time.monotonic() - start < 0.5
+    assert info.value.status_code == 503
+    assert info.value.retry_after >= 10
+
+
+def test_async_waiters_are_admitted_in_fifo_order():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, queue_timeout=5)
+    order = []
+
+    async def request(name):
+        async with controller.async_slot("a"):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        tasks = []
+        for name in range(5):
+            tasks.append(asyncio.create_task(request(name)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert controller.stats()["active"] == 0
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    controller = AdmissionController(max_concurrent=1, max_queue=8, queue_timeout=5)
+
+    async def main():
+        held = await controller.acquire_async("a")
+        waiter = asyncio.create_task(controller.acquire_async("a"))
+        await asyncio.sleep(0.01)
+        assert controller.stats()["queued"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        held.release()
+
+    asyncio.run(main())
+    stats = controller.stats()
+    assert stats["queued"] == 0
+    assert stats["active"] == 0
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorized batch analysis
+The batch path must produce exactly what the single-session agent produces
+"""
+
+import asyncio
+import random
+import sys
+import os
+
+import numpy as np
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from assessment_analysis_agent.agent import AssessmentAgent, AssessmentSession
+from assessment_analysis_agent.batch_analysis import analyze_score_matrix, analyze_sessions, summarize_score_matrix
+from assessment_analysis_agent.scoring_engine import CATEGORIES
+
+
+def single_session(agent, session):
+    return asyncio.run(agent.analyze(session)).model_dump()
+
+
+def random_sessions(count, seed=7):
+    rng = random.Random(seed)
+    categories = list(CATEGORIES) + ["unknownCategory"]
+    sessions = []
+    for i in range(count):
+        chosen = rng.sample(categories, rng.randint(1, len(categories)))
+        # Few distinct values so ties are common
+        scores = {c: rng.choice([-0.0, 0.0, 4.0, 8.0, 12.0, 12.5, 16.0, 20.0, rng.uniform(0, 25)]) for c in chosen}
+        sessions.append(AssessmentSession(responses=[], scores=scores, industry=f"Industry {i % 3}",
+                                          location=f"Location {i % 5}"))
+    return sessions
+
+
+def test_batch_matches_single_session_path():
+    agent = AssessmentAgent()
+    sessions = random_sessions(300)
+
+    batch = [analysis.model_dump() for analysis in analyze_sessions(sessions)]
+
+    assert batch == [single_session(agent, session) for session in sessions]
+
+
+def test_ties_pick_first_highest_and_last_lowest():
+    scores = np.array([[10.0, 10.0, 5.0, 5.0, 10.0]])
+    summary = summarize_score_matrix(scores)
+
+    assert CATEGORIES[summary.highest[0]] == CATEGORIES[0]
+    assert CATEGORIES[summary.lowest[0]] == CATEGORIES[3]
+
+
+def test_strengths_and_weaknesses_are_relative_to_category_weight():
+    # personalBackground max 20, entrepreneurialSkills max 25, behavioralMetrics max 15
+    scores = np.array([[16.0, 12.0, 10.0, 7.0, 9.0]])
+    summary = summarize_score_matrix(scores)
+
+    assert summary.strengths[0].tolist() == [True, False, False, False, False]
+    assert summary.weaknesses[0].tolist() == [False, True, False, True, True]
+    assert summary.improvement_potential[0] == 8.0
+
+
+def test_matrix_shape_is_checked():
+    with pytest.raises(ValueError):
+        analyze_score_matrix(np.zeros((2, 3)), ["a", "b"], ["x", "y"])
+    with pytest.raises(ValueError):
+        analyze_score_matrix(np.zeros((2, 5)), ["a"], ["x", "y"])
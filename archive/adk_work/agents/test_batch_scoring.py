@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for scoring a session's open-ended questions in one batch
+Runs offline against a stubbed model
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+import pytest
+from pydantic import ValidationError
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import main
+from open_ended_scoring_agent import cache as cache_module
+from open_ended_scoring_agent.agent import BatchScoringRequest, OpenEndedScoringAgent
+from open_ended_scoring_agent.cache import ScoringCache
+
+
+class StubModel:
+    """Scores every prompt 4, except responses mapped to an error or a reply without a score"""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+
+    async def generate_content_async(self, prompt):
+        for response, outcome in self.failures.items():
+            if response in prompt:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                yield outcome
+                return
+        yield json.dumps({"score": 4, "explanation": "Clear milestones"})
+
+
+@pytest.fixture
+def use_model(monkeypatch):
+    def use(model):
+        monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+        monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+    return use
+
+
+def batch_body():
+    return {
+        "session_id": "session-1",
+        "questions": [
+            {"question_id": "q3", "response": "Three years in", "question_text": "Journey?"},
+            {"question_id": "q8", "response": "Lost our biggest client", "question_text": "Challenge?"},
+            {"question_id": "q23", "response": "Regional expansion", "question_text": "Vision?"},
+        ],
+    }
+
+
+def call_handler(body: bytes):
+    app = Flask(__name__)
+    with app.test_request_context("/", method="POST", data=body, content_type="application/json"):
+        from flask import request
+        return main.process_open_ended_batch_scoring_http(request)
+
+
+def test_every_question_is_scored(use_model):
+    use_model(StubModel())
+    result = asyncio.run(OpenEndedScoringAgent().score_batch(BatchScoringRequest.model_validate(batch_body())))
+
+    assert [item.question_id for item in result.results] == ["q3", "q8", "q23"]
+    assert all(item.success and item.score == 4 for item in result.results)
+    assert result.failed_count == 0
+
+
+def test_failed_and_unscored_questions_are_reported_as_failures(use_model):
+    use_model(StubModel({
+        "Lost our biggest client": RuntimeError("429 quota exceeded"),
+        "Regional expansion": "I cannot evaluate this response.",
+    }))
+    result = asyncio.run(OpenEndedScoringAgent().score_batch(BatchScoringRequest.model_validate(batch_body())))
+
+    q3, q8, q23 = result.results
+    assert q3.success and q3.score == 4
+    assert not q8.success and q8.score is None and "429 quota exceeded" in q8.error
+    assert not q23.success and q23.score is None and "no score" in q23.error
+    assert result.failed_count == 2
+
+
+def test_batch_rejects_unknown_and_duplicate_question_ids():
+    unknown = batch_body()
+    unknown["questions"][0]["question_id"] = "q1"
+    with pytest.raises(ValidationError, match="Invalid question ID"):
+        BatchScoringRequest.model_validate(unknown)
+
+    duplicate = batch_body()
+    duplicate["questions"][1]["question_id"] = "q3"
+    with pytest.raises(ValidationError, match="Duplicate question ID: q3"):
+        BatchScoringRequest.model_validate(duplicate)
+
+
+def test_handler_reports_partial_failure(use_model, monkeypatch):
+    use_model(StubModel({"Lost our biggest client": RuntimeError("429 quota exceeded")}))
+    monkeypatch.setattr(main, "open_ended_agent", None)
+    body, status, _ = call_handler(json.dumps(batch_body()).encode())
+
+    assert status == 200
+    result = json.loads(body)
+    assert result["success"] is True
+    assert result["failed_count"] == 1
+    assert [item["success"] for item in result["results"]] == [True, False, True]
+
+
+def test_handler_rejects_invalid_batches():
+    duplicate = batch_body()
+    duplicate["questions"][1]["question_id"] = "q3"
+    body, status, _ = call_handler(json.dumps(duplicate).encode())
+    assert status == 400
+    assert "Duplicate question ID: q3" in json.loads(body)["error"]
+
+    missing = batch_body()
+    del missing["questions"][1]["response"]
+    body, status, _ = call_handler(json.dumps(missing).encode())
+    assert status == 400
+    assert json.loads(body)["error"] == "Missing required field: questions[1].response"
+
+    body, status, _ = call_handler(b"")
+    assert status == 400
+    assert json.loads(body)["error"] == "No JSON data provided"
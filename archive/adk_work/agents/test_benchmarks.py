@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the offline benchmark harness
+"""
+
+import asyncio
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmarks.harness import BenchmarkCase, BenchmarkResult, Harness, compare, load_baseline, save_baseline
+
+
+def result(name, p50_ms, peak_alloc_kb=10.0):
+    return BenchmarkResult(name=name, iterations=10, mean_ms=p50_ms, p50_ms=p50_ms, p95_ms=p50_ms, p99_ms=p50_ms,
+                           max_ms=p50_ms, throughput_per_s=1000 / p50_ms, peak_alloc_kb=peak_alloc_kb)
+
+
+def test_harness_times_sync_and_async_cases():
+    async def sleeper():
+        await asyncio.sleep(0.001)
+
+    harness = Harness(rounds=1, alloc_iterations=3)
+    try:
+        sync_result = harness.run(BenchmarkCase(name="alloc", fn=lambda: bytearray(256 * 1024), iterations=5, warmup=1))
+        async_result = harness.run(BenchmarkCase(name="sleep", fn=sleeper, iterations=5, warmup=1))
+    finally:
+        harness.close()
+
+    assert sync_result.peak_alloc_kb >= 256
+    assert async_result.p50_ms >= 1.0
+    assert async_result.p50_ms <= async_result.p95_ms <= async_result.max_ms
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"a": result("a", 1.0), "b": result("b", 1.0), "c": result("c", 1.0, peak_alloc_kb=100)}
+    current = [result("a", 1.1), result("b", 1.5), result("c", 0.5, peak_alloc_kb=150), result("new", 9.0)]
+
+    regressions = compare(current, baseline, threshold=0.2)
+
+    assert [(r.name, r.metric) for r in regressions] == [("b", "p50_ms"), ("c", "peak_alloc_kb")]
+    assert regressions[0].change == 0.5
+
+
+def test_compare_ignores_changes_within_the_noise_floor():
+    baseline = {"tiny": result("tiny", 0.002, peak_alloc_kb=0.2)}
+    assert compare([result("tiny", 0.004, peak_alloc_kb=0.8)], baseline, threshold=0.2) == []
+
+
+def test_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    assert load_baseline(path) == {}
+    save_baseline(path, [result("a", 1.0)])
+    assert load_baseline(path) == {"a": result("a", 1.0)}
+
+
+def test_every_case_runs_offline(monkeypatch):
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent
+    from benchmarks.cases import build_cases
+
+    # build_cases installs a stub model on the class; restore it afterwards
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", OpenEndedScoringAgent.model_client)
+    harness = Harness(rounds=1, alloc_iterations=1)
+    try:
+        for case in build_cases():
+            assert harness.run(case.model_copy(update={"warmup": 1}), iterations=2).iterations == 2
+    finally:
+        harness.close()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk cohort scoring CLI
+Runs offline with analysis in a thread and a stubbed open-ended scorer
+"""
+
+import asyncio
+import concurrent.futures
+import io
+import json
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bulk_score
+from open_ended_scoring_agent.agent import BatchScoringItem, BatchScoringResult
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_agent_with_scores.json")
+
+
+class FakeScoringAgent:
+    """Stands in for OpenEndedScoringAgent.score_batch"""
+
+    def __init__(self):
+        self.batches = 0
+
+    async def score_batch(self, batch):
+        self.batches += 1
+        return BatchScoringResult(
+            session_id=batch.session_id,
+            results=[BatchScoringItem(question_id=q.question_id, success=True, score=5, explanation="ok")
+                     for q in batch.questions],
+            failed_count=0
+        )
+
+
+def write_cohort(path, count):
+    with open(SAMPLE_PATH) as f:
+        sample = json.load(f)
+    with open(path, "w") as f:
+        for i in range(count):
+            f.write(json.dumps({**sample, "session_id": f"s{i}"}) + "\n")
+
+
+def read_results(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_results_stream_in_input_order(tmp_path):
+    cohort, output = tmp_path / "cohort.jsonl", tmp_path / "out.jsonl"
+    write_cohort(cohort, 25)
+    with open(cohort, "a") as f:
+        f.write("not json\n")
+
+    bulk_score.main([str(cohort), "-o", str(output), "--workers", "0", "--chunk-size", "3", "--max-in-flight", "2",
+                     "--checkpoint-every", "5"])
+
+    results = read_results(output)
+    assert [r["line"] for r in results] == list(range(1, 27))
+    assert all(r["success"] for r in results[:25])
+    assert results[0]["analysis"]["key_insights"]
+    assert results[-1]["success"] is False
+    assert json.loads((tmp_path / "out.jsonl.checkpoint").read_text())["complete"] is True
+
+
+def test_resume_skips_checkpointed_lines_and_drops_partial_output(tmp_path):
+    cohort, output = tmp_path / "cohort.jsonl", tmp_path / "out.jsonl"
+    write_cohort(cohort, 10)
+    bulk_score.main([str(cohort), "-o", str(output), "--workers", "0", "--restart"])
+    full = output.read_bytes()
+    first_four = b"".join(full.splitlines(keepends=True)[:4])
+
+    # Simulate a run killed after checkpointing line 4 while line 5 was half written
+    output.write_bytes(first_four + b'{"line": 5, "sess')
+    bulk_score.Checkpoint(f"{output}.checkpoint", bulk_score.input_fingerprint(str(cohort))).save(4, len(first_four))
+    bulk_score.main([str(cohort), "-o", str(output), "--workers", "0", "--chunk-size", "3"])
+
+    assert [r["line"] for r in read_results(output)] == list(range(1, 11))
+
+
+def test_resume_refuses_a_different_input(tmp_path):
+    cohort, other, output = tmp_path / "cohort.jsonl", tmp_path / "other.jsonl", tmp_path / "out.jsonl"
+    write_cohort(cohort, 10)
+    write_cohort(other, 10)
+    bulk_score.Checkpoint(f"{output}.checkpoint", bulk_score.input_fingerprint(str(cohort))).save(4, 0)
+    output.write_bytes(b"")
+
+    with pytest.raises(SystemExit):
+        bulk_score.main([str(other), "-o", str(output), "--workers", "0"])
+    assert output.read_bytes() == b""
+
+    # The same file appended to since the checkpoint is a different input too
+    with open(cohort, "a") as f:
+        f.write("\n")
+    with pytest.raises(SystemExit):
+        bulk_score.main([str(cohort), "-o", str(output), "--workers", "0"])
+
+
+def test_resume_without_output_starts_over(tmp_path):
+    cohort, output = tmp_path / "cohort.jsonl", tmp_path / "out.jsonl"
+    write_cohort(cohort, 5)
+    bulk_score.Checkpoint(f"{output}.checkpoint", bulk_score.input_fingerprint(str(cohort))).save(4, 1234)
+
+    bulk_score.main([str(cohort), "-o", str(output), "--workers", "0"])
+
+    assert [r["line"] for r in read_results(output)] == list(range(1, 6))
+
+
+def test_open_ended_scores_feed_the_scoring_engine(tmp_path):
+    record = {
+        "session_id": "s1",
+        "responses": [{"questionId": "q23", "response": "National reach in five years"}],
+        "industry": "Retail",
+        "location": "Texas"
+    }
+    agent = FakeScoringAgent()
+    executor = concurrent.futures.ThreadPoolExecutor(1, initializer=bulk_score._init_worker)
+    scorer = bulk_score.BulkScorer(executor, scoring_agent=agent)
+    output = io.BytesIO()
+    checkpoint = bulk_score.Checkpoint(str(tmp_path / "out.jsonl.checkpoint"))
+
+    asyncio.run(scorer.run(io.StringIO(json.dumps(record) + "\n"), output, checkpoint))
+    executor.shutdown()
+
+    result = json.loads(output.getvalue())
+    assert agent.batches == 1
+    assert result["open_ended_scores"]["q23"]["score"] == 5
+    # (5/5)*(20/5) = 4 for growthVision, nothing else answered
+    assert result["scores"]["growthVision"] == 4
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for the buffered Cloud Monitoring exporter
+Runs against a local fake MetricServiceClient
+"""
+
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from monitoring.cloud_monitoring import CloudMetrics, MetricsBuffer, MAX_SERIES_PER_REQUEST
+
+
+class FakeMetricServiceClient:
+    """Records create_time_series requests instead of calling GCP"""
+
+    def __init__(self):
+        self.requests = []
+
+    def create_time_series(self, request):
+        self.requests.append(request)
+
+
+def points_by_series(client):
+    values = {}
+    for request in client.requests:
+        for series in request["time_series"]:
+            key = (series.metric.type, tuple(sorted(series.metric.labels.items())))
+            values[key] = series.points[0].value.double_value
+    return values
+
+
+def test_points_merge_per_series_and_window():
+    client = FakeMetricServiceClient()
+    metrics = CloudMetrics("test-project", client=client)
+    metrics._worker_pid = os.getpid()  # keep the background worker out of the test
+
+    metrics.record_request_metrics(1.0, True)
+    metrics.record_request_metrics(3.0, True)
+    metrics.record_request_metrics(2.0, False)
+
+    assert client.requests == []  # nothing leaves the process on the request path
+    assert metrics.flush() == 4
+    assert len(client.requests) == 1
+
+    values = points_by_series(client)
+    assert values[("custom.googleapis.com/assessment/processing_time_seconds", (("success", "true"),))] == 2.0
+    assert values[("custom.googleapis.com/assessment/request_count", (("success", "true"),))] == 2.0
+    assert values[("custom.googleapis.com/assessment/request_count", (("success", "false"),))] == 1.0
+    assert metrics.flush() == 0
+
+
+def test_flush_respects_per_call_series_limit():
+    client = FakeMetricServiceClient()
+    metrics = CloudMetrics("test-project", client=client, max_series=1000)
+    metrics._worker_pid = os.getpid()
+
+    for i in range(MAX_SERIES_PER_REQUEST + 50):
+        metrics.create_time_series("assessment/test", 1, {"shard": str(i)})
+
+    assert metrics.flush() == MAX_SERIES_PER_REQUEST + 50
+    assert [len(r["time_series"]) for r in client.requests] == [MAX_SERIES_PER_REQUEST, 50]
+
+
+def test_buffer_drops_oldest_series_when_full():
+    buffer = MetricsBuffer(max_series=2)
+    buffer.record("m", 1, {"k": "a"})
+    buffer.record("m", 1, {"k": "b"})
+    buffer.record("m", 1, {"k": "c"})
+
+    assert buffer.dropped == 1
+    assert sorted(labels["k"] for _, labels, _ in buffer.drain()) == ["b", "c"]
+
+
+def test_export_is_off_unless_configured_or_deployed(monkeypatch):
+    for name in ("METRICS_EXPORT", "GOOGLE_CLOUD_PROJECT", "K_SERVICE", "FUNCTION_TARGET"):
+        monkeypatch.delenv(name, raising=False)
+    metrics = CloudMetrics("test-project")
+    metrics.record_request_metrics(1.0, True)
+
+    assert not metrics.export
+    assert metrics._worker is None  # no exporter thread, nothing flushed at exit
+    assert metrics.flush() == 0
+
+    monkeypatch.setenv("K_SERVICE", "assessment-agent")
+    assert CloudMetrics("test-project").export
+    monkeypatch.setenv("METRICS_EXPORT", "false")
+    assert not CloudMetrics("test-project").export
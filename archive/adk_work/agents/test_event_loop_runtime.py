@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent background event loop used by the Cloud Functions handlers
+"""
+
+import asyncio
+import contextvars
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime.event_loop import BackgroundEventLoop
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+async def current_loop():
+    return asyncio.get_running_loop()
+
+
+def test_loop_survives_across_calls():
+    runtime = BackgroundEventLoop(name="test-loop")
+    try:
+        first = runtime.run(current_loop())
+        second = runtime.run(current_loop())
+        assert first is second
+        assert first.is_running()
+    finally:
+        runtime.stop()
+
+
+def test_exceptions_and_contextvars_propagate():
+    runtime = BackgroundEventLoop(name="test-loop")
+
+    async def fail():
+        raise ValueError("boom")
+
+    async def read_request_id():
+        return request_id.get()
+
+    try:
+        with pytest.raises(ValueError):
+            runtime.run(fail())
+
+        token = request_id.set("req-123")
+        try:
+            assert runtime.run(read_request_id()) == "req-123"
+        finally:
+            request_id.reset(token)
+    finally:
+        runtime.stop()
+
+
+def test_timeout_cancels_the_task():
+    runtime = BackgroundEventLoop(name="test-loop")
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    try:
+        with pytest.raises(TimeoutError):
+            runtime.run(slow(), timeout=0.05)
+        runtime.run(asyncio.sleep(0.05))
+        assert cancelled == [True]
+    finally:
+        runtime.stop()
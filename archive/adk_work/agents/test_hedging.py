@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for hedged model calls
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime import hedging
+from runtime.hedging import Hedger
+from open_ended_scoring_agent import cache as cache_module
+from open_ended_scoring_agent.agent import OpenEndedScoringAgent, ScoringRequest
+from open_ended_scoring_agent.cache import ScoringCache
+
+
+def seeded_hedger(**kwargs):
+    hedger = Hedger("test", min_samples=5, budget=1.0, **kwargs)
+    for _ in range(20):
+        hedger.record(0.01)
+    return hedger
+
+
+class SlowThenFast:
+    """First call hangs, later calls return quickly"""
+
+    def __init__(self):
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        try:
+            await asyncio.sleep(5 if call == 1 else 0.001)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return call
+
+
+def test_no_hedge_without_history():
+    hedger = Hedger("test", min_samples=5)
+    fn = SlowThenFast()
+    fn.calls = 1  # skip the slow first call
+
+    assert asyncio.run(hedger.run(fn)) == 2
+    assert hedger.threshold() is None
+    assert hedger.stats()["hedged"] == 0
+
+
+def test_slow_call_is_hedged_and_loser_cancelled():
+    hedger = seeded_hedger()
+    fn = SlowThenFast()
+
+    assert asyncio.run(asyncio.wait_for(hedger.run(fn), 1)) == 2
+    assert fn.calls == 2
+    assert fn.cancelled == 1
+    stats = hedger.stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_rate"] == 1.0
+    assert stats["hedge_win_rate"] == 1.0
+
+
+def test_hedged_call_records_the_latency_the_caller_saw():
+    hedger = seeded_hedger()
+    delay = hedger.threshold()
+    fn = SlowThenFast()
+
+    asyncio.run(asyncio.wait_for(hedger.run(fn), 1))
+
+    # Timed from run(), not from the backup's start: at least the hedge delay plus the backup
+    assert len(hedger._latencies) == 21
+    assert hedger._latencies[-1] >= delay + 0.001
+
+
+def test_budget_caps_extra_calls():
+    hedger = Hedger("test", min_samples=5, budget=0.0)
+    for _ in range(20):
+        hedger.record(0.001)
+
+    async def slowish():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    assert asyncio.run(hedger.run(slowish)) == "done"
+    stats = hedger.stats()
+    assert stats["hedged"] == 0
+    assert stats["budget_exhausted"] == 1
+
+
+def test_primary_error_is_raised_when_both_calls_fail():
+    hedger = seeded_hedger()
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        number = len(calls)
+        await asyncio.sleep(0.05 if number == 1 else 0)
+        raise ValueError(f"call {number}")
+
+    try:
+        asyncio.run(hedger.run(failing))
+    except ValueError as e:
+        assert str(e) == "call 1"
+    else:
+        raise AssertionError("expected ValueError")
+    assert len(calls) == 2
+
+
+def test_open_ended_scoring_uses_hedger(monkeypatch):
+    class SlowFirstModel:
+        def __init__(self):
+            self.calls = 0
+
+        async def generate_content_async(self, prompt):
+            self.calls += 1
+            if self.calls == 1:
+                await asyncio.sleep(5)
+            yield json.dumps({"score": 5, "explanation": "Strong"})
+
+    model = SlowFirstModel()
+    monkeypatch.setenv("HEDGE_REQUESTS", "1")
+    monkeypatch.setattr(hedging, "hedgers", {"open_ended_scoring": seeded_hedger()})
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    agent = OpenEndedScoringAgent()
+    request = ScoringRequest(question_id="q23", response="Global reach", question_text="Vision?")
+    result = asyncio.run(asyncio.wait_for(agent._score_question(request), 1))
+
+    assert result.score == 5
+    assert model.calls == 2
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Tests for the asynchronous job queue, its worker pool and the job endpoints
+Runs offline against a stubbed model
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import sys
+import os
+import time
+
+import httpx
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime import jobs as jobs_module
+from runtime.jobs import FAILED, QUEUED, RUNNING, SUCCEEDED, JobRunner, JobSubmission, SqliteJobStore
+
+SCORING_PAYLOAD = {"question_id": "q3", "response": "Two years, first hire made", "question_text": "Journey?"}
+
+
+class StubModel:
+    async def generate_content_async(self, prompt):
+        yield json.dumps({"score": 4, "explanation": "Clear milestones"})
+
+
+def submission(kind="open_ended", payload=None, webhook_url=None):
+    return JobSubmission(kind=kind, payload=payload or SCORING_PAYLOAD, webhook_url=webhook_url)
+
+
+def test_jobs_are_claimed_once_in_submission_order(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first_process, second_process = SqliteJobStore(path), SqliteJobStore(path)
+    ids = [first_process.enqueue(submission()).job_id for _ in range(3)]
+
+    claimed = [first_process.claim(60), second_process.claim(60), first_process.claim(60)]
+    assert [job.job_id for job in claimed] == ids
+    assert all(job.status == RUNNING and job.attempts == 1 for job in claimed)
+    assert second_process.claim(60) is None
+    assert second_process.stats()[RUNNING] == 3
+
+
+def test_queue_files_from_before_priorities_are_migrated(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "jobs.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE jobs (job_id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, webhook_url TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, lease_until REAL)"
+        )
+        conn.execute("INSERT INTO jobs (job_id, kind, status, payload, created_at, updated_at) "
+                     "VALUES ('old', 'open_ended', 'queued', '{}', 1, 1)")
+
+    store, other_process = SqliteJobStore(path), SqliteJobStore(path)
+    assert store.get("old").priority == "batch" and store.get("old").tenant is None
+    assert other_process.get(store.enqueue(submission()).job_id).status == QUEUED
+
+
+def test_expired_lease_is_retried_then_given_up(tmp_path):
+    now = [1000.0]
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"), max_attempts=2, clock=lambda: now[0])
+    job_id = store.enqueue(submission()).job_id
+
+    store.claim(10)
+    assert store.claim(10) is None  # still leased
+    now[0] += 11  # the worker died
+    assert store.claim(10).attempts == 2
+    now[0] += 11
+    assert store.claim(10) is None
+    assert store.get(job_id).status == FAILED
+    assert "too many times" in store.get(job_id).error
+
+
+def test_finished_jobs_are_purged_after_retention(tmp_path):
+    now = [1000.0]
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"), clock=lambda: now[0])
+    done = store.enqueue(submission()).job_id
+    waiting = store.enqueue(submission()).job_id
+    claimed = store.claim(60)
+    store.complete(claimed.job_id, {"success": True}, claimed.attempts)
+
+    now[0] += 100
+    assert store.purge(50) == 1
+    assert store.get(done) is None
+    assert store.get(waiting).status == QUEUED
+
+
+def test_a_worker_that_lost_its_lease_cannot_finish_the_job(tmp_path):
+    now = [1000.0]
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"), clock=lambda: now[0])
+    job_id = store.enqueue(submission()).job_id
+
+    stale = store.claim(10)
+    now[0] += 11
+    current = store.claim(10)
+    assert not store.complete(job_id, {"from": "stale"}, stale.attempts)
+    assert store.get(job_id).status == RUNNING
+    assert store.complete(job_id, {"from": "current"}, current.attempts)
+    assert not store.fail(job_id, "late failure", stale.attempts)
+    assert (store.get(job_id).status, store.get(job_id).result) == (SUCCEEDED, {"from": "current"})
+
+
+def test_runner_stores_results_failures_and_calls_webhooks(tmp_path, monkeypatch):
+    delivered = []
+
+    def webhook(request):
+        timestamp = request.headers["X-Webhook-Timestamp"]
+        expected = hmac.new(b"s3cret", f"{timestamp}.".encode() + request.content, hashlib.sha256).hexdigest()
+        assert request.headers["X-Webhook-Signature"] == f"sha256={expected}"
+        delivered.append(json.loads(request.content))
+        return httpx.Response(200)
+
+    async def echo(payload):
+        return {"echo": payload["question_id"]}
+
+    async def broken(payload):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setenv("JOB_WEBHOOK_ALLOWED_HOSTS", "hooks.example.com")
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, handlers={"open_ended": echo, "open_ended_batch": broken},
+                       webhook_transport=httpx.MockTransport(webhook), webhook_secret="s3cret")
+    ok = store.enqueue(submission(webhook_url="https://hooks.example.com/done")).job_id
+    bad = store.enqueue(submission(kind="open_ended_batch", payload={"questions": [SCORING_PAYLOAD]})).job_id
+
+    async def drain():
+        while await runner.run_once() is not None:
+            pass
+        await runner.wait_for_webhooks()
+    asyncio.run(drain())
+
+    assert store.get(ok).status == SUCCEEDED and store.get(ok).result == {"echo": "q3"}
+    assert store.get(bad).status == FAILED and store.get(bad).error == "model unavailable"
+    assert [(body["job_id"], body["status"], "payload" in body) for body in delivered] == [(ok, SUCCEEDED, False)]
+    assert runner.stats()["completed"] == 1 and runner.stats()["failed"] == 1
+
+
+class QuotaExceeded(Exception):
+    status_code = 429
+
+
+def test_retryable_failures_are_queued_again_until_attempts_run_out(tmp_path):
+    now = [1000.0]
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"), max_attempts=3, clock=lambda: now[0])
+
+    async def flaky(payload):
+        if payload["question_id"] == "q3":
+            raise QuotaExceeded("429 quota exceeded")
+        raise ValueError("bad template")
+
+    runner = JobRunner(store, handlers={"open_ended": flaky}, retry_delay=10)
+    retried = store.enqueue(submission()).job_id
+    broken = store.enqueue(submission(payload={**SCORING_PAYLOAD, "question_id": "q8"})).job_id
+
+    assert asyncio.run(runner.run_once()).status == QUEUED
+    assert asyncio.run(runner.run_once()).status == FAILED  # not retryable
+    assert asyncio.run(runner.run_once()) is None  # backing off
+    now[0] += 11
+    assert asyncio.run(runner.run_once()).status == QUEUED
+    now[0] += 11
+    assert asyncio.run(runner.run_once()) is None  # the second delay is doubled
+    now[0] += 10
+    job = asyncio.run(runner.run_once())
+
+    assert (job.job_id, job.status, job.attempts, job.error) == (retried, FAILED, 3, "429 quota exceeded")
+    assert store.get(broken).attempts == 1
+    assert runner.stats()["retried"] == 2 and runner.stats()["failed"] == 2
+
+
+def test_webhooks_do_not_hold_a_worker_or_sleep_after_the_last_try(tmp_path, monkeypatch):
+    sleeps = []
+    receiver_down = asyncio.Event()
+
+    async def no_sleep(seconds):
+        sleeps.append(seconds)
+
+    async def dead_receiver(request):
+        await receiver_down.wait()
+        return httpx.Response(503)
+
+    async def echo(payload):
+        return {"echo": payload["question_id"]}
+
+    monkeypatch.setenv("JOB_WEBHOOK_ALLOWED_HOSTS", "hooks.example.com")
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, handlers={"open_ended": echo}, webhook_retries=3,
+                       webhook_transport=httpx.MockTransport(dead_receiver))
+    first = store.enqueue(submission(webhook_url="https://hooks.example.com/done")).job_id
+    second = store.enqueue(submission()).job_id
+
+    async def run():
+        await runner.run_once()
+        # The worker is free for the next job while the first webhook is still waiting
+        assert (await runner.run_once()).job_id == second
+        monkeypatch.setattr(jobs_module.asyncio, "sleep", no_sleep)
+        receiver_down.set()
+        await runner.wait_for_webhooks()
+    asyncio.run(run())
+
+    assert store.get(first).status == SUCCEEDED
+    assert sleeps == [1, 2]
+    assert runner.stats()["webhooks_failed"] == 1
+
+
+def test_job_store_is_chosen_by_configuration(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs_module, "job_store", None)
+    monkeypatch.delenv("JOB_SINGLE_INSTANCE", raising=False)
+    monkeypatch.delenv("JOB_STORE_FACTORY", raising=False)
+    assert not jobs_module.shared_store_configured()
+
+    monkeypatch.setenv("JOB_STORE_FACTORY", "test_jobs:shared_store")
+    monkeypatch.setenv("JOB_MAX_ATTEMPTS", "5")
+    monkeypatch.setitem(globals(), "SHARED_STORE_PATH", str(tmp_path / "shared.sqlite3"))
+    store = jobs_module.get_job_store()
+    assert jobs_module.shared_store_configured()
+    assert (store.path, store.max_attempts) == (str(tmp_path / "shared.sqlite3"), 5)
+
+
+SHARED_STORE_PATH = None
+
+
+def shared_store(max_attempts):
+    return SqliteJobStore(SHARED_STORE_PATH, max_attempts=max_attempts)
+
+
+def test_submissions_are_validated_up_front(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs_module, "job_store", SqliteJobStore(str(tmp_path / "jobs.sqlite3")))
+    with pytest.raises(ValueError):
+        JobSubmission(kind="open_ended", payload=SCORING_PAYLOAD, webhook_url="file:///etc/passwd")
+    # Webhooks are denied until hosts are allowed
+    monkeypatch.delenv("JOB_WEBHOOK_ALLOWED_HOSTS", raising=False)
+    with pytest.raises(ValueError, match="not allowed"):
+        JobSubmission(kind="open_ended", payload=SCORING_PAYLOAD, webhook_url="http://169.254.169.254/latest")
+    monkeypatch.setenv("JOB_WEBHOOK_ALLOWED_HOSTS", "hooks.example.com")
+    with pytest.raises(ValueError):
+        JobSubmission(kind="open_ended", payload=SCORING_PAYLOAD, webhook_url="https://internal.local/hook")
+    with pytest.raises(ValueError):
+        jobs_module.submit_job(submission(payload={"question_id": "q3"}))
+    assert jobs_module.job_store.stats()[QUEUED] == 0
+
+
+def test_server_job_round_trip(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+    from open_ended_scoring_agent import cache as cache_module
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent
+    from open_ended_scoring_agent.cache import ScoringCache
+    from runtime import warmup as warmup_module
+
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    monkeypatch.setattr(jobs_module, "job_store", SqliteJobStore(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(jobs_module, "job_runner", None)
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: StubModel()))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    with TestClient(server.app) as client:
+        response = client.post("/jobs", json={"kind": "open_ended", "payload": SCORING_PAYLOAD})
+        assert response.status_code == 202
+        poll_url = response.json()["poll_url"]
+
+        deadline = time.monotonic() + 10
+        while client.get(poll_url).json()["status"] in (QUEUED, RUNNING) and time.monotonic() < deadline:
+            time.sleep(0.02)
+        job = client.get(poll_url).json()
+
+        assert job["status"] == SUCCEEDED
+        assert job["result"] == {"success": True, "score": 4, "explanation": "Clear milestones"}
+        assert client.get("/jobs/missing").status_code == 404
+        assert client.post("/jobs", json={"kind": "open_ended", "payload": {}}).status_code == 400
+
+
+def test_functions_handler_submits_and_polls(tmp_path, monkeypatch):
+    from flask import Flask, request
+    import main
+
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jobs_module, "job_store", store)
+    # Leave the jobs queued: no background runner in this process
+    monkeypatch.setattr(jobs_module, "start_job_runner_in_background", lambda: None)
+    monkeypatch.delenv("JOB_STORE_FACTORY", raising=False)
+    monkeypatch.delenv("JOB_SINGLE_INSTANCE", raising=False)
+    app = Flask("jobs")
+
+    def call(method, path="/", body=None):
+        with app.test_request_context(path, method=method, data=json.dumps(body) if body else None,
+                                      content_type="application/json"):
+            body, status, _ = main.jobs_http(request)
+        return json.loads(body), status
+
+    # Each instance would have its own queue: refuse rather than lose jobs
+    body, status = call("POST", body={"kind": "open_ended", "payload": SCORING_PAYLOAD})
+    assert status == 503 and "JOB_STORE_FACTORY" in body["error"]
+    monkeypatch.setenv("JOB_SINGLE_INSTANCE", "true")
+
+    def broken_runner():
+        raise RuntimeError("no event loop")
+    monkeypatch.setattr(jobs_module, "start_job_runner_in_background", broken_runner)
+    body, status = call("GET", "/jobs/unknown")
+    assert status == 500 and body == {"success": False, "error": "Processing failed: no event loop"}
+    monkeypatch.setattr(jobs_module, "start_job_runner_in_background", lambda: None)
+
+    body, status = call("POST", body={"kind": "assessment", "payload": {"session_id": "s"}})
+    assert status == 400 and "Invalid assessment payload" in body["error"]
+    body, status = call("POST", body={"payload": SCORING_PAYLOAD})
+    assert status == 400 and body["error"] == "Missing required field: kind"
+
+    body, status = call("POST", body={"kind": "open_ended", "payload": SCORING_PAYLOAD})
+    assert status == 202
+    job_id = body["job_id"]
+    assert call("GET", f"/jobs/{job_id}") == ({"success": True, **jobs_module.job_response(store.get(job_id))}, 200)
+    assert call("GET", f"/?job_id={job_id}")[0]["status"] == QUEUED
+    assert call("GET", "/jobs/unknown")[1] == 404
+
+
+def test_submissions_are_refused_while_the_queue_is_full(tmp_path, monkeypatch):
+    from flask import Flask, request
+    from fastapi.testclient import TestClient
+    import main
+    import server
+    from runtime import warmup as warmup_module
+
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jobs_module, "job_store", store)
+    monkeypatch.setattr(jobs_module, "start_job_runner_in_background", lambda: None)
+    monkeypatch.setenv("JOB_MAX_QUEUED", "2")
+    monkeypatch.setenv("JOB_SINGLE_INSTANCE", "true")
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    for _ in range(2):
+        jobs_module.submit_job(submission())
+
+    app = Flask("jobs")
+    with app.test_request_context("/", method="POST", data=json.dumps({"kind": "open_ended", "payload": SCORING_PAYLOAD}),
+                                  content_type="application/json"):
+        _, status, headers = main.jobs_http(request)
+    assert status == 429 and headers["Retry-After"] == str(jobs_module.JOB_QUEUE_RETRY_AFTER)
+
+    monkeypatch.setattr(jobs_module, "job_runner", JobRunner(store, concurrency=0))  # the jobs stay queued
+    with TestClient(server.app) as client:
+        response = client.post("/jobs", json={"kind": "open_ended", "payload": SCORING_PAYLOAD})
+    assert response.status_code == 429 and "Retry-After" in response.headers
+    assert store.stats()[QUEUED] == 2
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process latency histograms
+"""
+
+import json
+import random
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from monitoring.cloud_monitoring import LatencyHistogram, LatencyHistograms
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantiles_within_relative_error():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0, 1) for _ in range(20000)]
+    histogram = LatencyHistogram(relative_error=0.01)
+    for value in values:
+        histogram.record(value)
+
+    for q in (0.5, 0.95, 0.99):
+        assert histogram.quantile(q) == pytest.approx(exact_quantile(values, q), rel=0.02)
+
+
+def test_merge_matches_single_histogram():
+    rng = random.Random(11)
+    values = [rng.uniform(0.01, 5) for _ in range(5000)]
+    combined, left, right = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for i, value in enumerate(values):
+        combined.record(value)
+        (left if i % 2 else right).record(value)
+
+    left.merge(right)
+    assert left.buckets == combined.buckets
+    assert left.quantile(0.95) == combined.quantile(0.95)
+
+
+def test_labelled_series_and_prometheus_output():
+    histograms = LatencyHistograms()
+    histograms.observe("process_open_ended_scoring", 0.5, True, "finalVision")
+    histograms.observe("process_open_ended_scoring", 1.5, False, "finalVision")
+    histograms.observe("process_assessment", 0.2)
+
+    snapshot = histograms.snapshot()
+    assert [(s["endpoint"], s["success"]) for s in snapshot] == [
+        ("process_assessment", "true"),
+        ("process_open_ended_scoring", "false"),
+        ("process_open_ended_scoring", "true"),
+    ]
+    assert histograms.merged("process_open_ended_scoring").count == 2
+
+    text = histograms.render_prometheus()
+    assert "# TYPE gutcheck_request_latency_seconds summary" in text
+    assert ('gutcheck_request_latency_seconds_count{endpoint="process_assessment",'
+            'question_type="",success="true"} 1') in text
+
+
+def test_server_labels_latency_by_route_template(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+    from monitoring import cloud_monitoring
+    from monitoring.cloud_monitoring import PerformanceMonitor
+    from runtime import jobs as jobs_module
+    from runtime import warmup as warmup_module
+
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    monkeypatch.setattr(jobs_module, "job_store", jobs_module.SqliteJobStore(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(jobs_module, "job_runner", None)
+    monkeypatch.setattr(cloud_monitoring, "monitor", PerformanceMonitor("test-project"))
+
+    with TestClient(server.app) as client:
+        for path in ("/jobs/first", "/jobs/second", "/no-such-page", "/wp-login.php"):
+            client.get(path)
+
+    endpoints = {series["endpoint"] for series in cloud_monitoring.monitor.latency.snapshot()}
+    assert endpoints == {"/jobs/{job_id}", "unmatched"}
+
+
+def test_server_labels_open_ended_stream_latency_by_question_type(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+    from monitoring import cloud_monitoring
+    from monitoring.cloud_monitoring import PerformanceMonitor
+    from open_ended_scoring_agent import cache as cache_module
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent
+    from open_ended_scoring_agent.cache import ScoringCache
+    from runtime import jobs as jobs_module
+    from runtime import warmup as warmup_module
+
+    class StubModel:
+        async def generate_content_async(self, prompt):
+            yield json.dumps({"score": 4, "explanation": "ok"})
+
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    monkeypatch.setattr(jobs_module, "job_store", jobs_module.SqliteJobStore(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(jobs_module, "job_runner", None)
+    monkeypatch.setattr(cloud_monitoring, "monitor", PerformanceMonitor("test-project"))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: StubModel()))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    with TestClient(server.app) as client:
+        for question_id in ("q3", "q99"):
+            client.post("/score_open_ended/stream",
+                        json={"question_id": question_id, "response": "An answer", "question_text": "?"})
+
+    series = {(s["question_type"], s["success"]) for s in cloud_monitoring.monitor.latency.snapshot()
+              if s["endpoint"] == "/score_open_ended/stream"}
+    assert series == {("entrepreneurialJourney", "true"), ("", "false")}
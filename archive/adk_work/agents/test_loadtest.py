@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the fake Gemini backend and the load generator
+"""
+
+import asyncio
+import json
+import random
+import sys
+import os
+
+import httpx
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest.fake_gemini import FakeGemini, FakeGeminiConfig, FakeModelError, LatencyDistribution, create_app
+from loadtest.load_generator import run_load
+from runtime.model_client import is_retryable, retry_after, status_code
+
+STREAM_PATH = "/v1beta/models/gemini-2.0-flash:streamGenerateContent?alt=sse"
+STREAM_BODY = {"contents": [{"parts": [{"text": "Score this"}], "role": "user"}]}
+
+
+async def no_sleep(seconds):
+    pass
+
+
+def collect(fake, prompt="Score this"):
+    async def run():
+        return [chunk async for chunk in fake.generate_content_async(prompt)]
+    return asyncio.run(run())
+
+
+def test_latency_distributions():
+    rng = random.Random(1)
+    assert LatencyDistribution.parse("fixed:0.2").sample(rng) == 0.2
+    assert {LatencyDistribution.parse("bimodal:0.1,2.0,0.5").sample(rng) for _ in range(50)} == {0.1, 2.0}
+    samples = sorted(LatencyDistribution.parse("lognormal:0.5,0.4").sample(rng) for _ in range(2001))
+    assert 0.4 < samples[1000] < 0.6
+    for spec in ("uniform:1,2", "fixed:", "lognormal:0.5", "fixed:fast"):
+        with pytest.raises(ValueError):
+            LatencyDistribution.parse(spec)
+
+
+def test_streams_deterministic_json_in_chunks():
+    fake = FakeGemini(FakeGeminiConfig(chunk_size=8), sleep=no_sleep)
+    chunks = collect(fake)
+
+    assert len(chunks) > 1 and all(len(chunk) <= 8 for chunk in chunks)
+    answer = json.loads("".join(chunks))
+    assert answer == json.loads(fake.response_text("Score this"))
+    assert 1 <= answer["score"] <= 5
+
+
+def test_malformed_answers_are_not_json():
+    fake = FakeGemini(FakeGeminiConfig(malformed_rate=1.0), sleep=no_sleep)
+    for prompt in ("a", "b", "c", "d"):
+        with pytest.raises(json.JSONDecodeError):
+            json.loads("".join(collect(fake, prompt)))
+    assert fake.stats()["malformed"] == 4
+
+
+def test_injected_errors_look_like_http_errors():
+    fake = FakeGemini(FakeGeminiConfig(rate_429=1.0, retry_after=2.0), sleep=no_sleep)
+    with pytest.raises(FakeModelError) as excinfo:
+        collect(fake)
+    assert status_code(excinfo.value) == 429
+    assert retry_after(excinfo.value) == 2.0
+    assert is_retryable(excinfo.value)
+
+    fake = FakeGemini(FakeGeminiConfig(rate_500=1.0), sleep=no_sleep)
+    with pytest.raises(FakeModelError) as excinfo:
+        collect(fake)
+    assert status_code(excinfo.value) == 500
+
+
+def test_rate_limit_rejects_beyond_rpm():
+    now = [0.0]
+    fake = FakeGemini(FakeGeminiConfig(rpm=2), clock=lambda: now[0], sleep=no_sleep)
+    collect(fake)
+    collect(fake)
+    with pytest.raises(FakeModelError):
+        collect(fake)
+    now[0] += 30  # half a minute refills one request
+    collect(fake)
+    assert fake.stats()["rate_limited"] == 1
+
+
+def test_http_api_matches_stream_generate_content():
+    from fastapi.testclient import TestClient
+
+    fake = FakeGemini(FakeGeminiConfig(latency="fixed:0", chunk_delay=0))
+    response = TestClient(create_app(fake)).post(STREAM_PATH, json=STREAM_BODY)
+
+    assert response.status_code == 200
+    events = [json.loads(line[len("data: "):]) for line in response.text.splitlines() if line.startswith("data: ")]
+    text = "".join(part["text"] for event in events for part in event["candidates"][0]["content"]["parts"])
+    assert text == fake.response_text("Score this")
+    assert events[-1]["candidates"][0]["finishReason"] == "STOP"
+
+    throttled = FakeGemini(FakeGeminiConfig(rate_429=1.0))
+    response = TestClient(create_app(throttled)).post(STREAM_PATH, json=STREAM_BODY)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1.0"
+    assert response.json()["error"]["status"] == "RESOURCE_EXHAUSTED"
+
+
+def test_load_generator_drives_server_with_fake_model(monkeypatch):
+    import server
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent
+
+    fake = FakeGemini(FakeGeminiConfig(latency="fixed:0.01", chunk_delay=0))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: fake))
+
+    report = asyncio.run(run_load(
+        "http://testserver/score_open_ended/stream", "open_ended", rps=50, duration=0.2,
+        transport=httpx.ASGITransport(app=server.app)
+    ))
+
+    assert report.sent == 10
+    assert report.completed == 10
+    assert report.status_codes == {"200": 10}
+    assert report.latency_ms["p50"] >= 10
+    assert fake.stats()["calls"] == 10
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared quota-aware model client
+Runs offline against fake model backends
+"""
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime.model_client import ModelClient, ModelEndpoint, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class FakeBackend:
+    """Streams a fixed response, optionally failing the first calls"""
+
+    def __init__(self, chunks=("hello ", "world"), failures=(), delay=0.0, fail_after_first_chunk=False):
+        self.chunks = chunks
+        self.failures = list(failures)
+        self.delay = delay
+        self.fail_after_first_chunk = fail_after_first_chunk
+        self.calls = 0
+        self.closed = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        if self.failures:
+            raise FakeAPIError(self.failures.pop(0))
+        await asyncio.sleep(self.delay)
+        try:
+            for i, chunk in enumerate(self.chunks):
+                yield chunk
+                if self.fail_after_first_chunk and i == 0:
+                    raise FakeAPIError(503)
+        finally:
+            self.closed += 1
+
+
+def collect(client, prompt="prompt"):
+    async def run():
+        return "".join([chunk async for chunk in client.generate_content_async(prompt)])
+    return asyncio.run(run())
+
+
+def endpoint(backend, name="key-0", rpm=1000, tpm=1_000_000, clock=None):
+    return ModelEndpoint(name, backend, rpm, tpm, **({"clock": clock} if clock else {}))
+
+
+def test_token_bucket_refills_at_quota_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert bucket.wait_time(1) == pytest.approx(0.5)
+    clock.now += 600
+    assert bucket.available() == 60
+
+
+def test_throttled_call_is_retried_with_backoff():
+    backend = FakeBackend(failures=[429, 503])
+    client = ModelClient([endpoint(backend)], rng=lambda: 0.0)
+
+    assert collect(client) == "hello world"
+    assert backend.calls == 3
+    assert client.stats()["retries"] == 2
+    assert client.stats()["in_flight"] == 0
+
+
+def test_client_errors_are_not_retried():
+    backend = FakeBackend(failures=[400])
+    client = ModelClient([endpoint(backend)], rng=lambda: 0.0)
+
+    with pytest.raises(FakeAPIError):
+        collect(client)
+    assert backend.calls == 1
+
+
+def test_partially_streamed_response_is_not_retried():
+    backend = FakeBackend(fail_after_first_chunk=True)
+    client = ModelClient([endpoint(backend)], rng=lambda: 0.0)
+
+    with pytest.raises(FakeAPIError):
+        collect(client)
+    assert backend.calls == 1
+
+
+def test_stopping_early_closes_the_backend_stream():
+    backend = FakeBackend(chunks=("a", "b", "c", "d"))
+    client = ModelClient([endpoint(backend)], rng=lambda: 0.0)
+
+    async def first_chunk():
+        stream = client.generate_content_async("prompt")
+        chunk = await stream.__anext__()
+        await stream.aclose()
+        return chunk
+
+    assert asyncio.run(first_chunk()) == "a"
+    assert backend.closed == 1
+    assert client.stats()["in_flight"] == 0
+
+
+def test_calls_spread_across_pooled_keys():
+    first, second = FakeBackend(delay=0.02), FakeBackend(delay=0.02)
+    client = ModelClient([endpoint(first, "key-0"), endpoint(second, "key-1")])
+
+    async def run():
+        async def one():
+            return "".join([chunk async for chunk in client.generate_content_async("prompt")])
+        return await asyncio.gather(*(one() for _ in range(6)))
+
+    assert asyncio.run(run()) == ["hello world"] * 6
+    assert first.calls == 3
+    assert second.calls == 3
+
+
+def test_exhausted_key_is_skipped_and_quota_is_waited_for():
+    clock = FakeClock()
+    exhausted, fresh = FakeBackend(), FakeBackend()
+    busy = endpoint(exhausted, "key-0", rpm=60, clock=clock)
+    busy.requests.take(60)
+    client = ModelClient([busy, endpoint(fresh, "key-1", rpm=1, clock=clock)])
+
+    assert collect(client) == "hello world"
+    assert (exhausted.calls, fresh.calls) == (0, 1)
+
+    # Both keys are now out of request quota; the next call waits for a refill
+    async def run():
+        task = asyncio.create_task(client.generate_content_async("prompt").__anext__())
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        clock.now += 1.0
+        return await asyncio.wait_for(task, 2)
+
+    assert asyncio.run(run()) == "hello "
+    assert exhausted.calls == 1
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Tests for the cohort percentile index
+"""
+
+import asyncio
+import random
+import sys
+import threading
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from assessment_analysis_agent import percentile_index as percentile_module
+from assessment_analysis_agent.agent import AssessmentAgent, AssessmentSession
+from assessment_analysis_agent.percentile_index import ANY, FenwickTree, PercentileIndex
+
+
+def scores(overall_parts):
+    return dict(zip(["personalBackground", "entrepreneurialSkills", "resources", "behavioralMetrics", "growthVision"],
+                    overall_parts))
+
+
+def test_fenwick_prefix_sums_match_counts():
+    rng = random.Random(3)
+    counts = [rng.randint(0, 5) for _ in range(101)]
+    built = FenwickTree(101, counts)
+    incremental = FenwickTree(101)
+    for bucket, count in enumerate(counts):
+        for _ in range(count):
+            incremental.add(bucket)
+
+    for bucket in range(101):
+        assert built.prefix_sum(bucket) == incremental.prefix_sum(bucket) == sum(counts[:bucket + 1])
+
+
+def test_percentile_counts_ties_as_half():
+    index = PercentileIndex(min_cohort_size=1)
+    for overall in (10, 20, 20, 30):
+        index.add(scores([overall, 0, 0, 0, 0]), "Tech", "CA")
+
+    assert index.percentile("overall", 20) == 50.0
+    assert index.percentile("overall", 5) == 0.0
+    assert index.percentile("overall", 30) == 87.5
+    assert index.percentile("personalBackground", 10, "Tech", "CA") == 12.5
+    assert index.percentile("overall", 20, "Retail", ANY) is None
+
+
+def test_rank_falls_back_to_wider_cohort():
+    index = PercentileIndex(min_cohort_size=3)
+    for i in range(3):
+        index.add(scores([10 + i, 10, 10, 10, 10]), "Tech", "CA" if i == 0 else "NY")
+
+    # Only one Tech/CA session, but three Tech sessions
+    ranked = index.rank(scores([11, 10, 10, 10, 10]), "Tech", "CA")
+    assert (ranked.industry, ranked.location, ranked.cohort_size) == ("tech", ANY, 3)
+    assert ranked.overall == 50.0
+    assert ranked.categories["personalBackground"] == 50.0
+
+    assert PercentileIndex(min_cohort_size=3).rank(scores([1, 1, 1, 1, 1]), "Tech", "CA") is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    index = PercentileIndex(min_cohort_size=1)
+    rng = random.Random(5)
+    for _ in range(200):
+        index.add(scores([rng.uniform(0, 20) for _ in range(5)]), rng.choice(["Tech", "Retail"]), "CA")
+    path = str(tmp_path / "percentiles.npz")
+    index.save(path)
+
+    loaded = PercentileIndex.load(path, min_cohort_size=1)
+    assert loaded.recorded == 200
+    for score in (0, 12.3, 50, 77.7, 100):
+        assert loaded.percentile("overall", score, "Retail", ANY) == index.percentile("overall", score, "Retail", ANY)
+
+
+def test_analysis_includes_cohort_percentiles(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERCENTILE_INDEX_PATH", str(tmp_path / "percentiles.npz"))
+    monkeypatch.setenv("PERCENTILE_MIN_COHORT", "2")
+    monkeypatch.setattr(percentile_module, "percentile_index", None)
+    monkeypatch.setattr(percentile_module, "snapshot_writer", None)
+    agent = AssessmentAgent()
+
+    def analyze(overall_parts, session_id):
+        session = AssessmentSession(responses=[], scores=scores(overall_parts), industry="Tech", location="CA",
+                                    session_id=session_id)
+        return asyncio.run(agent.analyze(session))
+
+    assert analyze([10, 10, 10, 10, 10], "s1").cohort_percentiles is None
+    analyze([20, 20, 20, 15, 20], "s2")
+    analyze([20, 20, 20, 15, 20], "s2")  # a retry is not recorded again
+    analyze([1, 1, 1, 1, 1], None)  # nor is a session without an id
+    ranked = analyze([15, 15, 15, 10, 15], "s3").cohort_percentiles
+
+    assert ranked.cohort_size == 2
+    assert ranked.overall == 50.0
+    percentile_module.snapshot_writer.save()
+    assert PercentileIndex.load(str(tmp_path / "percentiles.npz")).recorded == 3
+
+
+def test_unreadable_snapshot_disables_the_index_instead_of_failing_analysis(tmp_path, monkeypatch):
+    path = tmp_path / "percentiles.npz"
+    path.write_bytes(b"not a snapshot")
+    monkeypatch.setenv("PERCENTILE_INDEX_PATH", str(path))
+    monkeypatch.setattr(percentile_module, "percentile_index", None)
+    monkeypatch.setattr(percentile_module, "snapshot_writer", None)
+    monkeypatch.setattr(percentile_module, "load_failed", False)
+    loads = []
+    original_load = PercentileIndex.load
+    monkeypatch.setattr(PercentileIndex, "load", classmethod(
+        lambda cls, *args, **kwargs: loads.append(args) or original_load.__func__(cls, *args, **kwargs)))
+
+    agent = AssessmentAgent()
+    for session_id in ("s1", "s2"):
+        session = AssessmentSession(responses=[], scores=scores([10, 10, 10, 10, 10]), industry="Tech",
+                                    location="CA", session_id=session_id)
+        assert asyncio.run(agent.analyze(session)).cohort_percentiles is None
+    assert len(loads) == 1
+    assert path.read_bytes() == b"not a snapshot"
+
+
+def collect_sections(stream):
+    async def run():
+        return {name: value async for name, value in stream}
+    return asyncio.run(run())
+
+
+def test_ranking_errors_leave_the_analysis_intact(monkeypatch):
+    from assessment_analysis_agent import agent as agent_module
+
+    def broken(*args):
+        raise RuntimeError("index corrupted")
+    monkeypatch.setattr(agent_module, "rank_and_record", broken)
+
+    session = AssessmentSession(responses=[], scores=scores([10, 12, 8, 9, 11]), industry="Tech", location="CA")
+    analysis = asyncio.run(AssessmentAgent().analyze(session))
+    assert analysis.key_insights and analysis.cohort_percentiles is None
+    sections = collect_sections(AssessmentAgent().stream_analysis(session))
+    assert "cohort_percentiles" not in sections
+
+
+def test_only_scored_categories_and_capped_slices_are_indexed():
+    index = PercentileIndex(min_cohort_size=1, categories=["personalBackground", "resources"], max_slices=3)
+    index.add({"personalBackground": 10, "resources": 5, "injected": 80}, "  Tech ", "CA")
+    index.add({"personalBackground": 10, "resources": 5}, "tech", "ca")
+    index.add({"personalBackground": 10, "resources": 5}, "Retail", "NY")
+
+    assert {key[0] for key in index._trees} == {"overall", "personalBackground", "resources"}
+    # The overall score is the sum of the indexed categories only
+    assert index.percentile("overall", 15) == 50.0
+    assert index.cohort_size("TECH", ANY) == 2
+    # (*, *), (tech, *) and (*, ca) fill the cap; the rest count only in wider slices
+    assert index.cohort_size("tech", "ca") == 0
+    assert index.cohort_size("retail", ANY) == 0
+    assert index.cohort_size() == 3
+
+
+def test_snapshot_writers_merge_and_count_each_session_once(tmp_path):
+    path = str(tmp_path / "percentiles.npz")
+    workers = [PercentileIndex(min_cohort_size=1) for _ in range(2)]
+    writers = [percentile_module.SnapshotWriter(index, path, every=1000) for index in workers]
+
+    writers[0].record(scores([10, 10, 10, 10, 10]), "Tech", "CA", "s1")
+    writers[1].record(scores([20, 10, 10, 10, 10]), "Tech", "CA", "s2")
+    writers[1].record(scores([10, 10, 10, 10, 10]), "Tech", "CA", "s1")  # retried on another worker
+    assert not writers[1].record(scores([20, 10, 10, 10, 10]), "Tech", "CA", "s2")
+    for writer in writers:
+        writer.save()
+
+    assert PercentileIndex.load(path).recorded == 2
+    # The last worker to save adopts the merged cohort
+    assert workers[1].cohort_size() == 2
+
+
+def test_snapshot_is_saved_off_the_calling_thread(tmp_path, monkeypatch):
+    path = str(tmp_path / "percentiles.npz")
+    saved_on = []
+    original_save = PercentileIndex.save
+    monkeypatch.setattr(PercentileIndex, "save",
+                        lambda self, target: saved_on.append(threading.current_thread()) or original_save(self, target))
+    writer = percentile_module.SnapshotWriter(PercentileIndex(min_cohort_size=1), path, every=2)
+
+    writer.record(scores([10, 10, 10, 10, 10]), "Tech", "CA", "s1")
+    writer.record(scores([12, 10, 10, 10, 10]), "Tech", "CA", "s2")
+    for thread in threading.enumerate():
+        if thread.name == "percentile-snapshot":
+            thread.join()
+
+    assert saved_on and threading.current_thread() not in saved_on
+    assert PercentileIndex.load(path).recorded == 2
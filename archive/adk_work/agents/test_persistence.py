@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Tests for write-behind persistence of results to Firestore
+Runs against a local fake Firestore client; the emulator test runs only when
+FIRESTORE_EMULATOR_HOST is set (gcloud emulators firestore start)
+"""
+
+import asyncio
+import json
+import sys
+import os
+import time
+import uuid
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime import persistence as persistence_module
+from runtime.persistence import ANALYSES_COLLECTION, MAX_BATCH_OPERATIONS, SCORES_COLLECTION, FirestoreWriter
+
+
+class FakeFirestore:
+    """Applies batched merge-sets to a dict; commit() fails while failures remain"""
+
+    def __init__(self, failures=0):
+        self.docs = {}
+        self.commits = []
+        self.failures = failures
+
+    def collection(self, name):
+        return FakeCollection(name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+
+    def document(self, document_id):
+        return (self.name, document_id)
+
+
+class FakeBatch:
+    def __init__(self, client):
+        self.client = client
+        self.operations = []
+
+    def set(self, ref, fields, merge=False):
+        assert merge
+        self.operations.append((ref, fields))
+
+    def commit(self):
+        if self.client.failures:
+            self.client.failures -= 1
+            raise ConnectionError("unavailable")
+        assert len(self.operations) <= MAX_BATCH_OPERATIONS
+        self.client.commits.append(len(self.operations))
+        for ref, fields in self.operations:
+            self.client.docs[ref] = {**self.client.docs.get(ref, {}), **fields}
+
+
+def make_writer(client, **kwargs):
+    writer = FirestoreWriter(client=client, sleep=lambda seconds: None, **kwargs)
+    writer._worker_pid = os.getpid()  # keep the background worker out of the test
+    return writer
+
+
+def test_writes_are_committed_in_batches_of_at_most_500():
+    client = FakeFirestore()
+    writer = make_writer(client)
+    for i in range(1200):
+        writer.write("scores", f"doc-{i}", {"i": i})
+
+    assert client.commits == []  # nothing leaves the process until a flush
+    assert writer.flush() == 1200
+    assert client.commits == [500, 500, 200]
+    assert client.docs[("scores", "doc-1199")] == {"i": 1199}
+
+
+def test_repeated_writes_to_a_document_merge_into_one_operation():
+    client = FakeFirestore()
+    writer = make_writer(client)
+    writer.write("analyses", "s1", {"a": 1, "b": 1})
+    writer.write("analyses", "s1", {"b": 2})
+
+    writer.flush()
+    assert client.commits == [1]
+    assert client.docs[("analyses", "s1")] == {"a": 1, "b": 2}
+    assert writer.stats()["merged"] == 1
+
+
+def test_failed_commits_are_retried_then_kept_for_the_next_flush():
+    client = FakeFirestore(failures=2)
+    writer = make_writer(client, max_retries=2)
+    writer.write("scores", "a", {"v": 1})
+    assert writer.flush() == 1
+    assert writer.stats()["retries"] == 2
+
+    client.failures = 3
+    writer.write("scores", "b", {"v": 1})
+    assert writer.flush() == 0
+    # A newer write that arrives before the next flush wins over the requeued one
+    writer.write("scores", "b", {"v": 2})
+    assert writer.flush() == 1
+    assert client.docs[("scores", "b")] == {"v": 2}
+    assert writer.stats()["failed_commits"] == 1
+
+
+def test_buffer_is_bounded_while_firestore_is_down():
+    client = FakeFirestore(failures=100)
+    writer = make_writer(client, max_retries=0, max_buffered=3)
+    for key in "abcde":
+        writer.write("scores", key, {"v": key})
+    writer.flush()
+
+    assert writer.stats()["dropped"] == 2
+    client.failures = 0
+    writer.flush()
+    assert sorted(doc_id for _, doc_id in client.docs) == ["c", "d", "e"]
+
+
+def test_full_batch_and_interval_trigger_the_background_flush():
+    client = FakeFirestore()
+    writer = FirestoreWriter(client=client, batch_size=10, flush_interval=60)
+    for i in range(10):
+        writer.write("scores", f"doc-{i}", {"i": i})
+
+    deadline = time.monotonic() + 5
+    while not client.commits and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.commits == [10]
+
+    writer.write("scores", "late", {"i": 10})
+    writer.close()  # shutdown flushes what the interval has not yet
+    assert client.commits == [10, 1]
+
+
+def test_scores_and_analyses_are_persisted_under_their_session(monkeypatch):
+    from open_ended_scoring_agent import cache as cache_module
+    from open_ended_scoring_agent.agent import BatchScoringRequest, OpenEndedScoringAgent, get_root_agent
+    from open_ended_scoring_agent.cache import ScoringCache
+    from assessment_analysis_agent.agent import AssessmentRequest, AssessmentAnalysis
+    from runtime.warmup import SAMPLE_ASSESSMENT
+
+    class StubModel:
+        async def generate_content_async(self, prompt):
+            yield json.dumps({"score": 4, "explanation": "Clear milestones"})
+
+    client = FakeFirestore()
+    monkeypatch.setattr(persistence_module, "writer", make_writer(client))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: StubModel()))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    batch = BatchScoringRequest(session_id="s1", user_id="u1", questions=[
+        {"question_id": "q3", "response": "Two years", "question_text": "Journey?"},
+        {"question_id": "q8", "response": "Bootstrapped", "question_text": "Funding?"},
+    ])
+    asyncio.run(get_root_agent().score_batch(batch))
+    # Without a session there is nothing to file a single score under
+    asyncio.run(get_root_agent().score(batch.questions[0].model_copy(update={"question_id": "q18"})))
+
+    analysis = AssessmentAnalysis(key_insights=["a"], recommendations=["b"], competitive_advantage="c",
+                                  growth_opportunity="d", comprehensive_analysis="e")
+    persistence_module.persist_assessment(AssessmentRequest.model_validate(SAMPLE_ASSESSMENT), analysis)
+    persistence_module.writer.flush()
+
+    # Kept apart from the web app's own openEndedScores, which it writes itself
+    assert SCORES_COLLECTION != "openEndedScores"
+    assert set(client.docs) == {(ANALYSES_COLLECTION, "warmup"), (SCORES_COLLECTION, "s1_q3"),
+                                (SCORES_COLLECTION, "s1_q8")}
+    score = client.docs[(SCORES_COLLECTION, "s1_q3")]
+    assert {key: score[key] for key in ("sessionId", "questionId", "userId", "aiScore", "aiExplanation")} == {
+        "sessionId": "s1", "questionId": "q3", "userId": "u1", "aiScore": 4, "aiExplanation": "Clear milestones"}
+    assert client.docs[(ANALYSES_COLLECTION, "warmup")]["analysis"]["key_insights"] == ["a"]
+
+
+def test_default_scores_are_not_persisted(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+    from open_ended_scoring_agent import cache as cache_module
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent, ScoringRequest, get_root_agent
+    from open_ended_scoring_agent.cache import ScoringCache
+    from runtime import jobs as jobs_module, warmup as warmup_module
+    from runtime.jobs import SqliteJobStore
+
+    class StubModel:
+        """Fails for one response, answers without a score for another, scores the rest"""
+
+        async def generate_content_async(self, prompt):
+            if "Quota" in prompt:
+                raise RuntimeError("429 quota exceeded")
+            yield "I cannot evaluate this." if "Unclear" in prompt else json.dumps({"score": 4, "explanation": "ok"})
+
+    client = FakeFirestore()
+    monkeypatch.setattr(persistence_module, "writer", make_writer(client))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: StubModel()))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    monkeypatch.setattr(jobs_module, "job_store", SqliteJobStore(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(jobs_module, "job_runner", None)
+
+    def request(question_id, response):
+        return ScoringRequest(session_id="s1", question_id=question_id, response=response, question_text="?")
+
+    assert asyncio.run(get_root_agent().score(request("q3", "Quota"))).score == 3
+    assert asyncio.run(get_root_agent().score(request("q8", "Unclear"))).score == 3
+    asyncio.run(get_root_agent().score(request("q18", "Scored")))
+    with TestClient(server.app) as test_client:
+        for question_id, response in (("q3", "Quota stream"), ("q8", "Unclear stream"), ("q23", "Scored stream")):
+            test_client.post("/score_open_ended/stream", json=request(question_id, response).model_dump())
+    persistence_module.writer.flush()
+
+    assert sorted(client.docs) == [(SCORES_COLLECTION, "s1_q18"), (SCORES_COLLECTION, "s1_q23")]
+
+
+def test_persistence_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("PERSIST_RESULTS", raising=False)
+    monkeypatch.setattr(persistence_module, "writer", None)
+    assert persistence_module.get_writer() is None
+
+
+@pytest.mark.skipif(not os.getenv("FIRESTORE_EMULATOR_HOST"), reason="Firestore emulator not running")
+def test_round_trip_through_the_emulator():
+    from google.cloud import firestore
+
+    client = firestore.Client(project=os.getenv("GOOGLE_CLOUD_PROJECT", "demo-gutcheck"))
+    collection = f"test-{uuid.uuid4().hex[:8]}"
+    writer = FirestoreWriter(client=client)
+    writer._worker_pid = os.getpid()
+    for i in range(MAX_BATCH_OPERATIONS + 5):
+        writer.write(collection, f"doc-{i}", {"i": i})
+
+    assert writer.flush() == MAX_BATCH_OPERATIONS + 5
+    assert writer.stats()["commits"] == 2
+    assert client.collection(collection).document("doc-504").get().to_dict() == {"i": 504}
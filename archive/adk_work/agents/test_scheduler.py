@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests for priority and fair-share scheduling of model calls
+Runs offline against fake backends
+"""
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime.model_client import ModelClient, ModelEndpoint
+from runtime.scheduler import (
+    BACKFILL, BATCH, INTERACTIVE, FairScheduler, current_work_class, request_work_class, work_class
+)
+
+
+async def queue_behind(scheduler, calls, started):
+    """Start each (priority, tenant) call in order behind a held slot; return the order they ran in."""
+    order = []
+
+    async def call(priority, tenant):
+        async with scheduler.slot(priority, tenant):
+            order.append((priority, tenant))
+            await asyncio.sleep(0)
+
+    tasks = []
+    for priority, tenant in calls:
+        tasks.append(asyncio.create_task(call(priority, tenant)))
+        await asyncio.sleep(0)
+    started.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_free_slots_go_to_the_highest_class_first():
+    async def run():
+        scheduler = FairScheduler(1)
+        held = await scheduler.acquire(BACKFILL)
+        return await queue_behind(scheduler, [(BACKFILL, "a"), (BATCH, "a"), (INTERACTIVE, "a")], held)
+
+    assert [priority for priority, _ in asyncio.run(run())] == [INTERACTIVE, BATCH, BACKFILL]
+
+
+def test_class_caps_keep_slots_free_for_interactive_calls():
+    async def run():
+        scheduler = FairScheduler(4, class_limits={BATCH: 2})
+        batch = [await scheduler.acquire(BATCH) for _ in range(2)]
+        waiting = asyncio.create_task(scheduler.acquire(BATCH))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert scheduler.stats()["classes"][BATCH]["queued"] == 1
+
+        interactive = await asyncio.wait_for(scheduler.acquire(INTERACTIVE), 1)
+        batch[0].release()
+        (await asyncio.wait_for(waiting, 1)).release()
+        for grant in (batch[1], interactive):
+            grant.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 0
+    assert stats["classes"][BATCH]["granted"] == 3
+    assert stats["classes"][INTERACTIVE]["granted"] == 1
+
+
+def test_tenants_share_a_class_by_weight():
+    async def run(weights):
+        scheduler = FairScheduler(1, tenant_weights=weights)
+        held = await scheduler.acquire(BATCH, "warmup")
+        # A large upload queues up first; a second tenant's work arrives behind it
+        calls = [(BATCH, "upload")] * 6 + [(BATCH, "pilot")] * 3
+        return "".join(tenant[0] for _, tenant in await queue_behind(scheduler, calls, held))
+
+    assert asyncio.run(run({"upload": 1, "pilot": 1})) == "upupupuuu"
+    assert asyncio.run(run({"upload": 1, "pilot": 2})) == "puppuuuuu"
+
+
+def test_unknown_tenants_share_the_default_tenant():
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={"pilot": 1})
+        held = await scheduler.acquire(BATCH, "warmup")
+        # Minting a fresh tenant name per call does not buy a share of its own
+        calls = [(BATCH, f"upload-{i}") for i in range(4)] + [(BATCH, "pilot")] * 2
+        order = await queue_behind(scheduler, calls, held)
+        return [tenant for _, tenant in order], scheduler.stats()["classes"][BATCH]["tenants"]
+
+    order, granted = asyncio.run(run())
+    assert order == ["pilot", "upload-0", "pilot", "upload-1", "upload-2", "upload-3"]
+    assert granted == {"default": 5, "pilot": 2}
+
+
+def test_cancelled_waiters_do_not_leak_slots():
+    async def run():
+        scheduler = FairScheduler(1)
+        held = await scheduler.acquire(BATCH)
+        waiting = asyncio.create_task(scheduler.acquire(BATCH))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        held.release()
+        (await asyncio.wait_for(scheduler.acquire(INTERACTIVE), 1)).release()
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 0
+    assert stats["classes"][BATCH]["queued"] == 0
+
+
+def test_interactive_waits_stay_flat_during_a_bulk_run():
+    class SlowBackend:
+        async def generate_content_async(self, prompt):
+            await asyncio.sleep(0.02)
+            yield '{"score": 3, "explanation": "ok"}'
+
+    async def call(client):
+        async for _ in client.generate_content_async("prompt"):
+            pass
+
+    async def run():
+        scheduler = FairScheduler(4, class_limits={BATCH: 3}, tenant_weights={"funder-upload": 1})
+        client = ModelClient([ModelEndpoint("key-0", SlowBackend(), 100_000, 100_000_000)], scheduler=scheduler)
+
+        async def bulk():
+            with work_class(BATCH, "funder-upload"):
+                await asyncio.gather(*(call(client) for _ in range(60)))
+
+        async def interactive():
+            for _ in range(10):
+                await call(client)
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(bulk(), interactive())
+        return scheduler.stats()["classes"]
+
+    classes = asyncio.run(run())
+    assert classes[BATCH]["granted"] == 60 and classes[BATCH]["tenants"] == {"funder-upload": 60}
+    assert classes[INTERACTIVE]["granted"] == 10
+    # Bulk calls queue for their capped share; interactive calls always find the reserved slot
+    assert classes[BATCH]["wait_p95_ms"] > 100
+    assert classes[INTERACTIVE]["wait_p95_ms"] < 10
+
+
+def test_work_class_comes_from_context_and_headers():
+    assert current_work_class() == (INTERACTIVE, "default")
+    with request_work_class({"X-Priority": "Backfill", "X-Tenant": "pilot-7"}):
+        assert current_work_class() == (BACKFILL, "pilot-7")
+    with request_work_class({"X-Priority": "urgent"}):
+        assert current_work_class() == (INTERACTIVE, "default")
+    with pytest.raises(ValueError):
+        with work_class("urgent"):
+            pass
+
+
+def test_jobs_run_as_their_scheduling_class(tmp_path):
+    from runtime.jobs import JobRunner, JobSubmission, SqliteJobStore
+
+    seen = []
+
+    async def handler(payload):
+        seen.append(current_work_class())
+        return {}
+
+    store = SqliteJobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(store, handlers={"open_ended": handler})
+    store.enqueue(JobSubmission(kind="open_ended", payload={}))
+    job_id = store.enqueue(JobSubmission(kind="open_ended", payload={}, priority=BACKFILL, tenant="pilot-7")).job_id
+
+    async def drain():
+        while await runner.run_once() is not None:
+            pass
+    asyncio.run(drain())
+
+    assert seen == [(BATCH, "default"), (BACKFILL, "pilot-7")]
+    assert store.get(job_id).tenant == "pilot-7"
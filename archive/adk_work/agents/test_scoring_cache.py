@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Tests for the open-ended scoring result cache
+Runs offline against a stubbed model
+"""
+
+import asyncio
+import json
+import multiprocessing
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from open_ended_scoring_agent import cache as cache_module
+from open_ended_scoring_agent.agent import OpenEndedScoringAgent, ScoringRequest
+from open_ended_scoring_agent.cache import ScoringCache, make_cache_key, make_shared_tier
+from open_ended_scoring_agent.streaming import RECOVERED
+from runtime import shared_cache as shared_cache_module
+from runtime.shared_cache import SharedCache
+
+
+class CountingModel:
+    """Stub model that returns a fixed score and counts calls"""
+
+    def __init__(self, response_text):
+        self.response_text = response_text
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        self.calls += 1
+        yield self.response_text
+
+
+def test_lru_eviction_and_counters():
+    cache = ScoringCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_ttl_expiry():
+    cache = ScoringCache(max_entries=10, ttl_seconds=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_key_covers_every_part():
+    base = make_cache_key("finalVision", "prompt", "gemini-2.0-flash", "v1")
+    assert base == make_cache_key("finalVision", "prompt", "gemini-2.0-flash", "v1")
+    assert base != make_cache_key("finalVision", "prompt", "gemini-2.0-flash", "v2")
+    assert base != make_cache_key("finalVision", "prompt", "gemini-1.5-pro", "v1")
+    assert make_cache_key("ab", "c", "m", "v") != make_cache_key("a", "bc", "m", "v")
+
+
+def test_identical_prompt_skips_model_call(monkeypatch):
+    model = CountingModel(json.dumps({"score": 4, "explanation": "Clear milestones"}))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    agent = OpenEndedScoringAgent()
+    request = ScoringRequest(question_id="q3", response="Three years in", question_text="Journey?")
+
+    first = asyncio.run(agent._score_question(request))
+    second = asyncio.run(agent._score_question(request))
+
+    assert first == second
+    assert model.calls == 1
+    assert cache_module.scoring_cache.stats()["hits"] == 1
+
+
+def test_default_score_is_not_cached(monkeypatch):
+    model = CountingModel("no structured output here")
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    agent = OpenEndedScoringAgent()
+    request = ScoringRequest(question_id="q8", response="Something", question_text="Challenge?")
+
+    asyncio.run(agent._score_question(request))
+    asyncio.run(agent._score_question(request))
+
+    assert model.calls == 2
+
+
+def test_cache_hit_reports_the_cached_outcome(tmp_path, monkeypatch):
+    # Stream cut off mid-explanation: the score is kept but flagged as recovered
+    model = CountingModel('{"score": 4, "explanation": "Clear mile')
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    path = str(tmp_path / "scores.sqlite3")
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(shared=make_shared_tier(path)))
+
+    agent = OpenEndedScoringAgent()
+    request = ScoringRequest(question_id="q3", response="Three years in", question_text="Journey?")
+
+    first = asyncio.run(agent._score_with_outcome(request))
+    local_hit = asyncio.run(agent._score_with_outcome(request))
+    # A worker with a cold local tier reads the entry back from the shared tier
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(shared=make_shared_tier(path)))
+    shared_hit = asyncio.run(agent._score_with_outcome(request))
+
+    assert model.calls == 1
+    assert first == local_hit == shared_hit
+    assert first[1] == RECOVERED
+
+
+def _score_in_child(path, response):
+    # Runs in a separate process: a worker whose cache starts cold
+    cache = ScoringCache(max_entries=8, ttl_seconds=60, shared=make_shared_tier(path, ttl_seconds=60))
+    model = CountingModel(json.dumps({"score": 5, "explanation": "Computed in another worker"}))
+    OpenEndedScoringAgent.model_client = property(lambda self: model)
+    cache_module.scoring_cache = cache
+    request = ScoringRequest(question_id="q23", response=response, question_text="Vision?")
+    asyncio.run(OpenEndedScoringAgent()._score_question(request))
+
+
+def test_shared_tier_serves_scores_from_another_process(tmp_path, monkeypatch):
+    path = str(tmp_path / "scores.sqlite3")
+    child = multiprocessing.get_context("fork").Process(target=_score_in_child, args=(path, "Regional expansion"))
+    child.start()
+    child.join(timeout=30)
+    assert child.exitcode == 0
+
+    model = CountingModel(json.dumps({"score": 1, "explanation": "Should not be called"}))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    cache = ScoringCache(max_entries=8, ttl_seconds=60, shared=make_shared_tier(path, ttl_seconds=60))
+    monkeypatch.setattr(cache_module, "scoring_cache", cache)
+    request = ScoringRequest(question_id="q23", response="Regional expansion", question_text="Vision?")
+
+    first = asyncio.run(OpenEndedScoringAgent()._score_question(request))
+    second = asyncio.run(OpenEndedScoringAgent()._score_question(request))
+
+    assert (first.score, first.explanation) == (5, "Computed in another worker")
+    assert second == first
+    assert model.calls == 0
+    # The shared hit is copied into the local tier, so the second lookup stays in process
+    assert cache.stats()["shared_hits"] == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_shared_cache_ttl_and_pruning(tmp_path, monkeypatch):
+    now = [1000.0]
+    path = str(tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(shared_cache_module, "PRUNE_EVERY", 1)
+    writer = SharedCache(path, ttl_seconds=10, max_entries=2, clock=lambda: now[0])
+    reader = SharedCache(path, ttl_seconds=10, max_entries=2, clock=lambda: now[0])
+
+    writer.set("a", "1")
+    now[0] += 1
+    writer.set("b", "2")
+    now[0] += 1
+    writer.set("c", "3")  # over max_entries: "a" expires soonest and is pruned
+
+    assert reader.get("a") is None
+    assert reader.get("c") == "3"
+    now[0] += 20
+    assert reader.get("c") is None
+    assert reader.stats()["hits"] == 1
+    assert reader.stats()["misses"] == 2
+
+
+def test_unusable_shared_cache_is_a_miss(tmp_path):
+    path = tmp_path / "not_a_database.sqlite3"
+    path.write_bytes(b"definitely not sqlite" * 100)
+    cache = ScoringCache(max_entries=8, ttl_seconds=60, shared=SharedCache(str(path)))
+
+    cache.set("a", 1)
+    assert cache.get("a") == 1  # served from the local tier
+    assert cache.get("b") is None
+    assert cache.shared.stats()["errors"] >= 2
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the deterministic multiple-choice scoring engine
+"""
+
+import json
+import random
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from assessment_analysis_agent.agent import AssessmentResponse
+from assessment_analysis_agent.scoring_engine import (
+    CATEGORIES, QUESTION_IDS, QUESTION_OPTIONS, QUESTION_TYPES,
+    raw_question_score, score_responses, score_sessions
+)
+
+
+def random_session(rng):
+    responses = []
+    for question_id in QUESTION_IDS:
+        if rng.random() < 0.1:
+            continue
+        question_type = QUESTION_TYPES[question_id]
+        if question_type == 'multipleChoice':
+            answer = rng.choice(QUESTION_OPTIONS[question_id])
+        elif question_type == 'multiSelect':
+            answer = rng.sample(QUESTION_OPTIONS[question_id], rng.randint(1, 5))
+        elif question_type == 'likert':
+            answer = rng.randint(1, 5)
+        else:
+            answer = "Some free text"
+        responses.append(AssessmentResponse(questionId=question_id, response=answer))
+    return responses
+
+
+def test_raw_scores_match_typescript_rules():
+    assert raw_question_score('q1', 'Established and generating consistent revenue') == 5
+    assert raw_question_score('q1', 'Not an option') == 0
+    # 3 of 5 selected -> Math.round(3.0) ; 1 of 5 -> Math.round(1.0)
+    assert raw_question_score('q9', ['Business registration', 'EIN or tax ID obtained', 'First paying customer']) == 3
+    assert raw_question_score('q10', 9) == 5
+    assert raw_question_score('q19', 1) == 5
+    assert raw_question_score('q3', 'Free text') is None
+    assert raw_question_score('q3', 'Free text', open_ended_score=4) == 4
+
+
+def test_score_sample_session():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_agent_with_scores.json")
+    with open(path) as f:
+        data = json.load(f)
+    responses = [AssessmentResponse(**r) for r in data["responses"]]
+
+    result = score_responses(responses)
+
+    assert result.question_scores == {'q1': 4, 'q2': 4}
+    # (4/5)*(20/5) + (4/5)*(20/5) = 6.4 -> 6
+    assert result.category_scores['personalBackground'] == 6
+    assert result.overall_score == sum(result.category_scores.values())
+
+
+def test_open_ended_scores_are_supplied_by_caller():
+    responses = [AssessmentResponse(questionId='q23', response='Regional expansion')]
+    assert score_responses(responses).unscored_questions == ['q23']
+
+    result = score_responses(responses, open_ended_scores={'q23': 5})
+    assert result.unscored_questions == []
+    # (5/5)*(20/5) = 4
+    assert result.category_scores['growthVision'] == 4
+
+
+def test_vectorized_path_matches_scalar_path():
+    rng = random.Random(7)
+    sessions = [random_session(rng) for _ in range(500)]
+    open_ended = [{'q3': rng.randint(1, 5), 'q18': rng.randint(1, 5)} for _ in sessions]
+
+    cohort = score_sessions(sessions, open_ended)
+
+    assert cohort.category_scores.shape == (500, len(CATEGORIES))
+    for i, responses in enumerate(sessions):
+        expected = score_responses(responses, open_ended[i])
+        actual = cohort.session(i)
+        assert actual.category_scores == expected.category_scores
+        assert actual.overall_score == expected.overall_score
+        assert actual.question_scores == expected.question_scores
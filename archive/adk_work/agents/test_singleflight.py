@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for in-flight request coalescing
+"""
+
+import asyncio
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime.singleflight import SingleFlight, request_fingerprint
+
+
+def test_fingerprint_ignores_key_order():
+    assert request_fingerprint({"a": 1, "b": [1, 2]}) == request_fingerprint({"b": [1, 2], "a": 1})
+    assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+
+def test_identical_calls_share_one_computation():
+    coalesced = []
+    flight = SingleFlight("test", on_coalesced=coalesced.append)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("same", compute) for _ in range(5)))
+
+    results = asyncio.run(main())
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    assert coalesced == ["test"] * 4
+    assert flight.stats() == {"name": "test", "calls": 5, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_caller_and_clear_the_key():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("model unavailable")
+
+    async def main():
+        return await asyncio.gather(
+            flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def succeed():
+        return "ok"
+
+    # A later call for the same key starts a fresh computation
+    assert asyncio.run(flight.do("key", succeed)) == "ok"
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    flight = SingleFlight("test")
+
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
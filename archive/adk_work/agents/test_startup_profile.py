@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for lazy agent construction and the cold-start profiler
+"""
+
+import json
+import subprocess
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime import startup_profile
+from runtime.startup_profile import parse_importtime, profile_stage, startup_stages
+
+AGENTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_ENTRY_POINT = """
+import json, sys, {module}
+agents = {{name: sys.modules[name]._root_agent if name in sys.modules else "not imported"
+          for name in ("assessment_analysis_agent.agent", "open_ended_scoring_agent.agent")}}
+print(json.dumps({{"agents": {{k: v if isinstance(v, str) else repr(v) for k, v in agents.items()}},
+                  "entry_point": repr(getattr({module}, "agent", None))}}))
+"""
+
+
+def import_in_fresh_interpreter(module):
+    env = {k: v for k, v in os.environ.items() if k not in ("FUNCTION_TARGET", "STARTUP_PROFILE")}
+    completed = subprocess.run([sys.executable, "-c", IMPORT_ENTRY_POINT.format(module=module)],
+                               capture_output=True, text=True, cwd=AGENTS_DIR, env=env, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["main", "server", "open_ended_scoring_agent_main"])
+def test_importing_an_entry_point_builds_no_agent(module):
+    state = import_in_fresh_interpreter(module)
+
+    assert state["entry_point"] == "None"
+    assert all(value in ("None", "not imported") for value in state["agents"].values())
+    if module == "main":
+        # The functions entry point does not even import the agents until a handler needs one
+        assert set(state["agents"].values()) == {"not imported"}
+
+
+def test_building_the_assessment_agent_does_not_load_numpy():
+    env = {k: v for k, v in os.environ.items() if k not in ("FUNCTION_TARGET", "PERCENTILE_INDEX_PATH")}
+    script = "import sys, main; main.get_assessment_agent(); print('numpy' in sys.modules)"
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=AGENTS_DIR,
+                               env=env, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip().splitlines()[-1] == "False"
+
+
+def test_root_agent_is_built_once_on_first_access(monkeypatch):
+    from open_ended_scoring_agent import agent as agent_module
+
+    monkeypatch.setattr(agent_module, "_root_agent", None)
+    first = agent_module.root_agent
+    assert agent_module.get_root_agent() is first
+    with pytest.raises(AttributeError):
+        agent_module.no_such_attribute
+
+
+def test_profile_stage_records_only_when_enabled(monkeypatch):
+    monkeypatch.setattr(startup_profile, "_stages", [])
+    monkeypatch.delenv("STARTUP_PROFILE", raising=False)
+    with profile_stage("import nothing"):
+        pass
+    assert startup_stages() == []
+
+    monkeypatch.setenv("STARTUP_PROFILE", "1")
+    with pytest.raises(RuntimeError):
+        with profile_stage("construct failing agent"):
+            raise RuntimeError("bad credentials")
+    with profile_stage("import something"):
+        pass
+    assert [stage["stage"] for stage in startup_stages()] == ["construct failing agent", "import something"]
+    assert all(stage["elapsed_ms"] >= 0 for stage in startup_stages())
+
+
+def test_entry_point_getters_record_their_stages(monkeypatch):
+    import main
+    from open_ended_scoring_agent import agent as agent_module
+
+    monkeypatch.setattr(startup_profile, "_stages", [])
+    monkeypatch.setenv("STARTUP_PROFILE", "1")
+    monkeypatch.setattr(main, "open_ended_agent", None)
+    monkeypatch.setattr(agent_module, "_root_agent", None)
+
+    built = main.get_open_ended_agent()
+    assert main.get_open_ended_agent() is built
+    assert [stage["stage"] for stage in startup_stages()] == [
+        "import open_ended_scoring_agent", "construct OpenEndedScoringAgent"
+    ]
+
+
+def test_importtime_is_attributed_to_packages():
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       150 |        150 |   fastapi",
+        "import time:      2000 |       2500 |     google.cloud.monitoring_v3.types",
+        "import time:       500 |        500 |   google.adk",
+        "import time:      1000 |       1000 | fastapi.routing",
+    ])
+    assert parse_importtime(output) == {"fastapi": 1.15, "google.cloud.monitoring_v3": 2.0, "google.adk": 0.5}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed open-ended scoring and sectioned assessment analysis
+Runs offline against a stubbed model
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from assessment_analysis_agent.agent import AssessmentAgent, AssessmentSession
+from open_ended_scoring_agent import cache as cache_module
+from open_ended_scoring_agent.agent import OpenEndedScoringAgent, ScoringRequest
+from open_ended_scoring_agent.cache import ScoringCache
+from open_ended_scoring_agent.streaming import CLEAN, DEFAULTED, RECOVERED, ScoreStreamParser, parse_outcomes
+
+
+class ChunkedModel:
+    """Stub model that streams a fixed response a few characters at a time"""
+
+    def __init__(self, response_text, chunk_size=5):
+        self.response_text = response_text
+        self.chunk_size = chunk_size
+        self.sent = 0
+        self.closed = False
+
+    async def generate_content_async(self, prompt):
+        try:
+            for i in range(0, len(self.response_text), self.chunk_size):
+                self.sent += 1
+                yield self.response_text[i:i + self.chunk_size]
+        finally:
+            self.closed = True
+
+
+def collect(agen):
+    async def run():
+        return [event async for event in agen]
+    return asyncio.run(run())
+
+
+def test_parser_handles_escapes_split_across_chunks():
+    text = json.dumps({"score": 5, "explanation": 'Said "go" é\nthen\\done'})
+    parser = ScoreStreamParser()
+    events = []
+    for char in text:
+        events.extend(parser.feed(char))
+
+    assert events[0] == ("score", 5)
+    assert "".join(data for event, data in events if event == "explanation") == 'Said "go" é\nthen\\done'
+    assert parser.explanation_complete
+
+
+def test_long_explanation_is_not_truncated(monkeypatch):
+    explanation = "Clear milestones and evidence of execution. " * 20
+    model = ChunkedModel(json.dumps({"score": 4, "explanation": explanation}))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+    agent = OpenEndedScoringAgent()
+    request = ScoringRequest(question_id="q3", response="Three years in", question_text="Journey?")
+    events = collect(agent.stream_score(request))
+
+    # The score is sent before any explanation text
+    assert events[0] == ("score", 4)
+    assert "".join(data for event, data in events if event == "explanation") == explanation
+    assert events[-1][0] == "result"
+    assert events[-1][1].explanation == explanation
+    assert asyncio.run(agent._score_question(request)).explanation == explanation
+
+
+def score_with(monkeypatch, response_text, chunk_size=5):
+    model = ChunkedModel(response_text, chunk_size)
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+    request = ScoringRequest(question_id="q8", response="Lost our biggest client", question_text="Challenge?")
+    return model, asyncio.run(OpenEndedScoringAgent().score(request))
+
+
+def test_stops_reading_once_score_and_explanation_are_complete(monkeypatch):
+    trailing = "\n```\nLet me know if you would like a more detailed breakdown of this evaluation. " * 10
+    text = '```json\n{"score": 4, "explanation": "Named the problem and fixed it"}' + trailing
+    before = parse_outcomes.stats()[CLEAN]
+
+    model, result = score_with(monkeypatch, text)
+
+    assert (result.score, result.explanation) == (4, "Named the problem and fixed it")
+    assert model.closed
+    assert model.sent == len('```json\n{"score": 4, "explanation": "Named the problem and fixed it"') // 5 + 1
+    assert parse_outcomes.stats()[CLEAN] == before + 1
+
+
+def test_explanation_before_score_and_quoted_score(monkeypatch):
+    _, result = score_with(monkeypatch, '{"explanation": "Reactive, but \\"owned\\" it", "score": "2"}')
+    assert (result.score, result.explanation) == (2, 'Reactive, but "owned" it')
+
+
+def test_score_mentioned_before_the_object_is_ignored(monkeypatch):
+    before = parse_outcomes.stats()[CLEAN]
+    text = ('A "score": 5 would need evidence of execution, which is missing here.\n'
+            '```json\n{"score": 2, "explanation": "Plans only"}\n```')
+    _, result = score_with(monkeypatch, text)
+
+    assert (result.score, result.explanation) == (2, "Plans only")
+    assert parse_outcomes.stats()[CLEAN] == before + 1
+
+
+def test_score_outside_any_object_is_recovered(monkeypatch):
+    before = parse_outcomes.stats()[RECOVERED]
+    _, result = score_with(monkeypatch, 'Rating: "score": 4 because the milestones are concrete.')
+
+    assert result.score == 4
+    assert parse_outcomes.stats()[RECOVERED] == before + 1
+
+
+def test_truncated_response_keeps_partial_explanation(monkeypatch):
+    before = parse_outcomes.stats()[RECOVERED]
+    _, result = score_with(monkeypatch, '{"score": 3, "explanation": "Clear problem, \\"some\\" execution but the')
+
+    assert result.score == 3
+    assert result.explanation == 'Clear problem, "some" execution but the'
+    assert parse_outcomes.stats()[RECOVERED] == before + 1
+
+
+def test_response_without_score_is_defaulted_and_not_cached(monkeypatch):
+    before = parse_outcomes.stats()[DEFAULTED]
+    _, result = score_with(monkeypatch, "I would rate this response fairly well overall.")
+
+    assert result.score == 3
+    assert parse_outcomes.stats()[DEFAULTED] == before + 1
+    assert cache_module.scoring_cache.stats()["size"] == 0
+
+
+def test_out_of_range_score_is_never_streamed(monkeypatch):
+    model = ChunkedModel(json.dumps({"score": 7, "explanation": "Exceptional on every axis"}))
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: model))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+    before = parse_outcomes.stats()[DEFAULTED]
+
+    request = ScoringRequest(question_id="q23", response="World domination", question_text="Vision?")
+    events = collect(OpenEndedScoringAgent().stream_score(request))
+
+    # The client never sees a score that the final result then contradicts
+    assert "score" not in [event for event, _ in events]
+    assert ("outcome", DEFAULTED) in events
+    assert events[-1][1].score == 3
+    assert parse_outcomes.stats()[DEFAULTED] == before + 1
+
+
+class CountingAdmission:
+    def __init__(self):
+        self.releases = 0
+
+    def release(self):
+        self.releases += 1
+
+
+def send_stream(response, fail_on=None):
+    """Drive an ASGI response; send raises on the message type in fail_on, like a dropped client"""
+    sent = []
+
+    async def receive():
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == fail_on:
+            raise OSError("client disconnected")
+        sent.append(message)
+
+    async def run():
+        from starlette.requests import ClientDisconnect
+        try:
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+        except (OSError, ClientDisconnect):
+            pass
+    asyncio.run(run())
+    return sent
+
+
+def test_stream_releases_its_slot_even_if_the_body_never_starts():
+    from monitoring.tracing import trace
+    from server import _event_stream
+
+    async def events():
+        yield "score", {"score": 4}
+
+    for fail_on in (None, "http.response.start"):
+        admission = CountingAdmission()
+        with trace("/score_open_ended/stream") as current:
+            response = _event_stream(events(), "ndjson", admission)
+        sent = send_stream(response, fail_on)
+
+        assert admission.releases == 1
+        assert current.duration is not None
+        if fail_on is None:
+            assert b'"score": 4' in b"".join(message.get("body", b"") for message in sent)
+
+
+def test_stream_analysis_matches_full_analysis():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_agent_with_scores.json")
+    with open(path) as f:
+        session = AssessmentSession(**json.load(f))
+    agent = AssessmentAgent()
+
+    sections = collect(agent.stream_analysis(session))
+    full = asyncio.run(agent._analyze_assessment(session))
+
+    # cohort_percentiles is only streamed when the percentile index is enabled
+    assert [name for name, _ in sections] == list(full.model_dump(exclude_none=True))
+    assert dict(sections) == full.model_dump(exclude_none=True)
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Tests for request tracing and per-stage spans
+Runs offline against a stubbed model
+"""
+
+import asyncio
+import json
+import logging
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from monitoring import tracing as tracing_module
+from monitoring.tracing import MAX_SPANS_PER_TRACE, TraceStore, current_trace, span, trace, trace_id_from_headers
+
+
+class StubModel:
+    async def generate_content_async(self, prompt):
+        yield '{"score": 4, '
+        yield '"explanation": "Clear milestones"}'
+
+
+@pytest.fixture
+def exported(monkeypatch):
+    """Fresh trace store; returns the list of traces it exported."""
+    traces = []
+    monkeypatch.setattr(tracing_module, "trace_store", TraceStore(capacity=3, export=traces.append))
+    return traces
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    from open_ended_scoring_agent import cache as cache_module
+    from open_ended_scoring_agent.agent import OpenEndedScoringAgent
+    from open_ended_scoring_agent.cache import ScoringCache
+
+    monkeypatch.setattr(OpenEndedScoringAgent, "model_client", property(lambda self: StubModel()))
+    monkeypatch.setattr(cache_module, "scoring_cache", ScoringCache(max_entries=8, ttl_seconds=60))
+
+
+def span_names(trace_data):
+    return [record["name"] for record in trace_data.spans]
+
+
+def test_spans_are_recorded_only_inside_a_trace(exported):
+    with span("orphan"):
+        pass
+    assert current_trace() is None
+
+    with trace("endpoint", "abc") as current:
+        with span("parse_validate"):
+            pass
+        with pytest.raises(ValueError):
+            with span("model_call", question_id="q3"):
+                raise ValueError("quota exceeded")
+        # A nested entry point joins the outer trace instead of starting its own
+        with trace("agent.run") as nested:
+            assert nested is current
+
+    assert exported == [current]
+    assert span_names(current) == ["parse_validate", "model_call"]
+    assert current.spans[1]["attributes"] == {"question_id": "q3"}
+    assert current.spans[1]["error"] == "quota exceeded"
+    assert current.to_dict()["duration_ms"] >= current.spans[1]["start_ms"]
+
+
+def test_failed_requests_still_finish_their_trace(exported):
+    with pytest.raises(RuntimeError):
+        with trace("endpoint"):
+            raise RuntimeError("agent crashed")
+    assert exported[0].error == "agent crashed"
+    assert current_trace() is None
+
+
+def test_storage_is_bounded(exported):
+    for i in range(5):
+        with trace("endpoint", f"t{i}"):
+            for _ in range(MAX_SPANS_PER_TRACE + 10):
+                with span("stage"):
+                    pass
+
+    store = tracing_module.trace_store
+    assert [data["trace_id"] for data in store.recent()] == ["t4", "t3", "t2"]
+    assert store.get("t0") is None
+    assert len(store.get("t4")["spans"]) == MAX_SPANS_PER_TRACE
+    assert store.get("t4")["dropped_spans"] == 10
+    assert len(exported) == 5
+
+
+def test_trace_reaches_the_shared_loop_and_concurrent_tasks(exported):
+    from runtime.event_loop import run_sync
+
+    async def question(question_id):
+        with span("score_question", question_id=question_id):
+            await asyncio.sleep(0)
+
+    async def batch():
+        await asyncio.gather(question("q3"), question("q8"))
+
+    with trace("endpoint") as current:
+        run_sync(batch())
+
+    assert sorted(record["attributes"]["question_id"] for record in current.spans) == ["q3", "q8"]
+
+
+def test_scoring_records_every_stage(exported, stub_model):
+    from open_ended_scoring_agent.agent import BatchScoringRequest, get_root_agent
+
+    batch = BatchScoringRequest(questions=[
+        {"question_id": "q3", "response": "Two years", "question_text": "Journey?"},
+        {"question_id": "q8", "response": "Bootstrapped", "question_text": "Funding?"},
+    ])
+    with trace("batch") as current:
+        asyncio.run(get_root_agent().score_batch(batch))
+
+    stages = current.stage_totals()
+    assert set(stages) == {"score_question", "prompt_render", "cache_lookup", "model_call", "response_parse"}
+    parses = [record for record in current.spans if record["name"] == "response_parse"]
+    assert sorted(record["attributes"]["question_id"] for record in parses) == ["q3", "q8"]
+    assert all(record["attributes"]["outcome"] == "clean" for record in parses)
+
+
+def test_agent_run_is_traced_end_to_end(exported, stub_model):
+    from open_ended_scoring_agent.agent import get_root_agent
+
+    body = json.dumps({"question_id": "q3", "response": "Two years", "question_text": "Journey?"})
+    assert json.loads(asyncio.run(get_root_agent().run(body)))["score"] == 4
+
+    assert exported[0].endpoint == "open_ended_scoring_agent.run"
+    names = span_names(exported[0])
+    assert names[0] == "parse_validate" and names[-1] == "serialize"
+    assert "model_call" in names
+
+
+def test_functions_handler_traces_with_the_platform_trace_id(exported, stub_model, monkeypatch):
+    from flask import Flask, request
+    import main
+
+    monkeypatch.setattr(main, "open_ended_agent", None)
+    app = Flask("tracing")
+    body = {"question_id": "q3", "response": "Three years", "question_text": "Journey?"}
+    with app.test_request_context("/", method="POST", json=body,
+                                  headers={"X-Cloud-Trace-Context": "105445aa7843bc8bf206b12000100000/1;o=1"}):
+        _, status, _ = main.process_open_ended_scoring_http(request)
+
+    assert status == 200
+    assert exported[0].trace_id == "105445aa7843bc8bf206b12000100000"
+    names = span_names(exported[0])
+    assert names[0] == "parse_validate" and names[-1] == "serialize"
+    assert {"prompt_render", "model_call", "response_parse"} <= set(names)
+
+
+def test_streamed_responses_are_traced_until_the_stream_ends(exported, stub_model, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+    from runtime import warmup as warmup_module
+
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    with TestClient(server.app) as client:
+        response = client.post("/score_open_ended/stream",
+                               json={"question_id": "q3", "response": "Four years", "question_text": "Journey?"})
+        assert response.status_code == 200
+        trace_id = response.headers["X-Trace-Id"]
+
+        found = client.get(f"/metrics/traces/{trace_id}").json()
+        assert found["endpoint"] == "/score_open_ended/stream"
+        assert {"model_call", "response_parse"} <= {record["name"] for record in found["spans"]}
+        assert client.get("/metrics/traces").json()["traces"][0]["trace_id"] == trace_id
+        assert client.get("/metrics/traces/unknown").status_code == 404
+
+
+def test_server_traces_are_labelled_by_route_template(exported, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+    from runtime import jobs as jobs_module, warmup as warmup_module
+    from runtime.jobs import SqliteJobStore
+
+    monkeypatch.setenv("WARMUP_ON_START", "false")
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    monkeypatch.setattr(jobs_module, "job_store", SqliteJobStore(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(jobs_module, "job_runner", None)
+    with TestClient(server.app) as client:
+        for path in ("/jobs/first", "/jobs/second", "/no-such-page", "/wp-login.php"):
+            client.get(path)
+
+    assert [finished.endpoint for finished in exported] == ["/jobs/{job_id}", "/jobs/{job_id}", "unmatched", "unmatched"]
+
+
+def test_trace_ids_from_headers():
+    assert trace_id_from_headers({"X-Cloud-Trace-Context": "abc123/456;o=1"}) == "abc123"
+    traceparent = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+    assert trace_id_from_headers({"traceparent": traceparent}) == "4bf92f3577b34da6a3ce929d0e0e4736"
+    assert trace_id_from_headers({"traceparent": "garbage"}) is None
+
+
+def test_traces_export_to_the_structured_log(caplog):
+    from monitoring.cloud_monitoring import PerformanceMonitor
+
+    monitor = PerformanceMonitor("test-project")
+    store = TraceStore(export=monitor.record_trace)
+    finished = tracing_module.Trace("/score", "t1")
+    finished.add_span("model_call", finished._start, 0.25)
+    with caplog.at_level(logging.INFO, logger="assessment_agent"):
+        finished.release()
+        store.add(finished)
+
+    line = json.loads(caplog.records[-1].getMessage())
+    assert line["event_type"] == "request_trace" and line["trace_id"] == "t1"
+    assert line["spans"][0]["duration_ms"] == 250.0
+    assert len(monitor.metrics.buffer) == 1
+
+
+def test_abandoned_tool_timers_do_not_accumulate():
+    from monitoring import cloud_monitoring
+    from monitoring.cloud_monitoring import MAX_OPEN_TOOL_TIMERS, PerformanceMonitor
+
+    monitor = PerformanceMonitor("test-project")
+    for i in range(MAX_OPEN_TOOL_TIMERS + 50):
+        monitor.start_tool_timer(f"request-{i}", "score")  # the request failed before ending it
+    assert len(monitor.start_times) == MAX_OPEN_TOOL_TIMERS
+
+    original = cloud_monitoring.monitor
+    cloud_monitoring.monitor = monitor
+    try:
+        with pytest.raises(ValueError):
+            with cloud_monitoring.tool_timer("request-x", "score"):
+                raise ValueError("boom")
+    finally:
+        cloud_monitoring.monitor = original
+    assert ("request-x", "score") not in monitor.start_times
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the typed request pipeline: handlers validate once, agents take and
+return models, and run() stays a thin string adapter
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+
+import main
+from assessment_analysis_agent.agent import (
+    AssessmentAgent, AssessmentAnalysis, AssessmentRequest, AssessmentSession
+)
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_agent_with_scores.json")
+
+
+def load_sample():
+    with open(SAMPLE_PATH) as f:
+        return json.load(f)
+
+
+def request_body():
+    sample = load_sample()
+    return {
+        "session_id": "session-1",
+        "user_id": "user-1",
+        "industry": sample["industry"],
+        "location": sample["location"],
+        "overall_score": 72,
+        "category_scores": sample["scores"],
+        "question_scores": {"q1": 4},
+        "responses": sample["responses"],
+    }
+
+
+def call_handler(handler, body: bytes):
+    app = Flask(__name__)
+    with app.test_request_context("/", method="POST", data=body, content_type="application/json"):
+        from flask import request
+        return handler(request)
+
+
+def test_session_accepts_category_scores():
+    sample = load_sample()
+    session = AssessmentSession.model_validate({**sample, "category_scores": sample.pop("scores")})
+    assert session.scores == load_sample()["scores"]
+
+
+def test_run_adapter_matches_typed_analyze():
+    agent = AssessmentAgent()
+    sample = load_sample()
+
+    output = asyncio.run(agent.run(json.dumps(sample)))
+    analysis = asyncio.run(agent.analyze(AssessmentSession.model_validate(sample)))
+
+    assert AssessmentAnalysis.model_validate_json(output) == analysis
+
+
+def test_run_keeps_conversational_fallback():
+    agent = AssessmentAgent()
+    output = asyncio.run(agent.run("hello"))
+    assert not output.startswith("{")
+
+
+def test_request_maps_to_session():
+    request = AssessmentRequest.model_validate(request_body())
+    session = request.to_session()
+    assert session.scores == request.category_scores
+    assert session.industry == request.industry
+
+
+def test_handler_returns_analysis_for_category_scores():
+    body, status, _ = call_handler(main.process_assessment_http, json.dumps(request_body()).encode())
+
+    assert status == 200
+    result = json.loads(body)
+    assert result["success"] is True
+    assert "error" not in result
+    assert set(result["data"]) == set(AssessmentAnalysis.model_fields) - {"cohort_percentiles"}
+
+
+def test_handler_reports_missing_fields_and_empty_body():
+    incomplete = request_body()
+    del incomplete["industry"]
+    body, status, _ = call_handler(main.process_assessment_http, json.dumps(incomplete).encode())
+    assert status == 400
+    assert json.loads(body)["error"] == "Missing required field: industry"
+
+    body, status, _ = call_handler(main.process_assessment_http, b"")
+    assert status == 400
+    assert json.loads(body)["error"] == "No JSON data provided"
+
+
+def test_handler_reports_the_full_path_of_a_missing_nested_field():
+    incomplete = request_body()
+    del incomplete["responses"][0]["questionId"]
+    body, status, _ = call_handler(main.process_assessment_http, json.dumps(incomplete).encode())
+
+    assert status == 400
+    assert json.loads(body)["error"] == "Missing required field: responses[0].questionId"
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for startup warm-up and the liveness / readiness probes
+Runs offline; no probe or warm-up stage calls the model
+"""
+
+import asyncio
+import json
+import sys
+import os
+
+import pytest
+
+# Add the agents directory to the path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from runtime import warmup as warmup_module
+from runtime.model_client import ModelClient, ModelEndpoint
+from runtime.warmup import HealthProbe, Warmup
+
+
+@pytest.fixture(autouse=True)
+def fresh_probe(monkeypatch):
+    monkeypatch.setattr(warmup_module, "warmup", None)
+    monkeypatch.setattr(warmup_module, "probe", None)
+
+
+def stages(calls, failing=()):
+    def stage(name):
+        async def run():
+            calls.append(name)
+            if name in failing:
+                raise RuntimeError(f"{name} broke")
+        return run
+    return {name: stage(name) for name in ("assessment", "open_ended", "model_client")}
+
+
+def test_warmup_runs_the_stages_of_its_target():
+    calls = []
+    warmup = Warmup("process_open_ended_scoring_http", stages(calls))
+    asyncio.run(warmup.run())
+
+    assert calls == ["open_ended", "model_client"]
+    assert warmup.state == "done"
+    assert [result["stage"] for result in warmup.results] == ["open_ended", "model_client"]
+
+
+def test_only_required_stage_failures_fail_warmup():
+    warmup = Warmup("server", stages([], failing={"model_client"}))
+    asyncio.run(warmup.run())
+    assert warmup.state == "done"
+    assert warmup.results[-1]["error"] == "model_client broke"
+
+    warmup = Warmup("server", stages([], failing={"assessment"}))
+    asyncio.run(warmup.run())
+    assert warmup.state == "failed"
+
+
+def test_readiness_is_cached_and_goes_stale():
+    warmup = Warmup("process_assessment_http", stages([]))
+    checks = {"count": 0}
+
+    def counting_check():
+        checks["count"] += 1
+        return {"ok": True}
+
+    probe = HealthProbe(warmup, interval=3600, checks={"local": counting_check})
+    probe.start = lambda: None  # drive the deep check by hand
+
+    assert probe.readiness() == ({"status": "starting", "warmup": {
+        "state": "pending", "target": "process_assessment_http", "stages": []}}, False)
+    probe.check()
+    assert probe.readiness()[1] is False  # still warming up
+
+    asyncio.run(warmup.run())
+    probe.check()
+    body, ready = probe.readiness()
+    assert ready and body["checks"] == {"local": {"ok": True}}
+    # Probes read the cached result; only the background check runs the checks
+    probe.readiness()
+    assert checks["count"] == 2
+
+    probe._checked_at -= 3 * 3600 + 1
+    body, ready = probe.readiness()
+    assert not ready and body["status"] == "stale"
+
+
+def test_failing_deep_check_is_not_ready():
+    def broken():
+        raise RuntimeError("event loop wedged")
+
+    probe = HealthProbe(None, checks={"event_loop": broken})
+    result = probe.check()
+    assert result["status"] == "not_ready"
+    assert result["checks"]["event_loop"] == {"error": "event loop wedged"}
+
+
+def test_handlers_answer_probes_without_running(monkeypatch):
+    from flask import Flask
+    import main
+
+    probe = HealthProbe(None, checks={})
+    probe.start = lambda: None
+    monkeypatch.setattr(warmup_module, "probe", probe)
+    app = Flask("probes")
+
+    def get(handler, path):
+        with app.test_request_context(path, method="GET"):
+            from flask import request
+            return handler(request)
+
+    body, status, _ = get(main.process_open_ended_scoring_http, "/healthz")
+    assert status == 200 and json.loads(body)["status"] == "alive"
+    body, status, _ = get(main.process_open_ended_scoring_http, "/readyz")
+    assert status == 503 and json.loads(body)["status"] == "starting"
+
+    probe.check()
+    body, status, _ = get(main.process_assessment_http, "/readyz")
+    assert status == 200 and json.loads(body)["status"] == "ready"
+    body, status, _ = get(main.health_check_http, "/")
+    assert status == 200 and json.loads(body)["status"] == "healthy"
+    # Other GETs still reach the handler
+    body, status, _ = get(main.process_open_ended_scoring_http, "/")
+    assert status == 405
+
+
+def test_model_client_warm_tolerates_failing_backends():
+    class Backend:
+        def __init__(self, fail):
+            self.fail = fail
+            self.warmed = 0
+
+        async def warm(self):
+            self.warmed += 1
+            if self.fail:
+                raise ConnectionError("unreachable")
+
+        async def generate_content_async(self, prompt):
+            yield "unused"
+
+    backends = [Backend(fail=False), Backend(fail=True)]
+    client = ModelClient([ModelEndpoint(f"key-{i}", b, 1000, 1_000_000) for i, b in enumerate(backends)])
+    asyncio.run(client.warm())
+
+    assert [b.warmed for b in backends] == [1, 1]
+    assert client.stats()["calls"] == 0
+
+
+def test_server_warms_up_before_serving(monkeypatch):
+    from fastapi.testclient import TestClient
+    import server
+
+    calls = []
+    monkeypatch.setattr(warmup_module, "STAGES", stages(calls))
+
+    with TestClient(server.app) as client:
+        assert calls == ["assessment", "open_ended", "model_client"]
+        assert client.get("/healthz").json()["status"] == "alive"
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        assert response.json()["warmup"]["state"] == "done"